@@ -2,6 +2,7 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
+from connectflow.api import ConditionalMixin, SparseFieldsetMixin
 from django.contrib.auth import authenticate
 from django.utils import timezone
 from .models import User, Notification
@@ -65,7 +66,7 @@ def api_logout(request):
     except:
         return Response({'message': 'Logged out'})
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -88,14 +89,24 @@ class UserViewSet(viewsets.ModelViewSet):
         user.save()
         return Response({'status': 'theme updated', 'theme': user.theme})
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(ConditionalMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    max_page_size = 100
+    version_models = (Notification,)
 
     def get_queryset(self):
         return Notification.objects.filter(recipient=self.request.user)
 
+    def get_version_aggregates(self, model):
+        from django.db.models import Count, Q
+        return {
+            **super().get_version_aggregates(model),
+            'unread': Count('pk', filter=Q(is_read=False)),
+        }
+
     @action(detail=False, methods=['post'])
     def mark_all_as_read(self, request):
-        self.get_queryset().update(is_read=True)
+        from .notifications import mark_all_read
+        mark_all_read(request.user.id)
         return Response({'status': 'all notifications marked as read'})
@@ -1,12 +1,14 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.utils import timezone
+from connectflow.metrics import ConsumerMetricsMixin
+from connectflow.query_budget import QueryBudgetConsumerMixin
 from django.contrib.auth import get_user_model
+from . import presence
 
 User = get_user_model()
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+class NotificationConsumer(ConsumerMetricsMixin, QueryBudgetConsumerMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.user = self.scope["user"]
         if not self.user.is_authenticated:
@@ -30,21 +32,19 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             )
 
     async def send_notification(self, event):
-        # Send notification to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'notification',
-            'id': event['id'],
-            'title': event['title'],
-            'content': event['content'],
-            'notification_type': event['notification_type'],
-            'link': event['link'],
-            'created_at': event['created_at']
-        }))
+        # Send notification to WebSocket (extra keys such as call_id pass through)
+        payload = {key: value for key, value in event.items() if key != 'type'}
+        payload.setdefault('created_at', "Just now")
+        await self.send(text_data=json.dumps({'type': 'notification', **payload}))
 
 
-class PresenceConsumer(AsyncWebsocketConsumer):
+class PresenceConsumer(ConsumerMetricsMixin, QueryBudgetConsumerMixin, AsyncWebsocketConsumer):
     """
     Global presence tracking - maintains user online status across all pages.
+
+    On connect the client gets a ``presence_snapshot`` of its organization;
+    after that, changes arrive as ``presence_diff`` frames batched per tick
+    (see ``apps/accounts/presence.py``).
     """
     async def connect(self):
         self.user = self.scope["user"]
@@ -55,40 +55,26 @@ class PresenceConsumer(AsyncWebsocketConsumer):
         
         # Join organization-wide presence group
         if self.user.organization_id:
-            self.org_group = f'presence_org_{self.user.organization_id}'
+            self.org_group = presence.org_group(self.user.organization_id)
             await self.channel_layer.group_add(self.org_group, self.channel_name)
         
-        # Set user ONLINE
-        await self.set_status('ONLINE')
-        
-        # Broadcast to organization
-        if hasattr(self, 'org_group'):
-            await self.channel_layer.group_send(
-                self.org_group,
-                {
-                    'type': 'user_status_update',
-                    'user_id': self.user.id,
-                    'status': 'ONLINE'
-                }
-            )
+        # Register the socket; only the user's first one is news to the org
+        await self.register()
+        self.registered = True
+        presence.ensure_tasks()
         
         await self.accept()
+        if hasattr(self, 'org_group'):
+            await self.send(text_data=json.dumps({
+                'type': 'presence_snapshot',
+                'statuses': await self.get_snapshot()
+            }))
     
     async def disconnect(self, close_code):
+        # Other tabs may still be open
+        if getattr(self, 'registered', False):
+            await self.unregister()
         if hasattr(self, 'org_group'):
-            # Set user OFFLINE
-            await self.set_status('OFFLINE')
-            
-            # Broadcast to organization
-            await self.channel_layer.group_send(
-                self.org_group,
-                {
-                    'type': 'user_status_update',
-                    'user_id': self.user.id,
-                    'status': 'OFFLINE'
-                }
-            )
-            
             await self.channel_layer.group_discard(self.org_group, self.channel_name)
     
     async def receive(self, text_data):
@@ -99,7 +85,7 @@ class PresenceConsumer(AsyncWebsocketConsumer):
             return
         
         if data.get('type') == 'heartbeat':
-            # Update last_seen on heartbeat
+            # Refresh liveness; last_seen is written in the next batch
             await self.update_activity()
             await self.send(text_data=json.dumps({'type': 'pong'}))
         
@@ -108,31 +94,34 @@ class PresenceConsumer(AsyncWebsocketConsumer):
             new_status = data.get('status', '').upper()
             if new_status in ['ONLINE', 'AWAY', 'BUSY']:
                 await self.set_status(new_status)
-                if hasattr(self, 'org_group'):
-                    await self.channel_layer.group_send(
-                        self.org_group,
-                        {
-                            'type': 'user_status_update',
-                            'user_id': self.user.id,
-                            'status': new_status
-                        }
-                    )
     
-    async def user_status_update(self, event):
-        """Broadcast status changes to all connected clients."""
+    async def presence_diff(self, event):
+        """Relay one tick's coalesced status changes for the organization."""
         await self.send(text_data=json.dumps({
-            'type': 'presence',
-            'user_id': event['user_id'],
-            'status': event['status']
+            'type': 'presence_diff',
+            'changes': event['changes']
         }))
     
+    @database_sync_to_async
+    def get_snapshot(self):
+        return presence.snapshot(self.user.organization_id)
+
+    @database_sync_to_async
+    def register(self):
+        if presence.connect(self.user.id):
+            presence.publish(self.user.organization_id, self.user.id, presence.ONLINE)
+
+    @database_sync_to_async
+    def unregister(self):
+        if presence.disconnect(self.user.id):
+            presence.publish(self.user.organization_id, self.user.id, presence.OFFLINE)
+
     @database_sync_to_async
     def set_status(self, status):
-        User.objects.filter(id=self.user.id).update(
-            status=status,
-            last_seen=timezone.now()
-        )
+        presence.set_status(self.user.id, status)
+        presence.publish(self.user.organization_id, self.user.id, status)
     
     @database_sync_to_async
     def update_activity(self):
-        User.objects.filter(id=self.user.id).update(last_seen=timezone.now())
+        if presence.touch(self.user.id):
+            presence.publish(self.user.organization_id, self.user.id, presence.ONLINE)
@@ -1,11 +1,22 @@
-from .models import Notification
+from django.utils.functional import SimpleLazyObject
+from . import notifications
+
 
 def notifications_processor(request):
-    if request.user.is_authenticated:
-        unread_count = request.user.notifications.filter(is_read=False).count()
-        latest_notifications = request.user.notifications.all()[:5]
-        return {
-            'unread_notifications_count': unread_count,
-            'recent_notifications': latest_notifications
-        }
-    return {}
+    # Lazy: templates that never show notifications cost no cache or DB hit
+    def user_id():
+        user = getattr(request, 'principal', None) or request.user
+        return user.pk if user.is_authenticated else None
+
+    def unread_count():
+        pk = user_id()
+        return notifications.unread_count(pk) if pk is not None else 0
+
+    def recent():
+        pk = user_id()
+        return notifications.recent_notifications(pk) if pk is not None else []
+
+    return {
+        'unread_notifications_count': SimpleLazyObject(unread_count),
+        'recent_notifications': SimpleLazyObject(recent),
+    }
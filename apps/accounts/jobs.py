@@ -0,0 +1,10 @@
+from apps.jobs.queue import job
+
+
+@job(name='accounts.dispatch_notifications')
+def dispatch_notifications_job(recipient_ids, title, content, notification_type, sender_id, link, extra):
+    """Deferred half of dispatch_notifications (bulk insert + websocket push)."""
+    from .models import User
+    from .notifications import dispatch_now
+    sender = User.objects.filter(pk=sender_id).first() if sender_id else None
+    dispatch_now(recipient_ids, title, content, notification_type, sender, link, extra)
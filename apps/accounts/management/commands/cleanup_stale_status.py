@@ -1,22 +1,34 @@
+import time
+
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from datetime import timedelta
-from apps.accounts.models import User
+from django.db import close_old_connections
+
+from apps.accounts import presence
 
 
 class Command(BaseCommand):
-    help = 'Reset status to OFFLINE for users who haven\'t been seen in 30+ minutes'
+    help = 'Reset status to OFFLINE for users who have not been seen for PRESENCE_STALE_AFTER seconds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-after', type=int, default=None,
+                            help='Seconds without activity (default: PRESENCE_STALE_AFTER)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep sweeping every --interval seconds')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Seconds between sweeps with --loop (default: PRESENCE_SWEEP_INTERVAL, or 60)')
 
     def handle(self, *args, **options):
-        cutoff_time = timezone.now() - timedelta(minutes=30)
-        
-        stale_users = User.objects.filter(
-            status='ONLINE',
-            last_seen__lt=cutoff_time
-        )
-        
-        count = stale_users.update(status=User.Status.OFFLINE)
-        
-        self.stdout.write(
-            self.style.SUCCESS(f'✓ Reset {count} stale ONLINE statuses to OFFLINE')
-        )
+        interval = options['interval'] or getattr(settings, 'PRESENCE_SWEEP_INTERVAL', 0) or 60
+        try:
+            while True:
+                count = presence.sweep(options['stale_after'])
+                self.stdout.write(
+                    self.style.SUCCESS(f'✓ Reset {count} stale presence statuses to OFFLINE')
+                )
+                if not options['loop']:
+                    break
+                close_old_connections()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
@@ -1,10 +1,6 @@
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.conf import settings
-from django.core.cache import cache
-from django.utils import timezone
-from datetime import timedelta
-from .models import User
 
 class EmailVerificationMiddleware:
     """
@@ -14,7 +10,7 @@ class EmailVerificationMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
         # Paths that don't require verification
-        self.exempt_urls = [
+        self.exempt_urls = (
             reverse('accounts:login'),
             reverse('accounts:register'),
             reverse('accounts:logout'),
@@ -26,26 +22,17 @@ class EmailVerificationMiddleware:
             '/admin/',
             '/static/',
             '/media/',
-        ]
+        )
 
     def __call__(self, request):
-        if not request.user.is_authenticated:
+        # Stale presence is swept by apps/accounts/presence.py, not here.
+        # The principal comes from the session cache: no users query
+        principal = request.principal
+        if not principal.is_authenticated or principal.email_verified:
             return self.get_response(request)
 
-        # Auto-correct stale presence states when websocket disconnects are missed.
-        # Throttled globally to avoid running on every request.
-        if cache.add('presence_cleanup_lock', '1', timeout=120):
-            cutoff_time = timezone.now() - timedelta(minutes=5)
-            User.objects.filter(
-                status=User.Status.ONLINE,
-                last_seen__lt=cutoff_time
-            ).update(status=User.Status.OFFLINE)
-
-        # Check if user is verified
-        if not getattr(request.user, 'email_verified', False):
-            # Allow access if the path is in the exempt list
-            path = request.path_info
-            if not any(path.startswith(url) for url in self.exempt_urls):
-                return redirect('accounts:verify_email')
+        # Allow access if the path is in the exempt list
+        if not request.path_info.startswith(self.exempt_urls):
+            return redirect('accounts:verify_email')
 
         return self.get_response(request)
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-18 03:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_add_call_notification_type'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('organizations', '0019_alter_projectfile_file'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['status', 'last_seen'], name='users_status_last_seen_idx'),
+        ),
+    ]
@@ -147,7 +147,36 @@ class User(AbstractUser):
         verbose_name = _('User')
         verbose_name_plural = _('Users')
         ordering = ['-created_at']
+        indexes = [
+            # Stale presence sweeps (apps/accounts/presence.py)
+            models.Index(fields=['status', 'last_seen'], name='users_status_last_seen_idx'),
+        ]
     
+    # Copied into the message search index (apps/chat_channels/search.py)
+    NAME_FIELDS = ('first_name', 'last_name', 'username')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_names = instance._names()
+        return instance
+
+    def _names(self):
+        # Deferred fields stay None rather than triggering a query
+        return tuple(self.__dict__.get(field) for field in self.NAME_FIELDS)
+
+    def names_changed(self):
+        """True when a loaded name field differs from what was loaded."""
+        if self._state.adding:
+            return False
+        loaded = getattr(self, '_loaded_names', None)
+        if loaded is None:
+            return False
+        return any(
+            field in self.__dict__ and value != old
+            for field, value, old in zip(self.NAME_FIELDS, self._names(), loaded)
+        )
+
     def __str__(self):
         return f"{self.get_full_name() or self.username} ({self.get_role_display()})"
     
@@ -176,9 +205,9 @@ class User(AbstractUser):
         return self.module_permissions.get(module_name, True)
 
 
-from django.db.models.signals import post_delete, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-import cloudinary.uploader
+from apps.jobs.jobs import enqueue_cloudinary_destroy
 
 @receiver(pre_save, sender=User)
 def delete_old_avatar_on_change(sender, instance, **kwargs):
@@ -207,26 +236,13 @@ def delete_old_avatar_on_change(sender, instance, **kwargs):
     # Only delete when the avatar truly changed. Object identity/equality on
     # Cloudinary resources can be unreliable across saves.
     if old_ref and old_ref != new_ref:
-        try:
-            cloudinary.uploader.destroy(old_avatar.public_id)
-        except Exception:
-            try:
-                cloudinary.uploader.destroy(old_avatar.name)
-            except Exception as e:
-                print(f"Cloudinary cleanup error: {e}")
+        enqueue_cloudinary_destroy(old_avatar)
 
 @receiver(post_delete, sender=User)
 def delete_avatar_from_cloudinary(sender, instance, **kwargs):
-    if instance.avatar:
-        try:
-            # For CloudinaryField, we usually use the public_id or the name
-            cloudinary.uploader.destroy(instance.avatar.public_id)
-        except Exception as e:
-            # Native CloudinaryField might store it differently
-            try:
-                cloudinary.uploader.destroy(instance.avatar.name)
-            except:
-                print(f"Cloudinary deletion error: {e}")
+    # Deleted by the job queue; the job falls back to the stored name
+    # when the public_id form is rejected.
+    enqueue_cloudinary_destroy(instance.avatar)
 
 
 class Notification(models.Model):
@@ -270,3 +286,17 @@ class Notification(models.Model):
             notification_type=notification_type,
             link=link
         )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_principal(sender, instance, **kwargs):
+    from .principal import invalidate
+    invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def invalidate_notification_cache(sender, instance, **kwargs):
+    from .notifications import invalidate_cached
+    invalidate_cached(instance.recipient_id)
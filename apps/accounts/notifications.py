@@ -0,0 +1,184 @@
+"""
+Notification fan-out.
+
+Every feature that alerts a group of users goes through
+:func:`dispatch_notifications`: all Notification rows are written with a
+single ``bulk_create`` and pushed to the recipients' ``notifications_<id>``
+channel-layer groups in one batch, instead of one INSERT and one
+``group_send`` round-trip per recipient.
+
+Each user's unread count and latest notifications (the header dropdown in
+``base.html``) are cached; Notification saves and deletes,
+``create_notifications`` and ``mark_all_read`` keep them current.
+"""
+
+import asyncio
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet
+
+from connectflow.api import bump_versions
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+RECENT_LIMIT = 5
+
+
+def _unread_key(user_id):
+    return f'notifications:{user_id}:unread'
+
+
+def _recent_key(user_id):
+    return f'notifications:{user_id}:recent'
+
+
+def _timeout():
+    return getattr(settings, 'NOTIFICATION_CACHE_TIMEOUT', 3600)
+
+
+def _now_and_on_commit(func):
+    # Again after commit, so a read between the write and the commit
+    # cannot leave the old value cached
+    func()
+    transaction.on_commit(func)
+
+
+def unread_count(user_id):
+    key = _unread_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+        cache.set(key, count, _timeout())
+    return count
+
+
+def recent_notifications(user_id):
+    """The user's latest ``RECENT_LIMIT`` notifications."""
+    key = _recent_key(user_id)
+    recent = cache.get(key)
+    if recent is None:
+        recent = list(Notification.objects.filter(recipient_id=user_id)[:RECENT_LIMIT])
+        cache.set(key, recent, _timeout())
+    return recent
+
+
+def invalidate_cached(*user_ids):
+    """Drop the cached count and list of ``user_ids``."""
+    keys = [key for user_id in user_ids for key in (_unread_key(user_id), _recent_key(user_id))]
+    _now_and_on_commit(lambda: cache.delete_many(keys))
+
+
+def mark_all_read(user_id):
+    """Mark every notification of ``user_id`` read; returns rows updated."""
+    updated = Notification.objects.filter(recipient_id=user_id, is_read=False).update(is_read=True)
+    bump_versions(Notification)
+
+    def reset():
+        cache.set(_unread_key(user_id), 0, _timeout())
+        cache.delete(_recent_key(user_id))
+    _now_and_on_commit(reset)
+    return updated
+
+
+def _recipient_ids(recipients, exclude=None):
+    if isinstance(recipients, QuerySet):
+        recipients = recipients.order_by().values_list('pk', flat=True)
+    ids = {getattr(r, 'pk', r) for r in recipients if r is not None}
+    excluded = {getattr(u, 'pk', u) for u in (exclude or []) if u is not None}
+    return sorted(ids - excluded)
+
+
+def create_notifications(recipients, title, content, notification_type='SYSTEM',
+                         sender=None, link=None, exclude=None):
+    """Create one Notification per recipient in a single INSERT."""
+    notifications = Notification.objects.bulk_create([
+        Notification(
+            recipient_id=recipient_id,
+            sender=sender,
+            title=title,
+            content=content,
+            notification_type=notification_type,
+            link=link
+        )
+        for recipient_id in _recipient_ids(recipients, exclude)
+    ])
+    # bulk_create sends no post_save
+    bump_versions(Notification)
+    invalidate_cached(*{notification.recipient_id for notification in notifications})
+    return notifications
+
+
+def notification_event(notification, extra=None):
+    """Channel-layer event consumed by NotificationConsumer.send_notification."""
+    event = {
+        'type': 'send_notification',
+        'id': str(notification.id),
+        'title': notification.title,
+        'content': notification.content,
+        'notification_type': notification.notification_type,
+        'link': notification.link,
+        'created_at': "Just now",
+    }
+    if extra:
+        event.update(extra)
+    return event
+
+
+async def broadcast_notifications(notifications, extra=None):
+    """Push ``notifications`` to their recipients' groups concurrently."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not notifications:
+        return
+    results = await asyncio.gather(*[
+        channel_layer.group_send(
+            f"notifications_{notification.recipient_id}",
+            notification_event(notification, extra)
+        )
+        for notification in notifications
+    ], return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning(f'Notification broadcast failed: {result}')
+
+
+def dispatch_now(recipient_ids, title, content, notification_type, sender, link, extra):
+    notifications = create_notifications(
+        recipient_ids, title, content,
+        notification_type=notification_type,
+        sender=sender,
+        link=link
+    )
+    async_to_sync(broadcast_notifications)(notifications, extra)
+    return notifications
+
+
+def dispatch_notifications(recipients, title, content, notification_type='SYSTEM',
+                           sender=None, link=None, exclude=None, extra=None, defer=None):
+    """
+    Notify every user in ``recipients`` (users or user ids) except ``exclude``.
+
+    ``extra`` is merged into the websocket payload only. With ``defer`` the
+    work is handed to the background job queue and nothing is returned; it
+    defaults to ``settings.NOTIFICATION_DISPATCH_DEFERRED``.
+    """
+    recipients = _recipient_ids(recipients, exclude)
+    if defer is None:
+        defer = getattr(settings, 'NOTIFICATION_DISPATCH_DEFERRED', False)
+
+    if defer:
+        from apps.jobs.queue import enqueue
+        from .jobs import dispatch_notifications_job
+        enqueue(
+            dispatch_notifications_job,
+            recipients, title, content, notification_type,
+            getattr(sender, 'pk', sender), link, extra
+        )
+        return []
+    return dispatch_now(recipients, title, content, notification_type, sender, link, extra)
@@ -0,0 +1,260 @@
+"""
+Presence registry.
+
+The cache (Redis in production) is the authoritative source for who is
+online; ``User.status`` and ``last_seen`` are a snapshot written in batches.
+
+Per user the registry keeps:
+
+* ``presence:<id>:connections`` - open sockets (chat and presence), so five
+  tabs are one ONLINE user and only closing the last one goes OFFLINE;
+* ``presence:<id>:alive`` - refreshed on connect and on every heartbeat and
+  expiring after ``PRESENCE_TTL`` seconds, so a server that dies without
+  running ``disconnect`` cannot leave users online forever. A connect or
+  heartbeat that finds it expired starts the count afresh;
+* ``presence:<id>:status`` - a manual AWAY / BUSY while connected.
+
+Transitions and heartbeats are buffered per process and written to the
+``users`` table every ``PRESENCE_FLUSH_INTERVAL`` seconds with one UPDATE
+per status, by a task running on the ASGI server's event loop.
+
+Clients learn about each other through the ``presence_org_<id>`` group. A
+socket starts with a ``snapshot`` of the org (ids grouped by status, only
+users who are not OFFLINE), then receives ``presence_diff`` frames: changes
+``publish``-ed during one ``PRESENCE_TICK`` are coalesced per org, the last
+status of each user winning, and sent as a single group message.
+
+``sweep`` puts back OFFLINE the users the snapshot still shows as present
+after ``PRESENCE_STALE_AFTER`` seconds without a flush (their server died
+before it could write the OFFLINE). It runs every ``PRESENCE_SWEEP_INTERVAL``
+seconds next to the flush task, once across the processes sharing the
+cache, or from ``manage.py cleanup_stale_status --loop``.
+
+``ensure_task`` is the scheduler behind these loops; other apps use it for
+their own periodic upkeep (the chat event log prune).
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from connectflow.metrics import PRESENCE_SWEEP_DURATION, PRESENCE_SWEEPS, PRESENCE_SWEPT_USERS
+
+logger = logging.getLogger(__name__)
+
+ONLINE = 'ONLINE'
+OFFLINE = 'OFFLINE'
+MANUAL_STATUSES = frozenset({'ONLINE', 'AWAY', 'BUSY'})
+
+_pending = {}
+_pending_lock = threading.Lock()
+_diffs = {}
+_tasks = {}
+
+
+def _ttl():
+    return getattr(settings, 'PRESENCE_TTL', 90)
+
+
+def _keys(user_id):
+    prefix = f'presence:{user_id}'
+    return f'{prefix}:connections', f'{prefix}:alive', f'{prefix}:status'
+
+
+def _mark(user_id, status):
+    with _pending_lock:
+        _pending[user_id] = status
+
+
+def _by_status(statuses_by_user):
+    grouped = {}
+    for user_id, status in statuses_by_user.items():
+        grouped.setdefault(status, []).append(user_id)
+    return grouped
+
+
+def org_group(org_id):
+    return f'presence_org_{org_id}'
+
+
+def connect(user_id):
+    """Register a socket. Returns True when the user just came online."""
+    connections_key, alive_key, status_key = _keys(user_id)
+    revived = cache.get(alive_key) is None
+    if revived:
+        # Whatever is left belongs to sockets that died without a disconnect
+        cache.delete_many([connections_key, status_key])
+    if not cache.add(connections_key, 1, timeout=None):
+        cache.incr(connections_key)
+    cache.set(alive_key, 1, _ttl())
+    status = status_of(user_id)
+    _mark(user_id, status)
+    return revived
+
+
+def disconnect(user_id):
+    """Unregister a socket. Returns True when it was the user's last one."""
+    connections_key, alive_key, status_key = _keys(user_id)
+    try:
+        remaining = cache.decr(connections_key)
+    except ValueError:
+        remaining = 0
+    if remaining > 0:
+        return False
+    cache.delete_many([connections_key, alive_key, status_key])
+    _mark(user_id, OFFLINE)
+    return True
+
+
+def touch(user_id):
+    """Heartbeat. Returns True when it revived a user whose liveness had expired."""
+    connections_key, alive_key, _ = _keys(user_id)
+    if cache.touch(alive_key, _ttl()):
+        _mark(user_id, status_of(user_id))
+        return False
+    # Expired (or flushed): the socket sending this is evidently still open
+    cache.set(connections_key, 1, timeout=None)
+    cache.set(alive_key, 1, _ttl())
+    _mark(user_id, ONLINE)
+    return True
+
+
+def set_status(user_id, status):
+    """Manual ONLINE / AWAY / BUSY for a connected user."""
+    if status not in MANUAL_STATUSES:
+        raise ValueError(f'Unknown presence status: {status}')
+    _, alive_key, status_key = _keys(user_id)
+    if status == ONLINE:
+        cache.delete(status_key)
+    else:
+        cache.set(status_key, status, timeout=None)
+    cache.touch(alive_key, _ttl())
+    _mark(user_id, status)
+
+
+def status_of(user_id):
+    return statuses([user_id])[user_id]
+
+
+def statuses(user_ids):
+    """{user_id: status} for ``user_ids``, straight from the registry."""
+    keys = {user_id: _keys(user_id) for user_id in user_ids}
+    found = cache.get_many([key for _, alive, status in keys.values() for key in (alive, status)])
+    return {
+        user_id: found.get(status, ONLINE) if alive in found else OFFLINE
+        for user_id, (_, alive, status) in keys.items()
+    }
+
+
+def snapshot(org_id):
+    """{status: [user ids]} for the members of an org who are not OFFLINE."""
+    from .models import User
+
+    member_ids = list(User.objects.filter(organization_id=org_id).values_list('id', flat=True))
+    return _by_status({
+        user_id: status for user_id, status in statuses(member_ids).items() if status != OFFLINE
+    })
+
+
+def publish(org_id, user_id, status):
+    """Queue a status change for the org's next diff."""
+    if org_id is None:
+        return
+    with _pending_lock:
+        _diffs.setdefault(org_id, {})[user_id] = status
+
+
+async def broadcast_diffs():
+    """Send every org its coalesced changes since the last tick. Returns orgs sent to."""
+    from channels.layers import get_channel_layer
+
+    global _diffs
+    with _pending_lock:
+        diffs, _diffs = _diffs, {}
+    layer = get_channel_layer()
+    for org_id, changes in diffs.items():
+        await layer.group_send(org_group(org_id), {'type': 'presence_diff', 'changes': _by_status(changes)})
+    return len(diffs)
+
+
+def flush():
+    """Write buffered transitions and heartbeats to ``users``. Returns rows updated."""
+    from .models import User
+
+    global _pending
+    with _pending_lock:
+        pending, _pending = _pending, {}
+    if not pending:
+        return 0
+
+    now = timezone.now()
+    return sum(
+        User.objects.filter(pk__in=user_ids).update(status=status, last_seen=now)
+        for status, user_ids in _by_status(pending).items()
+    )
+
+
+def sweep(stale_after=None):
+    """Set stale users OFFLINE in ``users``. Returns the number swept."""
+    from .models import User
+
+    started = time.perf_counter()
+    if stale_after is None:
+        stale_after = getattr(settings, 'PRESENCE_STALE_AFTER', 300)
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    # Served by the (status, last_seen) index
+    stale = User.objects.filter(status__in=sorted(MANUAL_STATUSES), last_seen__lt=cutoff)
+    candidates = list(stale.values_list('id', flat=True))
+    swept = 0
+    for start in range(0, len(candidates), 500):
+        batch = candidates[start:start + 500]
+        # Still live in the registry: the next flush will refresh last_seen
+        gone = [user_id for user_id, status in statuses(batch).items() if status == OFFLINE]
+        if gone:
+            swept += stale.filter(pk__in=gone).update(status=OFFLINE)
+    PRESENCE_SWEEPS.inc()
+    PRESENCE_SWEPT_USERS.inc(swept)
+    PRESENCE_SWEEP_DURATION.observe(time.perf_counter() - started)
+    return swept
+
+
+def _sweep_if_due():
+    # One sweep per interval across the processes sharing the cache
+    if cache.add('presence:sweep_lock', 1, timeout=getattr(settings, 'PRESENCE_SWEEP_INTERVAL', 60)):
+        sweep()
+
+
+async def _every(name, setting, default, step):
+    while True:
+        await asyncio.sleep(getattr(settings, setting, default))
+        try:
+            await step()
+        except Exception:
+            logger.exception('Periodic %s task failed', name)
+
+
+def ensure_task(name, setting, default, step):
+    """
+    Await ``step()`` every ``settings.<setting>`` seconds on the running event
+    loop, starting it once per loop; an interval of 0 disables it.
+    """
+    if getattr(settings, setting, default) <= 0:
+        return
+    loop = asyncio.get_running_loop()
+    task = _tasks.get(name)
+    if task is None or task.done() or task.get_loop() is not loop:
+        _tasks[name] = loop.create_task(_every(name, setting, default, step))
+
+
+def ensure_tasks():
+    """Start the flush, diff and sweep tasks on the running event loop."""
+    ensure_task('flush', 'PRESENCE_FLUSH_INTERVAL', 15, database_sync_to_async(flush))
+    ensure_task('tick', 'PRESENCE_TICK', 1.0, broadcast_diffs)
+    ensure_task('sweep', 'PRESENCE_SWEEP_INTERVAL', 60, database_sync_to_async(_sweep_if_due))
@@ -0,0 +1,134 @@
+"""
+Cached auth principal.
+
+The facts most authorization checks need - the account is active and
+verified, its role, organization and module permissions - without loading
+the ``users`` row. Principals are cached per user under a versioned key and
+dropped whenever the user is saved or deleted (signals in ``models.py``);
+call ``invalidate`` after a queryset ``update()`` touching those columns.
+
+* ``PrincipalMiddleware`` sets ``request.principal``, resolved lazily from
+  the session: a request that only consults the principal never triggers
+  the ``AuthenticationMiddleware`` user load.
+* ``principal_required`` is ``login_required`` on top of the principal.
+* Consumers call ``principal_for(user_id)`` so role changes reach sockets
+  that are already open.
+"""
+
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from .models import User
+
+# Bump when the cached attributes change
+VERSION = 1
+FIELDS = ('id', 'password', 'is_active', 'email_verified', 'role', 'organization_id', 'module_permissions')
+
+
+class Principal:
+    is_authenticated = True
+    Role = User.Role
+
+    # Same rules as the model
+    is_admin = User.is_admin
+    is_manager = User.is_manager
+    has_module_access = User.has_module_access
+
+    def __init__(self, id, email_verified, role, organization_id, module_permissions, session_hash):
+        self.id = self.pk = id
+        self.email_verified = email_verified
+        self.role = role
+        self.organization_id = organization_id
+        self.module_permissions = module_permissions or {}
+        self.session_hash = session_hash
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(
+            user.pk, user.email_verified, user.role, user.organization_id,
+            user.module_permissions, user.get_session_auth_hash()
+        )
+
+    def __repr__(self):
+        return f'<Principal {self.id} {self.role}>'
+
+
+class AnonymousPrincipal:
+    id = pk = None
+    is_authenticated = False
+    email_verified = False
+    role = None
+    organization_id = None
+    module_permissions = {}
+    is_admin = False
+    is_manager = False
+
+    def has_module_access(self, module_name):
+        return False
+
+
+ANONYMOUS = AnonymousPrincipal()
+
+
+def _key(user_id):
+    return f'principal:v{VERSION}:{user_id}'
+
+
+def invalidate(*user_ids):
+    cache.delete_many([_key(user_id) for user_id in user_ids])
+
+
+def principal_for(user_id):
+    """The cached Principal for an active user, or None."""
+    key = _key(user_id)
+    principal = cache.get(key)
+    if principal is None:
+        user = User.objects.filter(pk=user_id, is_active=True).only(*FIELDS).first()
+        if user is None:
+            return None
+        principal = Principal.from_user(user)
+        cache.set(key, principal, getattr(settings, 'PRINCIPAL_CACHE_TIMEOUT', 3600))
+    return principal
+
+
+def for_request(request):
+    """The request's Principal, from the session (and cache) when possible."""
+    session = getattr(request, 'session', None)
+    user_id = session.get(SESSION_KEY) if session is not None else None
+    if user_id is not None and session.get(BACKEND_SESSION_KEY) in settings.AUTHENTICATION_BACKENDS:
+        principal = principal_for(User._meta.pk.to_python(user_id))
+        if principal is not None and constant_time_compare(session.get(HASH_SESSION_KEY, ''), principal.session_hash):
+            return principal
+    # No session, or one that does not verify (changed password, rotated
+    # key): django.contrib.auth decides, and flushes sessions it rejects
+    user = request.user
+    if not user.is_authenticated:
+        return ANONYMOUS
+    return principal_for(user.pk) or ANONYMOUS
+
+
+class PrincipalMiddleware:
+    """Sets ``request.principal``; goes after AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.principal = SimpleLazyObject(lambda: for_request(request))
+        return self.get_response(request)
+
+
+def principal_required(view_func):
+    """``login_required`` that only consults ``request.principal``."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.principal.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return view_func(request, *args, **kwargs)
+    return wrapper
@@ -71,3 +71,74 @@ class NotificationTest(TestCase):
         
         context = notifications_processor(MockRequest())
         self.assertEqual(context['unread_notifications_count'], 1)
+
+    def test_dispatch_notifications_bulk_fan_out(self):
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from apps.accounts.notifications import dispatch_notifications
+
+        others = [
+            User.objects.create_user(
+                username=f'member{i}',
+                password='password',
+                email=f'member{i}@test.com',
+                organization=self.org
+            )
+            for i in range(3)
+        ]
+        channel_layer = get_channel_layer()
+        inbox = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f"notifications_{others[0].id}", inbox)
+
+        # One query to resolve recipients, one bulk INSERT
+        with self.assertNumQueries(2):
+            created = dispatch_notifications(
+                User.objects.filter(organization=self.org),
+                title="Heads up",
+                content="Bulk content",
+                notification_type='PROJECT',
+                sender=self.user,
+                exclude=[self.user],
+                extra={'call_id': 'abc'}
+            )
+
+        self.assertEqual(len(created), 3)
+        self.assertEqual(Notification.objects.filter(title="Heads up").count(), 3)
+        self.assertFalse(Notification.objects.filter(title="Heads up", recipient=self.user).exists())
+
+        event = async_to_sync(channel_layer.receive)(inbox)
+        self.assertEqual(event['type'], 'send_notification')
+        self.assertEqual(event['title'], "Heads up")
+        self.assertEqual(event['call_id'], 'abc')
+
+    def test_header_counts_are_cached_and_lazy(self):
+        from django.core.cache import cache
+        from django.test import RequestFactory
+        from apps.accounts.context_processors import notifications_processor
+        from apps.accounts.notifications import create_notifications, mark_all_read
+
+        cache.clear()
+        request = RequestFactory().get('/')
+        request.user = self.user
+        with self.assertNumQueries(0):
+            notifications_processor(request)
+
+        with self.assertNumQueries(2):
+            context = notifications_processor(request)
+            self.assertEqual(context['unread_notifications_count'], 2)
+            self.assertEqual(len(context['recent_notifications']), 2)
+        with self.assertNumQueries(0):
+            context = notifications_processor(request)
+            self.assertEqual(context['unread_notifications_count'], 2)
+            self.assertEqual([n.title for n in context['recent_notifications']], ["Test 2", "Test 1"])
+
+        create_notifications([self.user], title="Test 3", content="Content 3")
+        context = notifications_processor(request)
+        self.assertEqual(context['unread_notifications_count'], 3)
+        self.assertEqual(context['recent_notifications'][0].title, "Test 3")
+
+        mark_all_read(self.user.id)
+        with self.assertNumQueries(1):
+            context = notifications_processor(request)
+            self.assertEqual(context['unread_notifications_count'], 0)
+            self.assertFalse(any(n.is_read is False for n in context['recent_notifications']))
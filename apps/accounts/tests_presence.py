@@ -0,0 +1,212 @@
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from apps.accounts import presence
+from apps.organizations.models import Organization
+
+User = get_user_model()
+
+
+class PresenceRegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        presence.flush()
+        async_to_sync(presence.broadcast_diffs)()
+        self.org = Organization.objects.create(name='Presence Org', code='presence-org')
+        self.user = User.objects.create_user(
+            username='tabs',
+            email='tabs@example.com',
+            password='password123',
+            email_verified=True,
+            organization=self.org
+        )
+
+    def test_connections_are_refcounted(self):
+        self.assertTrue(presence.connect(self.user.id))
+        self.assertFalse(presence.connect(self.user.id))
+        self.assertEqual(presence.status_of(self.user.id), 'ONLINE')
+
+        presence.set_status(self.user.id, 'BUSY')
+        self.assertFalse(presence.disconnect(self.user.id))
+        self.assertEqual(presence.status_of(self.user.id), 'BUSY')
+        self.assertTrue(presence.disconnect(self.user.id))
+        self.assertEqual(presence.status_of(self.user.id), 'OFFLINE')
+
+    def test_expired_liveness_resets_the_count(self):
+        presence.connect(self.user.id)
+        presence.connect(self.user.id)
+        # The server holding both sockets died: nothing ran disconnect()
+        cache.delete(f'presence:{self.user.id}:alive')
+        self.assertEqual(presence.statuses([self.user.id]), {self.user.id: 'OFFLINE'})
+
+        self.assertTrue(presence.connect(self.user.id))
+        self.assertTrue(presence.disconnect(self.user.id))
+
+    def test_heartbeats_revive_and_flush_in_batches(self):
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='password123', organization=self.org
+        )
+        presence.connect(self.user.id)
+        presence.connect(other.id)
+        presence.set_status(other.id, 'AWAY')
+        cache.delete(f'presence:{self.user.id}:alive')
+        self.assertTrue(presence.touch(self.user.id))
+        self.assertFalse(presence.touch(self.user.id))
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.status, 'OFFLINE')
+        # One UPDATE per distinct status
+        with self.assertNumQueries(2):
+            self.assertEqual(presence.flush(), 2)
+        self.assertEqual(
+            dict(User.objects.filter(pk__in=[self.user.pk, other.pk]).values_list('username', 'status')),
+            {'tabs': 'ONLINE', 'other': 'AWAY'}
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(presence.flush(), 0)
+
+    def test_snapshot_lists_connected_members_by_status(self):
+        away = User.objects.create_user(
+            username='away', email='away@example.com', password='password123', organization=self.org
+        )
+        User.objects.create_user(
+            username='gone', email='gone@example.com', password='password123', organization=self.org
+        )
+        presence.connect(self.user.id)
+        presence.connect(away.id)
+        presence.set_status(away.id, 'AWAY')
+
+        expected = {'ONLINE': [self.user.id], 'AWAY': [away.id]}
+        self.assertEqual(presence.snapshot(self.org.id), expected)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('accounts:presence_snapshot'))
+        self.assertEqual(response.json(), {'statuses': expected})
+
+    def test_sweep_resets_only_stale_users_missing_from_registry(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        from connectflow.metrics import PRESENCE_SWEEPS, PRESENCE_SWEPT_USERS
+
+        live = User.objects.create_user(
+            username='live', email='live@example.com', password='password123', organization=self.org
+        )
+        fresh = User.objects.create_user(
+            username='fresh', email='fresh@example.com', password='password123', organization=self.org
+        )
+        long_ago = timezone.now() - timedelta(hours=1)
+        User.objects.filter(pk__in=[self.user.pk, live.pk]).update(status='AWAY', last_seen=long_ago)
+        User.objects.filter(pk=fresh.pk).update(status='ONLINE')
+        presence.connect(live.id)
+        sweeps, swept = PRESENCE_SWEEPS.values.get((), 0), PRESENCE_SWEPT_USERS.values.get((), 0)
+
+        self.assertEqual(presence.sweep(), 1)
+        self.assertEqual(
+            dict(User.objects.filter(pk__in=[self.user.pk, live.pk, fresh.pk]).values_list('username', 'status')),
+            {'tabs': 'OFFLINE', 'live': 'AWAY', 'fresh': 'ONLINE'}
+        )
+        self.assertEqual(PRESENCE_SWEEPS.values[()] - sweeps, 1)
+        self.assertEqual(PRESENCE_SWEPT_USERS.values[()] - swept, 1)
+
+        out = StringIO()
+        call_command('cleanup_stale_status', stale_after=0, stdout=out)
+        self.assertIn('Reset 1 stale presence statuses', out.getvalue())
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, 'OFFLINE')
+
+
+# Ticks are driven by hand
+@override_settings(PRESENCE_TICK=3600)
+class PresenceConsumerTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        presence.flush()
+        async_to_sync(presence.broadcast_diffs)()
+        self.org = Organization.objects.create(name='Tabs Org', code='tabs-org')
+        self.user = User.objects.create_user(
+            username='many_tabs',
+            email='many_tabs@example.com',
+            password='password123',
+            organization=self.org
+        )
+        self.watcher = User.objects.create_user(
+            username='watcher',
+            email='watcher@example.com',
+            password='password123',
+            organization=self.org
+        )
+
+    def _communicator(self, user):
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+        from apps.accounts.routing import websocket_urlpatterns
+
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/presence/')
+        communicator.scope['user'] = user
+        return communicator
+
+    def test_only_first_and_last_tab_are_broadcast(self):
+        async def scenario():
+            watcher = self._communicator(self.watcher)
+            await watcher.connect()
+            snapshot = await watcher.receive_json_from()
+            await presence.broadcast_diffs()
+            await watcher.receive_json_from()  # The watcher's own ONLINE
+
+            tabs = [self._communicator(self.user) for _ in range(3)]
+            for tab in tabs:
+                await tab.connect()
+                await tab.receive_json_from()
+            await tabs[0].send_json_to({'type': 'heartbeat'})
+            self.assertEqual(await tabs[0].receive_json_from(), {'type': 'pong'})
+            self.assertEqual(await presence.broadcast_diffs(), 1)
+            first = await watcher.receive_json_from()
+            self.assertTrue(await watcher.receive_nothing(timeout=0.2))
+            await database_sync_to_async(presence.flush)()
+            flushed = await database_sync_to_async(
+                lambda: User.objects.get(pk=self.user.pk).status
+            )()
+
+            for tab in tabs[:-1]:
+                await tab.disconnect()
+            self.assertEqual(await presence.broadcast_diffs(), 0)
+            await tabs[-1].disconnect()
+            await presence.broadcast_diffs()
+            last = await watcher.receive_json_from()
+            await watcher.disconnect()
+            return snapshot, first, flushed, last
+
+        snapshot, first, flushed, last = async_to_sync(scenario)()
+        self.assertEqual(snapshot, {'type': 'presence_snapshot', 'statuses': {'ONLINE': [self.watcher.id]}})
+        self.assertEqual(first, {'type': 'presence_diff', 'changes': {'ONLINE': [self.user.id]}})
+        self.assertEqual(last, {'type': 'presence_diff', 'changes': {'OFFLINE': [self.user.id]}})
+        self.assertEqual(flushed, 'ONLINE')
+
+    def test_changes_within_a_tick_are_coalesced(self):
+        async def scenario():
+            watcher = self._communicator(self.watcher)
+            await watcher.connect()
+            await watcher.receive_json_from()
+            await presence.broadcast_diffs()
+            await watcher.receive_json_from()
+
+            tab = self._communicator(self.user)
+            await tab.connect()
+            await tab.receive_json_from()
+            for status in ('AWAY', 'BUSY', 'AWAY'):
+                await tab.send_json_to({'type': 'status_change', 'status': status})
+            await tab.send_json_to({'type': 'heartbeat'})
+            await tab.receive_json_from()
+            await presence.broadcast_diffs()
+            diff = await watcher.receive_json_from()
+            self.assertTrue(await watcher.receive_nothing(timeout=0.2))
+            await tab.disconnect()
+            await watcher.disconnect()
+            return diff
+
+        diff = async_to_sync(scenario)()
+        self.assertEqual(diff['changes'], {'AWAY': [self.user.id]})
@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from apps.accounts.principal import principal_for
+from apps.organizations.models import Organization
+
+User = get_user_model()
+
+
+class PrincipalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name='Principal Org', code='principal-org')
+        self.user = User.objects.create_user(
+            username='principal',
+            email='principal@example.com',
+            password='password123',
+            email_verified=True,
+            organization=self.org
+        )
+        self.client.force_login(self.user)
+
+    def test_cached_principal_skips_the_users_query(self):
+        url = reverse('accounts:mark_notifications_read')
+        self.client.post(url)
+        # Session load and the UPDATE; neither the middleware nor the view loads the user
+        with self.assertNumQueries(2):
+            response = self.client.post(url)
+        self.assertEqual(response.json(), {'success': True})
+
+    def test_user_save_invalidates(self):
+        self.assertFalse(principal_for(self.user.id).is_admin)
+        self.user.role = User.Role.ORG_ADMIN
+        self.user.module_permissions = {'analytics': False}
+        self.user.save()
+
+        principal = principal_for(self.user.id)
+        self.assertTrue(principal.is_admin)
+        self.assertFalse(principal.has_module_access('analytics'))
+        self.assertTrue(principal.has_module_access('channels'))
+
+    def test_unverified_users_are_redirected(self):
+        self.user.email_verified = False
+        self.user.save()
+        response = self.client.get(reverse('accounts:presence_snapshot'))
+        self.assertRedirects(response, reverse('accounts:verify_email'), fetch_redirect_response=False)
+        response = self.client.get(reverse('accounts:verify_email'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_password_change_ends_the_session(self):
+        principal_for(self.user.id)
+        self.user.set_password('another-password')
+        self.user.save()
+        response = self.client.get(reverse('accounts:presence_snapshot'))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(reverse('accounts:login')))
+
+    def test_inactive_users_have_no_principal(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(principal_for(self.user.id))
+        response = self.client.get(reverse('accounts:presence_snapshot'))
+        self.assertEqual(response.status_code, 302)
@@ -18,6 +18,7 @@ urlpatterns = [
     path('toggle-theme/', views.toggle_theme, name='toggle_theme'),
     path('notifications/mark-read/', views.mark_notifications_as_read, name='mark_notifications_read'),
     path('notifications/<uuid:notification_id>/mark-read/', views.mark_notification_as_read, name='mark_notification_read'),
+    path('presence/', views.presence_snapshot, name='presence_snapshot'),
     path('setup/promote/', views.promote_me, name='promote_me'),
     path('global-search/', views.GlobalSearchView.as_view(), name='global_search'),
     
@@ -14,8 +14,9 @@ import logging
 from django.contrib.auth import get_user_model
 from .forms import ProfileSettingsForm
 from .models import Notification
+from .principal import principal_required
 from apps.organizations.models import Organization
-from django.db.models import Q
+from apps.search.index import search as workspace_search
 from django.urls import reverse
 from django.utils import timezone
 
@@ -24,7 +25,8 @@ logger = logging.getLogger(__name__)
 
 class GlobalSearchView(View):
     """
-    Search across users, channels, projects, and system navigation paths.
+    Search across system navigation paths and the workspace search index
+    (users, channels, projects, tasks, documents, announcements).
     Returns JSON for the live dropdown.
     """
     @method_decorator(login_required)
@@ -37,7 +39,6 @@ class GlobalSearchView(View):
         clean_query = query.replace('*', '')
         
         results = []
-        user_org = request.user.organization
 
         # 1. System Path Recommendations (Navigation)
         system_paths = [
@@ -61,65 +62,9 @@ class GlobalSearchView(View):
         if not clean_query and '*' not in query:
              return JsonResponse({'results': results[:5]})
 
-        # 2. Search Users
-        users = User.objects.filter(
-            organization=user_org
-        ).filter(
-            Q(username__icontains=clean_query) |
-            Q(first_name__icontains=clean_query) |
-            Q(last_name__icontains=clean_query) |
-            Q(professional_role__icontains=clean_query)
-        )[:5]
-
-        for u in users:
-            results.append({
-                'type': 'User',
-                'title': u.get_full_name() or u.username,
-                'subtitle': u.professional_role or u.email,
-                'url': reverse('accounts:profile_detail', kwargs={'pk': u.pk}),
-                'icon': 'user'
-            })
-
-        # 3. Search Channels
-        from apps.chat_channels.models import Channel
-        channels = Channel.objects.filter(
-            organization=user_org,
-            is_archived=False
-        ).filter(
-            Q(name__icontains=clean_query) |
-            Q(description__icontains=clean_query)
-        ).distinct()
-        
-        viewable_channels = [c for c in channels if c.can_user_view(request.user)][:5]
-        
-        for c in viewable_channels:
-            results.append({
-                'type': 'Channel',
-                'title': f"#{c.name}",
-                'subtitle': c.get_channel_type_display(),
-                'url': reverse('chat_channels:channel_detail', kwargs={'pk': c.pk}),
-                'icon': 'hashtag'
-            })
-
-        # 4. Search Shared Projects
-        from apps.organizations.models import SharedProject
-        projects = SharedProject.objects.filter(
-            Q(host_organization=user_org) | Q(guest_organizations=user_org)
-        ).filter(
-            Q(name__icontains=clean_query) |
-            Q(description__icontains=clean_query)
-        ).distinct()
-        
-        my_projects = projects.filter(members=request.user)[:5]
-        
-        for p in my_projects:
-            results.append({
-                'type': 'Project',
-                'title': p.name,
-                'subtitle': f"Hosted by {p.host_organization.name}",
-                'url': reverse('organizations:shared_project_detail', kwargs={'pk': p.pk}),
-                'icon': 'folder'
-            })
+        # 2. Users, channels, projects, tasks, documents and announcements,
+        # ranked together from the organization's search index
+        results.extend(workspace_search(request.user, clean_query))
 
         return JsonResponse({'results': results})
 
@@ -401,24 +346,26 @@ class UserProfileView(View):
         return render(request, 'accounts/profile_detail.html', {'viewed_user': user_to_view})
 
 
-@login_required
+@principal_required
 @require_POST
 def mark_notifications_as_read(request):
-    request.user.notifications.filter(is_read=False).update(is_read=True)
+    from .notifications import mark_all_read
+    mark_all_read(request.principal.id)
     return JsonResponse({'success': True})
 
 
-@login_required
+@principal_required
 @require_POST
 def mark_notification_as_read(request, notification_id):
     """Mark a single notification as read."""
+    from .notifications import unread_count as cached_unread_count
     try:
-        notification = request.user.notifications.get(id=notification_id)
+        notification = Notification.objects.get(recipient_id=request.principal.id, id=notification_id)
         notification.is_read = True
         notification.save()
         
         # Get updated count
-        unread_count = request.user.notifications.filter(is_read=False).count()
+        unread_count = cached_unread_count(request.principal.id)
         
         return JsonResponse({
             'success': True,
@@ -428,6 +375,15 @@ def mark_notification_as_read(request, notification_id):
         return JsonResponse({'success': False, 'error': 'Notification not found'}, status=404)
 
 
+@principal_required
+def presence_snapshot(request):
+    """Who in the user's organization is not offline, as ``{status: [user ids]}``."""
+    from . import presence
+    if not request.principal.organization_id:
+        return JsonResponse({'statuses': {}})
+    return JsonResponse({'statuses': presence.snapshot(request.principal.organization_id)})
+
+
 @login_required
 def toggle_theme(request):
     """Toggle user's theme between light and dark."""
@@ -1,8 +1,9 @@
 from rest_framework import viewsets, permissions, filters
+from connectflow.api import SparseFieldsetMixin
 from apps.chat_channels.models import Call, CallParticipant
 from .serializers import CallSerializer, CallParticipantSerializer
 
-class CallViewSet(viewsets.ModelViewSet):
+class CallViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Call.objects.all()
     serializer_class = CallSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -16,7 +17,7 @@ class CallViewSet(viewsets.ModelViewSet):
             participants=self.request.user
         ).distinct()
 
-class CallParticipantViewSet(viewsets.ModelViewSet):
+class CallParticipantViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = CallParticipant.objects.all()
     serializer_class = CallParticipantSerializer
     permission_classes = [permissions.IsAuthenticated]
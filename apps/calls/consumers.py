@@ -1,13 +1,15 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from connectflow.metrics import ConsumerMetricsMixin
+from connectflow.query_budget import QueryBudgetConsumerMixin
 from django.contrib.auth import get_user_model
 from apps.chat_channels.models import Call, CallParticipant, Channel
 
 User = get_user_model()
 
 
-class CallConsumer(AsyncWebsocketConsumer):
+class CallConsumer(ConsumerMetricsMixin, QueryBudgetConsumerMixin, AsyncWebsocketConsumer):
     """
     WebRTC signaling consumer for voice/video calls.
     Handles WebRTC signaling (SDP offer/answer, ICE candidates).
@@ -74,42 +74,25 @@ def initiate_call(request):
         call.save()
         
         # Send notifications to all participants (except initiator)
-        from apps.accounts.models import Notification
-        from asgiref.sync import async_to_sync
-        from channels.layers import get_channel_layer
+        from apps.accounts.notifications import dispatch_notifications
         from django.urls import reverse
         
-        channel_layer = get_channel_layer()
         call_url = reverse('calls:call_room', kwargs={'call_id': str(call.id)})
         
-        # Get all invited participants except the initiator
-        invited_participants = call.participants.exclude(id=request.user.id)
-        
-        for participant in invited_participants:
-            # Create notification in database
-            notification = Notification.notify(
-                recipient=participant,
-                sender=request.user,
-                title=f"Incoming {call.get_call_type_display()}",
-                content=f"{request.user.get_full_name() or request.user.username} is calling you",
-                notification_type='CALL',
-                link=call_url
-            )
-            
-            # Send real-time notification via WebSocket
-            async_to_sync(channel_layer.group_send)(
-                f"notifications_{participant.id}",
-                {
-                    'type': 'send_notification',
-                    'id': str(notification.id),
-                    'title': notification.title,
-                    'content': notification.content,
-                    'notification_type': notification.notification_type,
-                    'link': notification.link,
-                    'call_id': str(call.id),
-                    'call_type': call.call_type,
-                }
-            )
+        # Notify all invited participants except the initiator
+        dispatch_notifications(
+            call.participants.all(),
+            title=f"Incoming {call.get_call_type_display()}",
+            content=f"{request.user.get_full_name() or request.user.username} is calling you",
+            notification_type='CALL',
+            sender=request.user,
+            link=call_url,
+            exclude=[request.user],
+            extra={
+                'call_id': str(call.id),
+                'call_type': call.call_type,
+            }
+        )
         
         return JsonResponse({
             'success': True,
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Channel, Message, MessageReaction, MessageReadReceipt
+from .models import Channel, ChannelReadCursor, Message, MessageReaction, MessageReadReceipt
 
 
 @admin.register(Channel)
@@ -101,3 +101,13 @@ class MessageReadReceiptAdmin(admin.ModelAdmin):
     def message_preview(self, obj):
         return f"{obj.message.content[:30]}..." if len(obj.message.content) > 30 else obj.message.content
     message_preview.short_description = 'Message'
+
+
+@admin.register(ChannelReadCursor)
+class ChannelReadCursorAdmin(admin.ModelAdmin):
+    """Admin interface for ChannelReadCursor model."""
+    
+    list_display = ('user', 'channel', 'last_read_at', 'updated_at')
+    search_fields = ('user__username', 'channel__name')
+    raw_id_fields = ('last_read_message',)
+    readonly_fields = ('id', 'updated_at')
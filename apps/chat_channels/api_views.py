@@ -1,8 +1,16 @@
-from rest_framework import viewsets, permissions, status
+import uuid
+from django.shortcuts import get_object_or_404
+from rest_framework import mixins, viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied
-from .models import Channel, Message, Attachment, MessageReaction, MessageReadReceipt, ChannelNotificationSettings
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from connectflow.api import ConditionalMixin, SparseFieldsetMixin
+from apps.accounts.models import User
+from .models import (
+    Channel, ChannelEvent, ChannelStats, Message, Attachment, MessageReaction, ChannelReadCursor,
+    ChannelNotificationSettings
+)
+from . import search
 from .serializers import (
     ChannelSerializer, MessageSerializer, AttachmentSerializer, 
     MessageReactionSerializer, MessageReadReceiptSerializer, 
@@ -12,18 +20,33 @@ from .serializers import (
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
-class ChannelViewSet(viewsets.ModelViewSet):
+class ChannelViewSet(ConditionalMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = ChannelSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Display names of direct messages come from the other member
+    version_models = (Channel, ChannelStats, ChannelReadCursor, Channel.members.through, User)
 
     def get_queryset(self):
         from django.db.models import Count
-        return Channel.objects.filter(
+        # Annotate before filtering on members, or the count reuses the
+        # filter's join and only ever sees the requesting user
+        channels = Channel.objects.annotate(
+            member_count_annotated=Count('members')
+        ).filter(
             members=self.request.user, 
             is_archived=False
-        ).prefetch_related('members').annotate(
-            member_count_annotated=Count('members')
-        ).order_by('-created_at')
+        ).select_related('stats').prefetch_related('members').order_by('-created_at')
+        return ChannelReadCursor.annotate_unread_counts(channels, self.request.user)
+
+    def get_version_aggregates(self, model):
+        from django.db.models import Max, Sum
+        return {
+            **super().get_version_aggregates(model),
+            'activity': Max('stats__updated_at'),
+            'member_total': Sum('member_count_annotated'),
+            'member_profiles': Max('members__updated_at'),
+            'unread_total': Sum('unread_count'),
+        }
 
     def perform_create(self, serializer):
         channel = serializer.save(created_by=self.request.user)
@@ -32,16 +55,25 @@ class ChannelViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def messages(self, request, pk=None):
         channel = self.get_object()
-        messages = Message.objects.filter(channel=channel, parent_message__isnull=True).order_by('-is_pinned', 'created_at')
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        # Cursor pages newest first; pinning is a boolean and can't be paged on
+        messages = MessageSerializer.setup_queryset(
+            Message.objects.filter(channel=channel, parent_message__isnull=True),
+            request.user
+        ).order_by('-created_at')
+        page = self.paginate_queryset(messages)
+        serializer = MessageSerializer(page, many=True, context={'request': request})
+        return self.get_paginated_response(serializer.data)
 
-class MessageViewSet(viewsets.ModelViewSet):
+class MessageViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
+    max_page_size = 100
 
     def get_queryset(self):
-        return Message.objects.filter(channel__members=self.request.user)
+        messages = Message.objects.filter(channel__members=self.request.user)
+        if self.action in ('list', 'retrieve'):
+            messages = MessageSerializer.setup_queryset(messages, self.request.user)
+        return messages
 
     def perform_create(self, serializer):
         serializer.save(sender=self.request.user)
@@ -75,6 +107,41 @@ class MessageViewSet(viewsets.ModelViewSet):
         
         return Response({'status': status, 'is_starred': status == 'starred'})
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Ranked full-text search across every channel the user can view."""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Search query required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+        except ValueError:
+            limit = 20
+
+        messages = Message.objects.filter(channel__in=Channel.objects.visible_to(request.user))
+        channel_id = request.query_params.get('channel')
+        if channel_id:
+            try:
+                channel_id = uuid.UUID(channel_id)
+            except ValueError:
+                return Response({'error': 'Invalid channel id'}, status=status.HTTP_400_BAD_REQUEST)
+            messages = messages.filter(channel_id=channel_id)
+
+        results = search.search_messages(messages, query, limit=limit)
+        return Response([
+            {
+                'id': str(result.message.id),
+                'channel_id': str(result.message.channel_id),
+                'channel_name': result.message.channel.name,
+                'sender_id': result.message.sender_id,
+                'sender_name': result.message.sender.get_full_name() or result.message.sender.username,
+                'created_at': result.message.created_at,
+                'rank': result.rank,
+                'snippet': result.snippet,
+            }
+            for result in results
+        ])
+
     @action(detail=True, methods=['post'])
     def forward(self, request, pk=None):
         message = self.get_object()
@@ -319,13 +386,14 @@ class MessageViewSet(viewsets.ModelViewSet):
         elif event_type == 'message_deleted':
             data['deleted_at'] = message.deleted_at.isoformat() if message.deleted_at else None
             data['deleted_by'] = self.request.user.id
-            
+
+        ChannelEvent.record(message.channel_id, data)
         async_to_sync(channel_layer.group_send)(
             f'chat_{channel_id}',
             data
         )
 
-class AttachmentViewSet(viewsets.ReadOnlyModelViewSet):
+class AttachmentViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = AttachmentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -335,7 +403,7 @@ class AttachmentViewSet(viewsets.ReadOnlyModelViewSet):
             message__is_deleted=False
         )
 
-class MessageReactionViewSet(viewsets.ModelViewSet):
+class MessageReactionViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = MessageReactionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -345,17 +413,46 @@ class MessageReactionViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class MessageReadReceiptViewSet(viewsets.ModelViewSet):
+class MessageReadReceiptViewSet(SparseFieldsetMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Compatibility endpoint for per-message read receipts.
+
+    Receipts are derived from ChannelReadCursor: listing returns one entry per
+    channel the user has read (its high-water mark), ``?message=<id>`` returns
+    everyone who has read that message, and creating a receipt advances the
+    user's cursor in the message's channel.
+    """
     serializer_class = MessageReadReceiptSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return MessageReadReceipt.objects.filter(user=self.request.user)
-
-    def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        message_id = self.request.query_params.get('message')
+        if message_id:
+            try:
+                message_id = uuid.UUID(message_id)
+            except ValueError:
+                raise ValidationError({'message': 'Invalid message id'})
+            message = get_object_or_404(
+                Message, pk=message_id, channel__members=self.request.user
+            )
+            return ChannelReadCursor.readers_of(message)
+        return ChannelReadCursor.objects.filter(
+            user=self.request.user
+        ).select_related('user')
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        message = serializer.validated_data['last_read_message']
+        if not message.channel.members.filter(pk=request.user.pk).exists():
+            raise PermissionDenied("You are not a member of this channel.")
+        ChannelReadCursor.advance(request.user, message)
+        cursor = ChannelReadCursor.objects.select_related('user').get(
+            user=request.user, channel_id=message.channel_id
+        )
+        return Response(self.get_serializer(cursor).data, status=status.HTTP_201_CREATED)
 
-class ChannelNotificationSettingsViewSet(viewsets.ModelViewSet):
+class ChannelNotificationSettingsViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = ChannelNotificationSettingsSerializer
     permission_classes = [permissions.IsAuthenticated]
 
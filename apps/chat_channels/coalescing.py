@@ -0,0 +1,139 @@
+"""
+Per-connection coalescing of high-frequency websocket frames.
+
+Fast scrolling produces a ``message_read`` frame per message and typing
+produces a stream of ``typing`` toggles. Rather than writing to the database
+and fanning out on the channel layer for each frame, ChatConsumer buffers
+them here and flushes on a short timer:
+
+* read acknowledgements collapse into a single highest-watermark event;
+* typing state is debounced so only actual state changes (plus a periodic
+  keep-alive while the user keeps typing) reach the room.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from connectflow.metrics import COALESCER_FLUSHES, COALESCER_FRAMES
+
+
+logger = logging.getLogger(__name__)
+
+READ_WINDOW = getattr(settings, 'CHAT_READ_COALESCE_WINDOW', 1.0)
+TYPING_WINDOW = getattr(settings, 'CHAT_TYPING_COALESCE_WINDOW', 0.3)
+TYPING_REFRESH_INTERVAL = getattr(settings, 'CHAT_TYPING_REFRESH_INTERVAL', 3.0)
+
+
+class EventCoalescer:
+    """
+    Buffers read and typing frames for one websocket connection.
+
+    ``flush_reads`` is awaited with the set of message ids acknowledged since
+    the last flush; ``flush_typing`` is awaited with the typing state to
+    broadcast. A window of ``0`` disables buffering for that event kind.
+    """
+
+    def __init__(self, flush_reads, flush_typing, read_window=None,
+                 typing_window=None, typing_refresh=None):
+        self._flush_reads = flush_reads
+        self._flush_typing = flush_typing
+        self.read_window = READ_WINDOW if read_window is None else read_window
+        self.typing_window = TYPING_WINDOW if typing_window is None else typing_window
+        self.typing_refresh = TYPING_REFRESH_INTERVAL if typing_refresh is None else typing_refresh
+
+        self._pending_reads = set()
+        self._pending_typing = None
+        self._sent_typing = False
+        self._sent_typing_at = 0.0
+        self._timers = {}
+        self._flushing = set()
+        self.stats = Counter()
+
+    def _count(self, key):
+        self.stats[key] += 1
+        kind, stage = key.split('_')
+        (COALESCER_FRAMES if stage == 'frames' else COALESCER_FLUSHES).inc(kind=kind)
+
+    @property
+    def collapsed(self):
+        """Number of frames absorbed without producing an event of their own."""
+        return {
+            'read': self.stats['read_frames'] - self.stats['read_flushes'],
+            'typing': self.stats['typing_frames'] - self.stats['typing_flushes'],
+        }
+
+    async def add_read(self, message_id):
+        self._count('read_frames')
+        self._pending_reads.add(message_id)
+        await self._schedule('read', self.read_window, self.flush_reads)
+
+    async def set_typing(self, is_typing):
+        self._count('typing_frames')
+        self._pending_typing = bool(is_typing)
+        await self._schedule('typing', self.typing_window, self.flush_typing)
+
+    async def _schedule(self, kind, window, flush):
+        if window <= 0:
+            await flush()
+            return
+        if kind in self._timers:
+            return
+        self._timers[kind] = asyncio.create_task(self._flush_later(kind, window, flush))
+
+    async def _flush_later(self, kind, window, flush):
+        try:
+            await asyncio.sleep(window)
+        finally:
+            self._timers.pop(kind, None)
+        # No longer cancellable by close(), which waits for it instead
+        task = asyncio.current_task()
+        self._flushing.add(task)
+        try:
+            await flush()
+        except Exception:
+            logger.exception('Coalesced %s flush failed', kind)
+        finally:
+            self._flushing.discard(task)
+
+    async def flush_reads(self):
+        if not self._pending_reads:
+            return
+        message_ids, self._pending_reads = self._pending_reads, set()
+        self._count('read_flushes')
+        try:
+            await self._flush_reads(message_ids)
+        except Exception:
+            # Keep them for the next flush (or close)
+            self._pending_reads |= message_ids
+            raise
+
+    async def flush_typing(self):
+        if self._pending_typing is None:
+            return
+        is_typing, self._pending_typing = self._pending_typing, None
+        now = time.monotonic()
+        if is_typing == self._sent_typing:
+            # Nothing changed; only re-announce a long typing streak so
+            # receivers don't time the indicator out.
+            if not is_typing or now - self._sent_typing_at < self.typing_refresh:
+                return
+        self._sent_typing = is_typing
+        self._sent_typing_at = now
+        self._count('typing_flushes')
+        await self._flush_typing(is_typing)
+
+    async def close(self):
+        """Cancel timers, wait for running flushes and flush whatever is still buffered."""
+        for task in list(self._timers.values()):
+            task.cancel()
+        self._timers.clear()
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+        await self.flush_reads()
+        if self._sent_typing:
+            self._pending_typing = False
+            await self.flush_typing()
@@ -1,13 +1,27 @@
-import json
+import uuid
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from connectflow.metrics import ConsumerMetricsMixin
+from connectflow.query_budget import QueryBudgetConsumerMixin
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from .models import Channel, Message
+from django.utils.dateparse import parse_datetime
+from apps.accounts import presence
+from .models import Channel, ChannelEvent, Message
+from .coalescing import EventCoalescer
+from .jobs import prune_channel_events_if_due
+from . import protocol
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
-class ChatConsumer(AsyncWebsocketConsumer):
+class ChatConsumer(ConsumerMetricsMixin, QueryBudgetConsumerMixin, AsyncWebsocketConsumer):
+    # Event types written to ChannelEvent and replayed on "resume"
+    REPLAYED_EVENTS = frozenset({
+        'chat_message', 'message_update', 'message_deleted',
+        'message_reaction_update', 'message_pinned', 'message_unpinned',
+    })
+
     async def connect(self):
         self.channel_id = self.scope['url_route']['kwargs']['channel_id']
         self.room_group_name = f'chat_{self.channel_id}'
@@ -28,10 +42,26 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
 
-        await self.accept()
+        # Legacy JSON unless the client offers a compact subprotocol
+        self.codec = protocol.negotiate(self.scope.get('subprotocols'))
+        await self.accept(subprotocol=self.codec.subprotocol)
+
+        # Read acks and typing toggles are buffered and flushed on a short timer
+        self.coalescer = EventCoalescer(
+            flush_reads=self.flush_read_acks,
+            flush_typing=self.flush_typing_state
+        )
 
-        # Update user status to ONLINE
-        await self.update_user_status('ONLINE')
+        # Count this socket in the presence registry and show the room the
+        # user's current status (ONLINE, or a manual AWAY / BUSY)
+        status = await self.update_user_status(connected=True)
+        self.registered = True
+        presence.ensure_tasks()
+        # The resume log grows by one row per broadcast; trim it periodically
+        presence.ensure_task(
+            'prune_channel_events', 'CHAT_EVENT_PRUNE_INTERVAL', 3600,
+            database_sync_to_async(prune_channel_events_if_due)
+        )
         
         # Broadcast presence
         await self.channel_layer.group_send(
@@ -39,39 +69,46 @@ class ChatConsumer(AsyncWebsocketConsumer):
             {
                 'type': 'user_status_change',
                 'user_id': self.user.id,
-                'status': 'ONLINE'
+                'status': status
             }
         )
 
     async def disconnect(self, close_code):
         # Leave room group
+        if hasattr(self, 'coalescer'):
+            await self.coalescer.close()
+
         if hasattr(self, 'room_group_name'):
             await self.channel_layer.group_discard(
                 self.room_group_name,
                 self.channel_name
             )
 
-            # Update user status to OFFLINE
-            await self.update_user_status('OFFLINE')
-            
-            # Broadcast presence
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'user_status_change',
-                    'user_id': self.user.id,
-                    'status': 'OFFLINE'
-                }
-            )
+        if getattr(self, 'registered', False):
+            # Only the user's last socket takes them offline
+            status = await self.update_user_status(connected=False)
+            if status == presence.OFFLINE:
+                await self.channel_layer.group_send(
+                    self.room_group_name,
+                    {
+                        'type': 'user_status_change',
+                        'user_id': self.user.id,
+                        'status': status
+                    }
+                )
+
+    async def send_frame(self, frame):
+        for payload in self.codec.encode(frame):
+            await self.send(**payload)
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         try:
-            data = json.loads(text_data)
-        except json.JSONDecodeError:
-            await self.send(text_data=json.dumps({
+            data = self.codec.decode(text_data, bytes_data)
+        except protocol.ProtocolError:
+            await self.send_frame({
                 'type': 'error',
                 'message': 'Invalid message format'
-            }))
+            })
             return
         
         message_type = data.get('type', 'chat_message')
@@ -85,10 +122,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
             
             # Validate message content
             if not content and not voice_url and not attachments:
-                await self.send(text_data=json.dumps({
+                await self.send_frame({
                     'type': 'error',
                     'message': 'Message cannot be empty'
-                }))
+                })
                 return
             
             # Get org name safely
@@ -122,21 +159,44 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 # Update status if needed
                 await self.update_message_type_status(message_id, broadcast_data['message_type'], 'SENT')
                 
-                await self.channel_layer.group_send(self.room_group_name, broadcast_data)
+                await self.publish(broadcast_data)
             elif content or voice_url:
-                # New message to save
+                # New message to save; a retried frame carries the same client_key
+                client_key = data.get('client_key')
+                if not isinstance(client_key, str) or not 0 < len(client_key) <= 64:
+                    client_key = None
                 msg_type = broadcast_data['message_type']
-                saved_message = await self.save_message(content, parent_id, msg_type)
+                saved_message, created = await self.save_message(content, parent_id, msg_type, client_key)
                 broadcast_data['message_id'] = str(saved_message.id)
                 broadcast_data['timestamp'] = saved_message.created_at.strftime('%b %d, %I:%M %p')
                 if parent_id:
                     broadcast_data['parent_details'] = await self.get_message_summary(parent_id)
+
+                if client_key:
+                    await self.send_frame({
+                        'type': 'ack',
+                        'client_key': client_key,
+                        'message_id': broadcast_data['message_id'],
+                        'timestamp': broadcast_data['timestamp'],
+                        'created_at': saved_message.created_at.isoformat(),
+                        'duplicate': not created
+                    })
+
+                if not created:
+                    if saved_message.is_deleted:
+                        # Deleted since the first send; the ack is all the retry needs
+                        return
+                    # Already fanned out: hand the stored message back to this socket only
+                    broadcast_data['message'] = saved_message.content
+                    broadcast_data['message_type'] = saved_message.message_type
+                    await self.chat_message(broadcast_data)
+                    return
                 
                 # Trigger notifications
                 await self.trigger_notifications(saved_message)
                 
                 # Send to room
-                await self.channel_layer.group_send(self.room_group_name, broadcast_data)
+                await self.publish(broadcast_data)
 
         elif message_type == 'message_edit':
             message_id = data.get('message_id')
@@ -146,8 +206,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 success = await self.edit_message(message_id, content)
                 if success:
                     # Send updated message to room group
-                    await self.channel_layer.group_send(
-                        self.room_group_name,
+                    await self.publish(
                         {
                             'type': 'message_update',
                             'message_id': message_id,
@@ -159,8 +218,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             if message_id:
                 success, deleted_at = await self.delete_message(message_id)
                 if success:
-                    await self.channel_layer.group_send(
-                        self.room_group_name,
+                    await self.publish(
                         {
                             'type': 'message_deleted',
                             'message_id': message_id,
@@ -171,39 +229,29 @@ class ChatConsumer(AsyncWebsocketConsumer):
         elif message_type == 'message_read':
             message_id = data.get('message_id')
             if message_id:
-                await self.mark_message_read(message_id)
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'message_read_receipt',
-                        'message_id': message_id,
-                        'user_id': self.user.id
-                    }
-                )
+                await self.coalescer.add_read(message_id)
         elif message_type == 'message_reaction':
             message_id = data.get('message_id')
             emoji = data.get('emoji')
             if message_id and emoji:
-                reaction_data = await self.toggle_reaction(message_id, emoji)
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'message_reaction_update',
-                        'message_id': message_id,
-                        'reactions': reaction_data
-                    }
-                )
+                change = await self.toggle_reaction(message_id, emoji)
+                if change:
+                    # Only the changed emoji goes out; count makes replays idempotent
+                    delta, count = change
+                    await self.publish(
+                        {
+                            'type': 'message_reaction_update',
+                            'message_id': message_id,
+                            'emoji': emoji,
+                            'delta': delta,
+                            'count': count,
+                            'user_id': self.user.id
+                        }
+                    )
         elif message_type == 'typing':
-            # Send typing indicator to room group (excluding the sender)
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'user_typing',
-                    'sender_id': self.user.id,
-                    'sender_name': self.user.get_full_name(),
-                    'is_typing': data.get('is_typing', False)
-                }
-            )
+            await self.coalescer.set_typing(data.get('is_typing', False))
+        elif message_type == 'resume':
+            await self.resume(data.get('last_event_id'), data.get('since'))
         elif message_type == 'forward_message':
             # Handle message forwarding
             message_id = data.get('message_id')
@@ -213,14 +261,73 @@ class ChatConsumer(AsyncWebsocketConsumer):
             if message_id and target_channel:
                 forwarded_msg = await self.forward_message(message_id, target_channel, content)
                 if forwarded_msg:
-                    await self.send(text_data=json.dumps({
+                    await self.send_frame({
                         'type': 'forward_success',
                         'message': 'Message forwarded successfully'
-                    }))
+                    })
+
+    async def publish(self, event):
+        """Broadcast a room event, logging it first so reconnecting clients can resume."""
+        await self.record_event(event)
+        await self.channel_layer.group_send(self.room_group_name, event)
+
+    async def resume(self, last_event_id=None, since=None):
+        """Replay the logged events a reconnecting client missed."""
+        try:
+            last_event_id = int(last_event_id) if last_event_id is not None else None
+        except (TypeError, ValueError):
+            last_event_id = None
+        try:
+            timestamp = parse_datetime(since) if isinstance(since, str) else None
+        except ValueError:
+            # Well formed but out of range: the client gets a full reset
+            timestamp = None
+        if timestamp is not None and timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+
+        events = await self.get_events_since(last_event_id, timestamp)
+        if events is None:
+            # Too far behind for the log: the client reloads the page instead
+            await self.send_frame({'type': 'resume_reset'})
+            return
+
+        for event in events:
+            if event['type'] in self.REPLAYED_EVENTS:
+                await getattr(self, event['type'])(event)
+        await self.send_frame({
+            'type': 'resume_complete',
+            'event_id': events[-1]['event_id'] if events else last_event_id
+        })
+
+    async def flush_read_acks(self, message_ids):
+        # Collapse a burst of read acks into the newest message only
+        message_id = await self.mark_messages_read(message_ids)
+        if message_id:
+            # Only broadcast when the read cursor actually moved forward
+            await self.channel_layer.group_send(
+                self.room_group_name,
+                {
+                    'type': 'message_read_receipt',
+                    'message_id': message_id,
+                    'user_id': self.user.id
+                }
+            )
+
+    async def flush_typing_state(self, is_typing):
+        # Send typing indicator to room group (excluding the sender)
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'user_typing',
+                'sender_id': self.user.id,
+                'sender_name': self.user.get_full_name(),
+                'is_typing': is_typing
+            }
+        )
 
     async def chat_message(self, event):
         # Send message to WebSocket
-        await self.send(text_data=json.dumps({
+        await self.send_frame({
             'type': 'chat_message',
             'message': event.get('message', ''),
             'message_type': event.get('message_type', 'TEXT'),
@@ -235,155 +342,151 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'attachments': event.get('attachments', []),
             'is_pinned': event.get('is_pinned', False),
             'is_starred': event.get('is_starred', False),
-            'parent_details': event.get('parent_details')
-        }))
+            'parent_details': event.get('parent_details'),
+            'event_id': event.get('event_id')
+        })
 
     async def user_typing(self, event):
         # Send typing indicator to WebSocket (only if it's not the sender themselves)
         if event['sender_id'] != self.user.id:
-            await self.send(text_data=json.dumps({
+            await self.send_frame({
                 'type': 'typing',
                 'sender_id': event['sender_id'],
                 'sender_name': event['sender_name'],
                 'is_typing': event['is_typing']
-            }))
+            })
 
     async def message_update(self, event):
         # Send message update to WebSocket
-        await self.send(text_data=json.dumps({
+        await self.send_frame({
             'type': 'message_update',
             'message_id': event['message_id'],
-            'message': event['message']
-        }))
+            'message': event['message'],
+            'event_id': event.get('event_id')
+        })
 
     async def message_deleted(self, event):
         # Send message deletion to WebSocket
-        await self.send(text_data=json.dumps({
+        await self.send_frame({
             'type': 'message_delete',
             'message_id': event['message_id'],
             'deleted_at': event.get('deleted_at'),
-            'deleted_by': event.get('deleted_by')
-        }))
+            'deleted_by': event.get('deleted_by'),
+            'event_id': event.get('event_id')
+        })
 
     async def message_read_receipt(self, event):
-        await self.send(text_data=json.dumps({
+        await self.send_frame({
             'type': 'read_receipt',
             'message_id': event['message_id'],
             'user_id': event['user_id']
-        }))
+        })
 
     async def message_reaction_update(self, event):
-        await self.send(text_data=json.dumps({
+        await self.send_frame({
             'type': 'reaction_update',
             'message_id': event['message_id'],
-            'reactions': event['reactions']
-        }))
+            'emoji': event['emoji'],
+            'delta': event['delta'],
+            'count': event['count'],
+            'user_id': event['user_id'],
+            'event_id': event.get('event_id')
+        })
 
     async def message_pinned(self, event):
-        await self.send(text_data=json.dumps({
+        await self.send_frame({
             'type': 'message_pinned',
             'message_id': event['message_id'],
-            'is_pinned': True
-        }))
+            'is_pinned': True,
+            'event_id': event.get('event_id')
+        })
 
     async def message_unpinned(self, event):
-        await self.send(text_data=json.dumps({
+        await self.send_frame({
             'type': 'message_unpinned',
             'message_id': event['message_id'],
-            'is_pinned': False
-        }))
+            'is_pinned': False,
+            'event_id': event.get('event_id')
+        })
 
     async def user_status_change(self, event):
         # Send status change to WebSocket
-        await self.send(text_data=json.dumps({
+        await self.send_frame({
             'type': 'presence',
             'user_id': event['user_id'],
             'status': event['status']
-        }))
+        })
 
     async def trigger_notifications(self, message):
         """Logic to determine who needs a notification for this new message."""
-        from apps.accounts.models import Notification, User
+        from apps.accounts.notifications import broadcast_notifications
+
+        notifications = await self.create_message_notifications(message)
+        await broadcast_notifications(notifications)
+
+    @database_sync_to_async
+    def create_message_notifications(self, message):
+        """Create mention, reply and direct message notifications in bulk."""
+        from apps.accounts.notifications import create_notifications
         from django.urls import reverse
         import re
-        
-        channel = await database_sync_to_async(lambda: message.channel)()
-        channel_type = await database_sync_to_async(lambda: channel.channel_type)()
+
+        channel = message.channel
         channel_url = reverse('chat_channels:channel_detail', kwargs={'pk': str(channel.id)})
-        
+        sender_name = self.user.get_full_name()
+        notified = {self.user.id} # Track who we've notified to avoid duplicates
+        notifications = []
+
         # 1. Handle Mentions (@username)
-        mentions = re.findall(r'@(\w+)', message.content)
-        recipient_ids = set() # Track who we've notified to avoid duplicates
-        
+        mentions = set(re.findall(r'@(\w+)', message.content))
         if mentions:
-            for username in set(mentions):
-                try:
-                    recipient = await database_sync_to_async(User.objects.get)(username=username)
-                    if recipient.id != self.user.id:
-                        notification = await database_sync_to_async(Notification.notify)(
-                            recipient=recipient,
-                            sender=self.user,
-                            title=f"Mentioned in #{channel.name}",
-                            content=f"{self.user.get_full_name()} mentioned you: {message.content[:50]}...",
-                            notification_type='MENTION',
-                            link=channel_url
-                        )
-                        await self.broadcast_notification(recipient.id, notification)
-                        recipient_ids.add(recipient.id)
-                except User.DoesNotExist:
-                    continue
-                except Exception: # nosec
-                    # Log unexpected errors if needed, but continue to next mention
-                    continue
-        
+            mentioned = set(
+                User.objects.filter(username__in=mentions).values_list('id', flat=True)
+            ) - notified
+            notifications += create_notifications(
+                mentioned,
+                title=f"Mentioned in #{channel.name}",
+                content=f"{sender_name} mentioned you: {message.content[:50]}...",
+                notification_type='MENTION',
+                sender=self.user,
+                link=channel_url
+            )
+            notified |= mentioned
+
         # 2. Handle Replies (Notify original sender)
-        parent = await database_sync_to_async(lambda: message.parent_message)()
-        if parent:
-            parent_sender = await database_sync_to_async(lambda: parent.sender)()
-            if parent_sender.id != self.user.id and parent_sender.id not in recipient_ids:
-                notification = await database_sync_to_async(Notification.notify)(
-                    recipient=parent_sender,
-                    sender=self.user,
-                    title=f"New reply in #{channel.name}",
-                    content=f"{self.user.get_full_name()} replied to your message: {message.content[:50]}...",
-                    notification_type='MESSAGE',
-                    link=channel_url
-                )
-                await self.broadcast_notification(parent_sender.id, notification)
-                recipient_ids.add(parent_sender.id)
+        parent = message.parent_message
+        if parent and parent.sender_id and parent.sender_id not in notified:
+            notifications += create_notifications(
+                [parent.sender_id],
+                title=f"New reply in #{channel.name}",
+                content=f"{sender_name} replied to your message: {message.content[:50]}...",
+                notification_type='MESSAGE',
+                sender=self.user,
+                link=channel_url
+            )
+            notified.add(parent.sender_id)
 
         # 3. Handle Direct Messages (Notify the other person if not already notified)
-        if channel_type == 'DIRECT':
-            other_members = await database_sync_to_async(
-                lambda: list(channel.members.exclude(id=self.user.id))
-            )()
-            
-            for recipient in other_members:
-                if recipient.id not in recipient_ids:
-                    notification = await database_sync_to_async(Notification.notify)(
-                        recipient=recipient,
-                        sender=self.user,
-                        title=f"New message from {self.user.get_full_name()}",
-                        content=message.content[:100],
-                        notification_type='MESSAGE',
-                        link=channel_url
-                    )
-                    await self.broadcast_notification(recipient.id, notification)
+        if channel.channel_type == 'DIRECT':
+            notifications += create_notifications(
+                channel.members.all(),
+                title=f"New message from {sender_name}",
+                content=message.content[:100],
+                notification_type='MESSAGE',
+                sender=self.user,
+                link=channel_url,
+                exclude=notified
+            )
 
-    async def broadcast_notification(self, recipient_id, notification):
-        """Send a notification message to a specific user's notification group."""
-        await self.channel_layer.group_send(
-            f"notifications_{recipient_id}",
-            {
-                'type': 'send_notification',
-                'id': str(notification.id),
-                'title': notification.title,
-                'content': notification.content,
-                'notification_type': notification.notification_type,
-                'link': notification.link,
-                'created_at': "Just now"
-            }
-        )
+        return notifications
+
+    @database_sync_to_async
+    def record_event(self, event):
+        return ChannelEvent.record(self.channel_id, event)
+
+    @database_sync_to_async
+    def get_events_since(self, last_event_id, timestamp):
+        return ChannelEvent.since(self.channel_id, last_event_id=last_event_id, timestamp=timestamp)
 
     @database_sync_to_async
     def get_user_org_name(self):
@@ -393,10 +496,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def check_channel_access(self):
+        # Answered from the cached visibility set; no channel fetch needed
+        from .visibility import visible_channel_ids
         try:
-            channel = Channel.objects.get(id=self.channel_id)
-            return channel.can_user_view(self.user)
-        except Channel.DoesNotExist:
+            return uuid.UUID(str(self.channel_id)) in visible_channel_ids(self.user)
+        except ValueError:
             return False
 
     @database_sync_to_async
@@ -412,7 +516,15 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return None
 
     @database_sync_to_async
-    def save_message(self, content, parent_id=None, message_type='TEXT'):
+    def save_message(self, content, parent_id=None, message_type='TEXT', client_key=None):
+        """Returns ``(message, created)``; a known ``client_key`` returns the stored message."""
+        if client_key:
+            existing = Message.all_objects.filter(
+                sender=self.user, channel_id=self.channel_id, client_key=client_key
+            ).first()
+            if existing:
+                return existing, False
+
         channel = Channel.objects.get(id=self.channel_id)
         parent = None
         if parent_id:
@@ -421,39 +533,25 @@ class ChatConsumer(AsyncWebsocketConsumer):
             except Message.DoesNotExist:
                 pass
         
-        # Auto-detect emoji-only messages if type is TEXT
-        if message_type == 'TEXT' and content:
-            import re
-            emoji_pattern = re.compile(
-                "["
-                "\U0001F600-\U0001F64F"  # emoticons
-                "\U0001F300-\U0001F5FF"  # symbols & pictographs
-                "\U0001F680-\U0001F6FF"  # transport & map symbols
-                "\U0001F1E0-\U0001F1FF"  # flags (iOS)
-                "\U00002702-\U000027B0"  # dingbats
-                "\U000024C2-\U0001F251"
-                "\U0001F900-\U0001F9FF"  # supplemental symbols
-                "\U0001FA00-\U0001FA6F"  # extended symbols
-                "\U00002600-\U000026FF"  # miscellaneous symbols
-                "\U00002700-\U000027BF"  # dingbats
-                "\U0001F191-\U0001F19A"  # enclosed characters
-                "]+", 
-                flags=re.UNICODE
-            )
-            text_without_emoji = emoji_pattern.sub('', content.strip()).strip()
-            has_emojis = bool(emoji_pattern.search(content))
-            
-            # If only emojis and no other text, mark as EMOJI type
-            if has_emojis and not text_without_emoji:
-                message_type = 'EMOJI'
-                
-        return Message.objects.create(
-            channel=channel,
-            sender=self.user,
-            content=content,
-            parent_message=parent,
-            message_type=message_type
-        )
+        # Message.save settles TEXT vs EMOJI from the content
+        try:
+            with transaction.atomic():
+                message = Message.objects.create(
+                    channel=channel,
+                    sender=self.user,
+                    content=content,
+                    parent_message=parent,
+                    message_type=message_type,
+                    client_key=client_key
+                )
+        except IntegrityError:
+            if not client_key:
+                raise
+            # A concurrent retry won the race for this key
+            return Message.all_objects.get(
+                sender=self.user, channel_id=self.channel_id, client_key=client_key
+            ), False
+        return message, True
 
     @database_sync_to_async
     def update_message_type_status(self, message_id, message_type, status):
@@ -491,9 +589,12 @@ class ChatConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def delete_message(self, message_id):
         try:
-            # Allow sender or admin to delete
+            # Allow sender or admin to delete; the role is read from the
+            # cached principal so a change applies to open sockets
+            from apps.accounts.principal import principal_for
             message = Message.objects.get(id=message_id)
-            if message.sender == self.user or self.user.is_admin:
+            principal = principal_for(self.user.id)
+            if message.sender_id == self.user.id or (principal is not None and principal.is_admin):
                 message.soft_delete(user=self.user) # Uses the soft delete implemented in models.py
                 return True, message.deleted_at
             return False, None
@@ -501,17 +602,20 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return False, None
 
     @database_sync_to_async
-    def mark_message_read(self, message_id):
-        from .models import MessageReadReceipt
+    def mark_messages_read(self, message_ids):
+        """Advance the read cursor to the newest of ``message_ids``; returns its id if it moved."""
+        from django.core.exceptions import ValidationError
+        from .models import ChannelReadCursor
         try:
-            message = Message.objects.get(id=message_id)
-            MessageReadReceipt.objects.get_or_create(
-                message=message,
-                user=self.user
-            )
-            return True
-        except Message.DoesNotExist:
-            return False
+            newest = Message.objects.filter(
+                id__in=message_ids,
+                channel_id=self.channel_id
+            ).order_by('-created_at', '-id').first()
+        except ValidationError:
+            return None
+        if newest and ChannelReadCursor.advance(self.user, newest):
+            return str(newest.id)
+        return None
 
     @database_sync_to_async
     def forward_message(self, message_id, target_channel_id, content):
@@ -546,22 +650,22 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def toggle_reaction(self, message_id, emoji):
+        """Returns ``(delta, count)`` for the emoji, or None for an unknown message."""
         from .models import MessageReaction
         try:
             message = Message.objects.get(id=message_id)
-            reaction, created = MessageReaction.objects.get_or_create(
-                message=message,
-                user=self.user,
-                emoji=emoji
-            )
-            if not created:
-                reaction.delete()
-            
-            # Return fresh summary
-            return message.reaction_summary
         except Message.DoesNotExist:
-            return {}
+            return None
+        return MessageReaction.toggle(message, self.user, emoji)
 
     @database_sync_to_async
-    def update_user_status(self, status):
-        User.objects.filter(id=self.user.id).update(status=status, last_seen=timezone.now())
+    def update_user_status(self, connected):
+        """Register or unregister this socket; returns the user's resulting status."""
+        org_id = self.user.organization_id
+        if connected:
+            if presence.connect(self.user.id):
+                presence.publish(org_id, self.user.id, presence.ONLINE)
+        elif presence.disconnect(self.user.id):
+            presence.publish(org_id, self.user.id, presence.OFFLINE)
+            return presence.OFFLINE
+        return presence.status_of(self.user.id)
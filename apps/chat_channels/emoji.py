@@ -0,0 +1,152 @@
+"""
+Emoji classification for chat messages.
+
+One precomputed table of Extended_Pictographic code point ranges, searched
+with ``bisect``, plus a small state machine for the sequences that make up a
+single visible emoji:
+
+* ZWJ sequences (👩‍💻, 👨‍👩‍👧) - pictographs joined by U+200D;
+* skin tone modifiers (👍🏽) and variation selectors (❤️);
+* flags - pairs of regional indicators (🇬🇭) and tag sequences (🏴󠁧󠁢󠁳󠁣󠁴󠁿);
+* keycaps (1️⃣, #️⃣).
+
+Message.save stores the result at write time (``message_type`` EMOJI and
+``emoji_count``), so templates never classify. ``python manage.py
+benchmark_emoji`` reports the per-message cost.
+"""
+
+from bisect import bisect_right
+
+# Extended_Pictographic, excluding regional indicators and skin tone
+# modifiers which are handled as sequence parts below.
+PICTOGRAPHIC_RANGES = (
+    (0x00A9, 0x00A9), (0x00AE, 0x00AE), (0x203C, 0x203C), (0x2049, 0x2049),
+    (0x2122, 0x2122), (0x2139, 0x2139), (0x2194, 0x2199), (0x21A9, 0x21AA),
+    (0x231A, 0x231B), (0x2328, 0x2328), (0x2388, 0x2388), (0x23CF, 0x23CF),
+    (0x23E9, 0x23F3), (0x23F8, 0x23FA), (0x24C2, 0x24C2), (0x25AA, 0x25AB),
+    (0x25B6, 0x25B6), (0x25C0, 0x25C0), (0x25FB, 0x25FE), (0x2600, 0x2605),
+    (0x2607, 0x2612), (0x2614, 0x2685), (0x2690, 0x2705), (0x2708, 0x2712),
+    (0x2714, 0x2714), (0x2716, 0x2716), (0x271D, 0x271D), (0x2721, 0x2721),
+    (0x2728, 0x2728), (0x2733, 0x2734), (0x2744, 0x2744), (0x2747, 0x2747),
+    (0x274C, 0x274C), (0x274E, 0x274E), (0x2753, 0x2755), (0x2757, 0x2757),
+    (0x2763, 0x2767), (0x2795, 0x2797), (0x27A1, 0x27A1), (0x27B0, 0x27B0),
+    (0x27BF, 0x27BF), (0x2934, 0x2935), (0x2B05, 0x2B07), (0x2B1B, 0x2B1C),
+    (0x2B50, 0x2B50), (0x2B55, 0x2B55), (0x3030, 0x3030), (0x303D, 0x303D),
+    (0x3297, 0x3297), (0x3299, 0x3299), (0x1F000, 0x1F0FF), (0x1F10D, 0x1F10F),
+    (0x1F12F, 0x1F12F), (0x1F16C, 0x1F171), (0x1F17E, 0x1F17F), (0x1F18E, 0x1F18E),
+    (0x1F191, 0x1F19A), (0x1F1AD, 0x1F1E5), (0x1F201, 0x1F20F), (0x1F21A, 0x1F21A),
+    (0x1F22F, 0x1F22F), (0x1F232, 0x1F23A), (0x1F23C, 0x1F23F), (0x1F249, 0x1F3FA),
+    (0x1F400, 0x1F53D), (0x1F546, 0x1F64F), (0x1F680, 0x1F6FF), (0x1F774, 0x1F77F),
+    (0x1F7D5, 0x1F7FF), (0x1F80C, 0x1F80F), (0x1F848, 0x1F84F), (0x1F85A, 0x1F85F),
+    (0x1F888, 0x1F88F), (0x1F8AE, 0x1F8FF), (0x1F90C, 0x1F93A), (0x1F93C, 0x1F945),
+    (0x1F947, 0x1FAFF), (0x1FC00, 0x1FFFD),
+)
+
+_STARTS = [start for start, _ in PICTOGRAPHIC_RANGES]
+_ENDS = [end for _, end in PICTOGRAPHIC_RANGES]
+
+# Below this, pictographs (©, ™, ↔ ...) default to text presentation and
+# only count as emoji when followed by VS16.
+_TEXT_DEFAULT_BELOW = 0x231A
+
+ZWJ = '\u200d'
+VS15 = '\ufe0e'
+VS16 = '\ufe0f'
+KEYCAP = '\u20e3'
+KEYCAP_BASES = frozenset('0123456789#*')
+
+_REGIONAL_FIRST, _REGIONAL_LAST = 0x1F1E6, 0x1F1FF
+_SKIN_FIRST, _SKIN_LAST = 0x1F3FB, 0x1F3FF
+_TAG_FIRST, _TAG_LAST = 0xE0020, 0xE007F
+
+
+def is_pictographic(cp):
+    if cp < 0xA9:
+        return False
+    i = bisect_right(_STARTS, cp) - 1
+    return i >= 0 and cp <= _ENDS[i]
+
+
+def _is_regional(cp):
+    return _REGIONAL_FIRST <= cp <= _REGIONAL_LAST
+
+
+def _modifiers_end(text, j):
+    """Skip skin tones, variation selectors and tags. Returns (end, saw_vs16)."""
+    saw_vs16 = False
+    n = len(text)
+    while j < n:
+        ch = text[j]
+        if ch == VS16:
+            saw_vs16 = True
+        elif ch != VS15:
+            cp = ord(ch)
+            if not (_SKIN_FIRST <= cp <= _SKIN_LAST or _TAG_FIRST <= cp <= _TAG_LAST):
+                break
+        j += 1
+    return j, saw_vs16
+
+
+def match_emoji(text, i):
+    """End index of the emoji sequence starting at ``text[i]``, or 0 if there is none."""
+    n = len(text)
+    ch = text[i]
+    cp = ord(ch)
+
+    if _is_regional(cp):
+        if i + 1 < n and _is_regional(ord(text[i + 1])):
+            return i + 2
+        return 0
+
+    if ch in KEYCAP_BASES:
+        j = i + 1
+        if j < n and text[j] == VS16:
+            j += 1
+        return j + 1 if j < n and text[j] == KEYCAP else 0
+
+    if not is_pictographic(cp):
+        return 0
+
+    j, saw_vs16 = _modifiers_end(text, i + 1)
+    if cp < _TEXT_DEFAULT_BELOW and not saw_vs16:
+        return 0
+    # Follow ZWJ links to further pictographs (family, profession, ...)
+    while j + 1 < n and text[j] == ZWJ and is_pictographic(ord(text[j + 1])):
+        j, _ = _modifiers_end(text, j + 2)
+    return j
+
+
+def emoji_only_count(text):
+    """Number of emoji when ``text`` is nothing but emoji, otherwise 0."""
+    if not text:
+        return 0
+    i, n = 0, len(text)
+    count = 0
+    while i < n:
+        if text[i].isspace():
+            i += 1
+            continue
+        end = match_emoji(text, i)
+        if not end:
+            return 0
+        count += 1
+        i = end
+    return count
+
+
+def is_emoji_only(text):
+    return emoji_only_count(text) > 0
+
+
+def emoji_count(text):
+    """Number of emoji anywhere in ``text``."""
+    count = 0
+    i, n = 0, len(text or '')
+    while i < n:
+        end = match_emoji(text, i)
+        if end:
+            count += 1
+            i = end
+        else:
+            i += 1
+    return count
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.jobs.queue import job
+
+
+@job(name='chat_channels.rerender_messages')
+def rerender_messages(batch_size=500):
+    """
+    Re-render formatted_content for every text message produced by an older
+    markdown renderer. Walks the table in primary key order, one bulk update
+    per batch. Returns the number of messages updated.
+    """
+    from .markdown_utils import RENDER_VERSION, render_markdown
+    from .models import Message
+
+    stale = Message.all_objects.filter(
+        message_type='TEXT',
+        render_version__lt=RENDER_VERSION
+    ).exclude(content='').order_by('pk').only('id', 'content')
+
+    updated = 0
+    last_pk = None
+    while True:
+        batch = stale if last_pk is None else stale.filter(pk__gt=last_pk)
+        batch = list(batch[:batch_size])
+        if not batch:
+            return updated
+        for message in batch:
+            message.has_formatting, message.formatted_content = render_markdown(message.content)
+            message.render_version = RENDER_VERSION
+        Message.all_objects.bulk_update(
+            batch, ['has_formatting', 'formatted_content', 'render_version']
+        )
+        updated += len(batch)
+        last_pk = batch[-1].pk
+
+
+@job(name='chat_channels.prune_channel_events')
+def prune_channel_events(retention_hours=None, max_per_channel=None):
+    """Drop resume log entries past the retention limits. Returns the number deleted."""
+    from .models import ChannelEvent
+    return ChannelEvent.prune(retention_hours=retention_hours, max_per_channel=max_per_channel)
+
+
+def prune_channel_events_if_due():
+    """Run the prune at most once per CHAT_EVENT_PRUNE_INTERVAL across processes sharing the cache."""
+    if cache.add('chat_events:prune_lock', 1, timeout=getattr(settings, 'CHAT_EVENT_PRUNE_INTERVAL', 3600)):
+        return prune_channel_events()
+    return 0
@@ -0,0 +1,34 @@
+import timeit
+from django.core.management.base import BaseCommand
+from apps.chat_channels.emoji import emoji_count, emoji_only_count
+
+SAMPLES = [
+    ('plain text', "Can we move the standup to 10:30 tomorrow? The release notes are almost done."),
+    ('text + emoji', "Shipped it 🚀 thanks everyone 🙏🏽"),
+    ('single emoji', "👍"),
+    ('skin tone', "👋🏾"),
+    ('ZWJ family', "👨‍👩‍👧‍👦"),
+    ('flags', "🇬🇭 🇳🇬 🇰🇪"),
+    ('keycaps', "1️⃣ 2️⃣ 3️⃣"),
+    ('long emoji run', "😂" * 40),
+]
+
+
+class Command(BaseCommand):
+    help = 'Microbenchmark the emoji classifier used by Message.save (per-message cost)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000,
+                            help='Classifications per sample')
+
+    def handle(self, *args, **options):
+        iterations = max(1, options['iterations'])
+        self.stdout.write(f"{'sample':<16}{'only':>6}{'count':>7}{'µs/msg (save)':>16}{'µs/msg (count)':>17}")
+        for label, text in SAMPLES:
+            classify = timeit.timeit(lambda: emoji_only_count(text), number=iterations) / iterations
+            count = timeit.timeit(lambda: emoji_count(text), number=iterations) / iterations
+            self.stdout.write(
+                f"{label:<16}{emoji_only_count(text):>6}{emoji_count(text):>7}"
+                f"{classify * 1e6:>16.2f}{count * 1e6:>17.2f}"
+            )
+        self.stdout.write(self.style.SUCCESS(f'✓ Benchmarked {len(SAMPLES)} samples x {iterations} iterations'))
@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from apps.chat_channels.models import ChannelReadCursor, Message, MessageReadReceipt
+
+
+class Command(BaseCommand):
+    help = (
+        'Collapse per-message MessageReadReceipt rows into one ChannelReadCursor per user and channel '
+        '(migration 0030 already did this once; use --delete to drop the old rows)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of (user, channel) pairs to migrate per transaction')
+        parser.add_argument('--delete', action='store_true',
+                            help='Delete the old receipt rows once they have been collapsed')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+
+        # Newest read message per (user, channel); cursors only ever advance,
+        # so re-running the command is safe.
+        newest_reads = MessageReadReceipt.objects.values(
+            'user_id', 'message__channel_id'
+        ).annotate(
+            newest=Max('message__created_at')
+        ).order_by('user_id', 'message__channel_id')
+
+        batch = []
+        collapsed = 0
+        for row in newest_reads.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                collapsed += self._collapse(batch)
+                batch = []
+        if batch:
+            collapsed += self._collapse(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Collapsed read receipts into {collapsed} cursor(s)')
+        )
+
+        if options['delete']:
+            deleted = 0
+            while True:
+                ids = list(MessageReadReceipt.objects.values_list('pk', flat=True)[:batch_size])
+                if not ids:
+                    break
+                deleted += MessageReadReceipt.objects.filter(pk__in=ids).delete()[0]
+            self.stdout.write(
+                self.style.SUCCESS(f'✓ Deleted {deleted} read receipt row(s)')
+            )
+
+    def _collapse(self, rows):
+        users = get_user_model().objects.in_bulk({row['user_id'] for row in rows})
+        collapsed = 0
+        with transaction.atomic():
+            for row in rows:
+                message = Message.all_objects.filter(
+                    channel_id=row['message__channel_id'],
+                    created_at=row['newest']
+                ).order_by('-id').first()
+                if message is None:
+                    continue
+                ChannelReadCursor.advance(users[row['user_id']], message)
+                collapsed += 1
+        return collapsed
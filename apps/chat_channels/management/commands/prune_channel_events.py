@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from apps.chat_channels.jobs import prune_channel_events
+from apps.jobs.queue import enqueue
+
+
+class Command(BaseCommand):
+    help = 'Apply the retention limits to the per-channel event log used by websocket resume'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-hours', type=int, default=None,
+                            help='Keep events this many hours (default: CHAT_EVENT_LOG_RETENTION_HOURS)')
+        parser.add_argument('--max-per-channel', type=int, default=None,
+                            help='Keep at most this many events per channel (default: CHAT_EVENT_LOG_MAX_PER_CHANNEL)')
+        parser.add_argument('--background', action='store_true',
+                            help='Queue the prune for the run_jobs worker instead of running it now')
+
+    def handle(self, *args, **options):
+        kwargs = {
+            'retention_hours': options['retention_hours'],
+            'max_per_channel': options['max_per_channel'],
+        }
+        if options['background']:
+            enqueue(prune_channel_events, **kwargs)
+            self.stdout.write(self.style.SUCCESS('✓ Queued channel event prune job'))
+            return
+
+        count = prune_channel_events(**kwargs)
+        self.stdout.write(self.style.SUCCESS(f'✓ Pruned {count} channel event(s)'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from apps.chat_channels.models import Channel, ChannelStats
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized ChannelStats (message count and last message) from the message table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--channel', help='Only rebuild stats for this channel id')
+
+    def handle(self, *args, **options):
+        channels = Channel.objects.all()
+        if options['channel']:
+            channels = channels.filter(pk=options['channel'])
+
+        count = 0
+        for channel in channels.iterator():
+            ChannelStats.rebuild(channel)
+            count += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Rebuilt stats for {count} channel(s)')
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.chat_channels import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for channel messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of messages to index per statement batch')
+
+    def handle(self, *args, **options):
+        if search.backend() is None:
+            self.stdout.write(self.style.WARNING(
+                'No search index available for this database; search falls back to icontains'
+            ))
+            return
+
+        with transaction.atomic():
+            count = search.rebuild_index(batch_size=max(1, options['batch_size']))
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Indexed {count} message(s)'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from apps.chat_channels.models import Message, MessageReactionCount
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-message reaction counters from the MessageReaction table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--channel', help='Only rebuild counters for messages in this channel id')
+
+    def handle(self, *args, **options):
+        messages = None
+        if options['channel']:
+            messages = Message.all_objects.filter(channel_id=options['channel'])
+
+        count = MessageReactionCount.rebuild(messages)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Rebuilt {count} reaction counter(s)')
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from apps.chat_channels.jobs import rerender_messages
+from apps.jobs.queue import enqueue
+
+
+class Command(BaseCommand):
+    help = 'Re-render stored markdown for messages produced by an older renderer version'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of messages to update per bulk update')
+        parser.add_argument('--background', action='store_true',
+                            help='Queue the re-render for the run_jobs worker instead of running it now')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        if options['background']:
+            enqueue(rerender_messages, batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS('✓ Queued message re-render job'))
+            return
+
+        count = rerender_messages(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'✓ Re-rendered {count} message(s)'))
@@ -3,7 +3,10 @@ Markdown to HTML conversion utilities for messages.
 Supports basic markdown with XSS protection.
 """
 
+import hashlib
 import re
+import threading
+from collections import OrderedDict
 from urllib.parse import urlparse
 import bleach
 from django.utils.html import escape
@@ -35,6 +38,56 @@ def _is_safe_link_url(url):
     return parsed.scheme.lower() in ALLOWED_SCHEMES
 
 
+# Bump whenever the output of convert_markdown_to_html changes; stored
+# messages rendered by an older version are refreshed by
+# ``python manage.py rerender_messages``.
+RENDER_VERSION = 1
+
+RENDER_CACHE_SIZE = 1024
+
+# Compiled once at import; convert_markdown_to_html runs them in this order
+_CODE_BLOCK = re.compile(r'```(\w+)?\n(.*?)```', re.DOTALL)
+_INLINE_CODE = re.compile(r'`([^`]+)`')
+_BOLD_STARS = re.compile(r'\*\*(.+?)\*\*')
+_BOLD_UNDERSCORES = re.compile(r'__(.+?)__')
+_ITALIC_STAR = re.compile(r'\*(.+?)\*')
+_ITALIC_UNDERSCORE = re.compile(r'(?<!_)_(.+?)_(?!_)')
+_STRIKETHROUGH = re.compile(r'~~(.+?)~~')
+_LINK = re.compile(r'\[([^\]]+)\]\(([^\)]+)\)')
+_AUTO_LINK = re.compile(r'(?<!href=")(https?://[^\s<>"]+)')
+_HEADERS = [
+    (re.compile(rf'^{"#" * level} (.+)$', re.MULTILINE), rf'<h{level}>\1</h{level}>')
+    for level in (5, 4, 3, 2, 1)
+]
+_BLOCKQUOTE = re.compile(r'^&gt; (.+)$', re.MULTILINE)
+_LIST_ITEM = re.compile(r'^[\*\-] ')
+
+_MARKDOWN_PATTERN = re.compile('|'.join([
+    r'\*\*(.+?)\*\*',  # Bold
+    r'__(.+?)__',      # Bold
+    r'\*(.+?)\*',      # Italic
+    r'_(.+?)_',        # Italic
+    r'`(.+?)`',        # Code
+    r'```',            # Code block
+    r'\[.+?\]\(.+?\)', # Link
+    r'^#{1,6} ',       # Headers
+    r'^&gt; ',         # Blockquote
+    r'^[\*\-] ',       # List
+    r'~~(.+?)~~',      # Strikethrough
+]), re.MULTILINE)
+
+_PLAIN_URL = re.compile(r'https?://[^\s<>"]+')
+
+_render_cache = OrderedDict()
+_render_cache_lock = threading.Lock()
+
+
+def _link_html(match):
+    if _is_safe_link_url(match.group(2)):
+        return f'<a href="{match.group(2)}" target="_blank" rel="noopener noreferrer">{match.group(1)}</a>'
+    return match.group(1)
+
+
 def convert_markdown_to_html(text):
     """
     Convert markdown text to safe HTML.
@@ -47,54 +100,37 @@ def convert_markdown_to_html(text):
     html = escape(text)
     
     # Code blocks (must be done first, before inline code)
-    html = re.sub(
-        r'```(\w+)?\n(.*?)```',
+    html = _CODE_BLOCK.sub(
         lambda m: f'<pre><code class="language-{m.group(1) or "text"}">{m.group(2)}</code></pre>',
-        html,
-        flags=re.DOTALL
+        html
     )
     
     # Inline code
-    html = re.sub(r'`([^`]+)`', r'<code>\1</code>', html)
+    html = _INLINE_CODE.sub(r'<code>\1</code>', html)
     
     # Bold (**text** or __text__)
-    html = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', html)
-    html = re.sub(r'__(.+?)__', r'<strong>\1</strong>', html)
+    html = _BOLD_STARS.sub(r'<strong>\1</strong>', html)
+    html = _BOLD_UNDERSCORES.sub(r'<strong>\1</strong>', html)
     
     # Italic (*text* or _text_)
-    html = re.sub(r'\*(.+?)\*', r'<em>\1</em>', html)
-    html = re.sub(r'(?<!_)_(.+?)_(?!_)', r'<em>\1</em>', html)
+    html = _ITALIC_STAR.sub(r'<em>\1</em>', html)
+    html = _ITALIC_UNDERSCORE.sub(r'<em>\1</em>', html)
     
     # Strikethrough (~~text~~)
-    html = re.sub(r'~~(.+?)~~', r'<del>\1</del>', html)
+    html = _STRIKETHROUGH.sub(r'<del>\1</del>', html)
     
     # Links [text](url)
-    html = re.sub(
-        r'\[([^\]]+)\]\(([^\)]+)\)',
-        lambda m: (
-            f'<a href="{m.group(2)}" target="_blank" rel="noopener noreferrer">{m.group(1)}</a>'
-            if _is_safe_link_url(m.group(2))
-            else m.group(1)
-        ),
-        html
-    )
+    html = _LINK.sub(_link_html, html)
     
     # Auto-link URLs (only if not already in <a> tag)
-    html = re.sub(
-        r'(?<!href=")(https?://[^\s<>"]+)',
-        r'<a href="\1" target="_blank" rel="noopener noreferrer">\1</a>',
-        html
-    )
+    html = _AUTO_LINK.sub(r'<a href="\1" target="_blank" rel="noopener noreferrer">\1</a>', html)
     
     # Headers (# H1, ## H2, etc.)
-    html = re.sub(r'^##### (.+)$', r'<h5>\1</h5>', html, flags=re.MULTILINE)
-    html = re.sub(r'^#### (.+)$', r'<h4>\1</h4>', html, flags=re.MULTILINE)
-    html = re.sub(r'^### (.+)$', r'<h3>\1</h3>', html, flags=re.MULTILINE)
-    html = re.sub(r'^## (.+)$', r'<h2>\1</h2>', html, flags=re.MULTILINE)
-    html = re.sub(r'^# (.+)$', r'<h1>\1</h1>', html, flags=re.MULTILINE)
+    for pattern, replacement in _HEADERS:
+        html = pattern.sub(replacement, html)
     
     # Blockquotes (> text)
-    html = re.sub(r'^&gt; (.+)$', r'<blockquote>\1</blockquote>', html, flags=re.MULTILINE)
+    html = _BLOCKQUOTE.sub(r'<blockquote>\1</blockquote>', html)
     
     # Unordered lists (- item or * item)
     lines = html.split('\n')
@@ -102,12 +138,11 @@ def convert_markdown_to_html(text):
     result_lines = []
     
     for line in lines:
-        if re.match(r'^[\*\-] ', line):
+        if _LIST_ITEM.match(line):
             if not in_list:
                 result_lines.append('<ul>')
                 in_list = True
-            item = re.sub(r'^[\*\-] ', '', line)
-            result_lines.append(f'<li>{item}</li>')
+            result_lines.append(f'<li>{line[2:]}</li>')
         else:
             if in_list:
                 result_lines.append('</ul>')
@@ -139,26 +174,31 @@ def has_markdown_formatting(text):
     """
     if not text or not isinstance(text, str):
         return False
-    
-    markdown_patterns = [
-        r'\*\*(.+?)\*\*',  # Bold
-        r'__(.+?)__',      # Bold
-        r'\*(.+?)\*',      # Italic
-        r'_(.+?)_',        # Italic
-        r'`(.+?)`',        # Code
-        r'```',            # Code block
-        r'\[.+?\]\(.+?\)', # Link
-        r'^#{1,6} ',       # Headers
-        r'^&gt; ',         # Blockquote
-        r'^[\*\-] ',       # List
-        r'~~(.+?)~~',      # Strikethrough
-    ]
-    
-    for pattern in markdown_patterns:
-        if re.search(pattern, text, re.MULTILINE):
-            return True
-    
-    return False
+    return _MARKDOWN_PATTERN.search(text) is not None
+
+
+def render_markdown(text):
+    """
+    Return ``(has_formatting, formatted_html_or_None)`` for message content.
+
+    Results are kept in a small LRU keyed by the content hash, so forwarded
+    messages and repeated one-liners ("ok", "thanks!") are rendered once.
+    """
+    key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+    with _render_cache_lock:
+        cached = _render_cache.get(key)
+        if cached is not None:
+            _render_cache.move_to_end(key)
+            return cached
+
+    has_formatting = has_markdown_formatting(text)
+    rendered = (has_formatting, convert_markdown_to_html(text) if has_formatting else None)
+
+    with _render_cache_lock:
+        _render_cache[key] = rendered
+        while len(_render_cache) > RENDER_CACHE_SIZE:
+            _render_cache.popitem(last=False)
+    return rendered
 
 
 def extract_links(text):
@@ -169,11 +209,11 @@ def extract_links(text):
         return []
     
     # Match markdown links [text](url)
-    markdown_links = re.findall(r'\[([^\]]+)\]\(([^\)]+)\)', text)
+    markdown_links = _LINK.findall(text)
     urls = [url for _, url in markdown_links]
     
     # Match plain URLs
-    plain_urls = re.findall(r'https?://[^\s<>"]+', text)
+    plain_urls = _PLAIN_URL.findall(text)
     urls.extend(plain_urls)
     
     return list(set(urls))  # Remove duplicates
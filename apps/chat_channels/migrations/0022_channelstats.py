@@ -0,0 +1,52 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_channel_stats(apps, schema_editor):
+    Channel = apps.get_model('chat_channels', 'Channel')
+    ChannelStats = apps.get_model('chat_channels', 'ChannelStats')
+    Message = apps.get_model('chat_channels', 'Message')
+
+    for channel_id in Channel.objects.values_list('id', flat=True).iterator():
+        visible = Message.objects.filter(channel_id=channel_id, is_deleted=False)
+        latest = visible.order_by('-created_at', '-id').first()
+        ChannelStats.objects.create(
+            channel_id=channel_id,
+            message_count=visible.count(),
+            last_message=latest,
+            last_message_sender_id=latest.sender_id if latest else None,
+            last_message_preview=(latest.content or '')[:100] if latest else '',
+            last_message_at=latest.created_at if latest else None,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_channels', '0021_message_keyset_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChannelStats',
+            fields=[
+                ('channel', models.OneToOneField(help_text='Channel these stats belong to', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='chat_channels.channel')),
+                ('last_message_preview', models.CharField(blank=True, default='', help_text='Short preview of the most recent message', max_length=255)),
+                ('last_message_at', models.DateTimeField(blank=True, db_index=True, help_text='Timestamp of the most recent message', null=True)),
+                ('message_count', models.PositiveIntegerField(default=0, help_text='Number of visible messages in the channel')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('last_message', models.ForeignKey(blank=True, help_text='Most recent visible message', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat_channels.message')),
+                ('last_message_sender', models.ForeignKey(blank=True, help_text='Sender of the most recent message', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Channel Stats',
+                'verbose_name_plural': 'Channel Stats',
+                'db_table': 'channel_stats',
+            },
+        ),
+        migrations.RunPython(backfill_channel_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:04
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_channels', '0022_channelstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChannelReadCursor',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('last_read_at', models.DateTimeField(help_text='Creation time of the newest message read (the cursor position)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('channel', models.ForeignKey(help_text='Channel being read', on_delete=django.db.models.deletion.CASCADE, related_name='read_cursors', to='chat_channels.channel')),
+                ('last_read_message', models.ForeignKey(blank=True, help_text='Newest message the user has read', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat_channels.message')),
+                ('user', models.ForeignKey(help_text='User who is reading', on_delete=django.db.models.deletion.CASCADE, related_name='read_cursors', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Channel Read Cursor',
+                'verbose_name_plural': 'Channel Read Cursors',
+                'db_table': 'channel_read_cursors',
+                'indexes': [models.Index(fields=['channel', 'last_read_at'], name='channel_rea_channel_bb9174_idx')],
+                'unique_together': {('user', 'channel')},
+            },
+        ),
+    ]
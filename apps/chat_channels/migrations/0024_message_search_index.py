@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def create_message_search(apps, schema_editor):
+    from apps.chat_channels import search
+    search.create_schema(schema_editor)
+    search.rebuild_index(apps.get_model('chat_channels', 'Message').objects)
+
+
+def drop_message_search(apps, schema_editor):
+    from apps.chat_channels import search
+    search.drop_schema(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_channels', '0023_channelreadcursor'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_message_search, drop_message_search),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_channels', '0024_message_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='render_version',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Markdown renderer version that produced formatted_content'),
+        ),
+    ]
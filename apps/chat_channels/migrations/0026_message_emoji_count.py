@@ -0,0 +1,37 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:28
+
+from django.db import migrations, models
+
+
+def classify_emoji_messages(apps, schema_editor):
+    """Store emoji counts; rows the old regex misfiled (e.g. CJK text) go back to TEXT."""
+    from apps.chat_channels.emoji import emoji_only_count
+    Message = apps.get_model('chat_channels', 'Message')
+
+    batch = []
+    for message in Message.objects.filter(message_type='EMOJI').only('id', 'content').iterator(chunk_size=500):
+        message.emoji_count = emoji_only_count(message.content)
+        if not message.emoji_count:
+            # render_version stays 0, so rerender_messages picks these up
+            message.message_type = 'TEXT'
+        batch.append(message)
+        if len(batch) >= 500:
+            Message.objects.bulk_update(batch, ['emoji_count', 'message_type'])
+            batch = []
+    Message.objects.bulk_update(batch, ['emoji_count', 'message_type'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_channels', '0025_message_render_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='emoji_count',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Number of emoji in an emoji-only message (0 otherwise)'),
+        ),
+        migrations.RunPython(classify_emoji_messages, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_channels', '0027_message_client_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChannelEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('event_type', models.CharField(help_text='Channel layer event type (ChatConsumer handler name)', max_length=32)),
+                ('payload', models.JSONField(default=dict, help_text='Event body as sent on the channel layer')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('channel', models.ForeignKey(help_text='Channel the event was broadcast to', on_delete=django.db.models.deletion.CASCADE, related_name='events', to='chat_channels.channel')),
+            ],
+            options={
+                'verbose_name': 'Channel Event',
+                'verbose_name_plural': 'Channel Events',
+                'db_table': 'channel_events',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['channel', 'id'], name='channel_events_cursor_idx')],
+            },
+        ),
+    ]
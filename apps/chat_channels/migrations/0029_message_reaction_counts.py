@@ -0,0 +1,42 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def count_reactions(apps, schema_editor):
+    MessageReaction = apps.get_model('chat_channels', 'MessageReaction')
+    MessageReactionCount = apps.get_model('chat_channels', 'MessageReactionCount')
+    totals = MessageReaction.objects.values('message_id', 'emoji').annotate(
+        total=models.Count('id'), first=models.Min('created_at')
+    ).order_by('message_id', 'first')
+    MessageReactionCount.objects.bulk_create(
+        [MessageReactionCount(message_id=t['message_id'], emoji=t['emoji'], count=t['total']) for t in totals],
+        batch_size=500
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_channels', '0028_channel_event_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageReactionCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('emoji', models.CharField(help_text='Emoji reaction (e.g., 👍, ❤️, 😊)', max_length=10)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('message', models.ForeignKey(help_text='Message being reacted to', on_delete=django.db.models.deletion.CASCADE, related_name='reaction_counts', to='chat_channels.message')),
+            ],
+            options={
+                'verbose_name': 'Message Reaction Count',
+                'verbose_name_plural': 'Message Reaction Counts',
+                'db_table': 'message_reaction_counts',
+                'ordering': ['id'],
+                'unique_together': {('message', 'emoji')},
+            },
+        ),
+        migrations.RunPython(count_reactions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+from django.db.models import Max
+
+
+def collapse_read_receipts(apps, schema_editor):
+    """One cursor per (user, channel) at the newest message with a receipt."""
+    ChannelReadCursor = apps.get_model('chat_channels', 'ChannelReadCursor')
+    Message = apps.get_model('chat_channels', 'Message')
+    MessageReadReceipt = apps.get_model('chat_channels', 'MessageReadReceipt')
+
+    newest_reads = MessageReadReceipt.objects.values(
+        'user_id', 'message__channel_id'
+    ).annotate(
+        newest=Max('message__created_at')
+    ).order_by('user_id', 'message__channel_id')
+
+    for row in newest_reads.iterator():
+        message = Message.objects.filter(
+            channel_id=row['message__channel_id'],
+            created_at=row['newest']
+        ).order_by('-id').first()
+        if message is None:
+            continue
+        cursor, created = ChannelReadCursor.objects.get_or_create(
+            user_id=row['user_id'],
+            channel_id=message.channel_id,
+            defaults={'last_read_message': message, 'last_read_at': message.created_at}
+        )
+        # Cursors only move forward
+        if not created and cursor.last_read_at < message.created_at:
+            cursor.last_read_message = message
+            cursor.last_read_at = message.created_at
+            cursor.save(update_fields=['last_read_message', 'last_read_at', 'updated_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_channels', '0029_message_reaction_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(collapse_read_receipts, migrations.RunPython.noop),
+    ]
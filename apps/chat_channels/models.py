@@ -1,11 +1,26 @@
-from django.db import models
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from . import search
 from django.contrib.auth import get_user_model
 import uuid
 from cloudinary.models import CloudinaryField
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
+
+class ChannelQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Channels ``user`` can view, resolved from the cached visibility set."""
+        from .visibility import visible_channel_ids
+        return self.filter(pk__in=visible_channel_ids(user))
+
 
 class Channel(models.Model):
     """
@@ -130,6 +145,8 @@ class Channel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ChannelQuerySet.as_manager()
+    
     class Meta:
         db_table = 'channels'
         verbose_name = _('Channel')
@@ -158,29 +175,9 @@ class Channel(models.Model):
         return self.members.filter(pk=user.pk).exists()
     
     def can_user_view(self, user):
-        """Check if user can view this channel."""
-        # If it's a shared project channel, only project members can view
-        if self.shared_project:
-            return user in self.shared_project.members.all()
-
-        # Super admins can view everything in their organization
-        if user.is_admin and user.organization == self.organization:
-            return True
-        
-        # Official channels - everyone in org can view
-        if self.channel_type == self.ChannelType.OFFICIAL:
-            return user.organization == self.organization
-        
-        # Department channels - department members can view
-        if self.channel_type == self.ChannelType.DEPARTMENT and self.department:
-            return self.department.teams.filter(members=user).exists()
-        
-        # Team channels - team members can view
-        if self.channel_type == self.ChannelType.TEAM and self.team:
-            return self.team.members.filter(pk=user.pk).exists()
-        
-        # Private/Project/Direct/Breakout - only members can view
-        return self.members.filter(pk=user.pk).exists()
+        """Check if user can view this channel (rules in chat_channels.visibility)."""
+        from .visibility import visible_channel_ids
+        return self.pk in visible_channel_ids(user)
 
 
 class MessageManager(models.Manager):
@@ -250,6 +247,16 @@ class Message(models.Model):
         help_text=_("Whether message contains markdown formatting")
     )
 
+    render_version = models.PositiveSmallIntegerField(
+        default=0,
+        help_text=_("Markdown renderer version that produced formatted_content")
+    )
+
+    emoji_count = models.PositiveSmallIntegerField(
+        default=0,
+        help_text=_("Number of emoji in an emoji-only message (0 otherwise)")
+    )
+
     channel = models.ForeignKey(
         Channel,
         on_delete=models.CASCADE,
@@ -269,6 +276,14 @@ class Message(models.Model):
         default='',
         help_text=_("Message content")
     )
+
+    client_key = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text=_("Idempotency key from the sending client; retries with the same key reuse this message")
+    )
     
     # Threading support
     parent_message = models.ForeignKey(
@@ -362,21 +377,85 @@ class Message(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored content so save() only reprocesses real edits
+        instance._loaded_content = instance.__dict__.get('content')
+        instance._loaded_is_deleted = instance.__dict__.get('is_deleted')
+        return instance
+
+    def content_changed(self):
+        """True for new messages and when content differs from what was loaded."""
+        if self._state.adding:
+            return True
+        if 'content' not in self.__dict__:
+            return False  # Deferred and never touched
+        return self.content != getattr(self, '_loaded_content', None)
+
+    def deleted_changed(self):
+        """True when is_deleted differs from what was loaded (a soft delete or restore)."""
+        if self._state.adding or 'is_deleted' not in self.__dict__:
+            return False
+        return self.is_deleted != getattr(self, '_loaded_is_deleted', None)
+
+    def classify_content(self):
+        """Switch between TEXT and EMOJI (emoji-only) and store the emoji count."""
+        from .emoji import emoji_only_count
+        if self.message_type not in ('TEXT', 'EMOJI'):
+            return
+        self.emoji_count = emoji_only_count(self.content)
+        if self.emoji_count:
+            self.message_type = 'EMOJI'
+            self.has_formatting, self.formatted_content = False, None
+        else:
+            self.message_type = 'TEXT'
+
+    def needs_render(self):
+        """True when content changed since load or was rendered by an older renderer."""
+        from .markdown_utils import RENDER_VERSION
+        if not self._state.adding and 'content' not in self.__dict__:
+            return False  # Deferred and never touched
+        if self.message_type != 'TEXT' or not self.content:
+            return False
+        return self.content_changed() or self.render_version < RENDER_VERSION
+
+    def render_content(self):
+        """Refresh has_formatting / formatted_content from content."""
+        from .markdown_utils import RENDER_VERSION, render_markdown
+        self.has_formatting, self.formatted_content = render_markdown(self.content)
+        self.render_version = RENDER_VERSION
+
     def save(self, *args, **kwargs):
-        """Override save to process markdown formatting."""
-        if self.content and self.message_type == 'TEXT':
-            from .markdown_utils import convert_markdown_to_html, has_markdown_formatting
-            
-            # Check if content has markdown
-            self.has_formatting = has_markdown_formatting(self.content)
-            
-            # Convert markdown to HTML if present
-            if self.has_formatting:
-                self.formatted_content = convert_markdown_to_html(self.content)
-            else:
-                self.formatted_content = None
+        """Override save to classify and render content and keep channel stats current."""
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            if self.content_changed():
+                self.classify_content()
+            if self.needs_render():
+                self.render_content()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {
+                    'message_type', 'emoji_count',
+                    'has_formatting', 'formatted_content', 'render_version'
+                }
         
-        super().save(*args, **kwargs)
+        is_new = self._state.adding
+        # Pins, reactions, status and other metadata saves leave the
+        # channel preview and the search index alone
+        reindex = self.content_changed() or self.deleted_changed()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                ChannelStats.record_message(self)
+            elif reindex and not self.is_deleted:
+                ChannelStats.refresh_preview(self)
+            if reindex:
+                search.index_message(self)
+        if 'content' in self.__dict__:
+            self._loaded_content = self.content
+        if 'is_deleted' in self.__dict__:
+            self._loaded_is_deleted = self.is_deleted
     
     class Meta:
         db_table = 'messages'
@@ -384,9 +463,16 @@ class Message(models.Model):
         verbose_name_plural = _('Messages')
         ordering = ['-is_pinned', 'created_at']
         indexes = [
-            models.Index(fields=['channel', 'created_at']),
+            models.Index(fields=['channel', 'created_at', 'id'], name='messages_channel_keyset_idx'),
             models.Index(fields=['sender', 'created_at']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['sender', 'channel', 'client_key'],
+                condition=models.Q(client_key__isnull=False),
+                name='messages_sender_channel_client_key_uniq'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.sender.username} in #{self.channel.name}: {self.content[:50]}"
@@ -394,7 +480,14 @@ class Message(models.Model):
     def delete(self, *args, **kwargs):
         """Standard Django delete - handles optional force parameter."""
         kwargs.pop('force', None) # Remove force if passed
-        super().delete(*args, **kwargs)
+        with transaction.atomic():
+            was_visible = not self.is_deleted
+            message_id = self.pk
+            result = super().delete(*args, **kwargs)
+            if was_visible:
+                ChannelStats.record_removal(self)
+                search.remove_message(message_id)
+        return result
 
     def soft_delete(self, user=None):
         """Perform a soft delete."""
@@ -405,25 +498,40 @@ class Message(models.Model):
         self.content = 'This message was deleted.'
         if user:
             self.deleted_by = user
-        self.save()
-    
+        with transaction.atomic():
+            self.save()
+            ChannelStats.record_removal(self)
+    
+    @classmethod
+    def annotate_reply_counts(cls, messages):
+        """Annotate a Message queryset with ``reply_count_annotated`` in a single query."""
+        replies = Message.objects.filter(
+            parent_message=models.OuterRef('pk')
+        ).order_by().values('parent_message').annotate(total=models.Count('id')).values('total')
+        return messages.annotate(reply_count_annotated=Coalesce(models.Subquery(replies), 0))
+
     @property
     def reply_count(self):
         """Return number of replies to this message."""
+        if hasattr(self, 'reply_count_annotated'):
+            return self.reply_count_annotated
         return self.replies.count()
     
     @property
     def reaction_summary(self):
-        """Return summary of reactions."""
-        reactions = self.reactions.values('emoji').annotate(count=models.Count('id'))
-        return {r['emoji']: r['count'] for r in reactions}
+        """Return summary of reactions (from the maintained counters)."""
+        return {counter.emoji: counter.count for counter in self.reaction_counts.all()}
     
     @property
     def reaction_details(self):
         """Return detailed reactions with users who reacted."""
         from collections import defaultdict
+        if not self.reaction_counts.all():
+            # Nothing to list; skips the reactions query for most messages
+            return {}
         reactions_dict = defaultdict(list)
-        for reaction in self.reactions.select_related('user').all():
+        # Served from memory when 'reactions__user' is prefetched
+        for reaction in self.reactions.all():
             reactions_dict[reaction.emoji].append({
                 'user_id': reaction.user.id,
                 'username': reaction.user.get_full_name(),
@@ -546,6 +654,91 @@ class MessageReaction(models.Model):
     def __str__(self):
         return f"{self.user.username} reacted {self.emoji} to message"
 
+    @classmethod
+    def toggle(cls, message, user, emoji):
+        """
+        Add the reaction, or remove it if the user already reacted with
+        ``emoji``. Returns ``(delta, count)``: +1 or -1 and the new total.
+        """
+        with transaction.atomic():
+            reaction, created = cls.objects.get_or_create(message=message, user=user, emoji=emoji)
+            if not created:
+                reaction.delete()
+        count = MessageReactionCount.objects.filter(
+            message=message, emoji=emoji
+        ).values_list('count', flat=True).first()
+        return (1 if created else -1), count or 0
+
+
+class MessageReactionCount(models.Model):
+    """
+    MessageReactionCount model - reactions per emoji per message, kept in step
+    with MessageReaction by the signals below (F() increments, rows removed
+    at zero) so summaries never aggregate. ``rebuild`` repairs drift.
+    """
+
+    message = models.ForeignKey(
+        Message,
+        on_delete=models.CASCADE,
+        related_name='reaction_counts',
+        help_text=_("Message being reacted to")
+    )
+
+    emoji = models.CharField(
+        max_length=10,
+        help_text=_("Emoji reaction (e.g., 👍, ❤️, 😊)")
+    )
+
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'message_reaction_counts'
+        verbose_name = _('Message Reaction Count')
+        verbose_name_plural = _('Message Reaction Counts')
+        unique_together = [['message', 'emoji']]
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.emoji} x{self.count} on {self.message_id}"
+
+    @classmethod
+    def apply(cls, message_id, emoji, delta):
+        """Add ``delta`` to the counter for ``emoji``; empty counters are removed."""
+        counters = cls.objects.filter(message_id=message_id, emoji=emoji)
+        if delta > 0:
+            if not counters.update(count=models.F('count') + delta):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(message_id=message_id, emoji=emoji, count=delta)
+                except IntegrityError:
+                    # Created concurrently by another reaction
+                    counters.update(count=models.F('count') + delta)
+        else:
+            if not counters.filter(count__gt=-delta).update(count=models.F('count') + delta):
+                counters.delete()
+
+    @classmethod
+    def rebuild(cls, messages=None):
+        """
+        Recompute counters from MessageReaction for ``messages`` (a queryset,
+        default all). Returns the number of counter rows written.
+        """
+        reactions = MessageReaction.objects.all()
+        counters = cls.objects.all()
+        if messages is not None:
+            reactions = reactions.filter(message__in=messages)
+            counters = counters.filter(message__in=messages)
+        totals = reactions.values('message_id', 'emoji').annotate(
+            total=models.Count('id'), first=models.Min('created_at')
+        ).order_by('message_id', 'first')
+        with transaction.atomic():
+            counters.delete()
+            rows = cls.objects.bulk_create(
+                [cls(message_id=t['message_id'], emoji=t['emoji'], count=t['total']) for t in totals],
+                batch_size=500
+            )
+        return len(rows)
+
 
 class MessageReadReceipt(models.Model):
     """
@@ -585,70 +778,464 @@ class MessageReadReceipt(models.Model):
         return f"{self.user.username} read message at {self.read_at}"
 
 
+class ChannelReadCursor(models.Model):
+    """
+    ChannelReadCursor model - how far a user has read in a channel.
+    Replaces one MessageReadReceipt row per message with a single monotonic
+    high-water mark per (user, channel); per-message receipts are derived.
+    """
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='read_cursors',
+        help_text=_("User who is reading")
+    )
+
+    channel = models.ForeignKey(
+        Channel,
+        on_delete=models.CASCADE,
+        related_name='read_cursors',
+        help_text=_("Channel being read")
+    )
+
+    last_read_message = models.ForeignKey(
+        Message,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text=_("Newest message the user has read")
+    )
+
+    last_read_at = models.DateTimeField(
+        help_text=_("Creation time of the newest message read (the cursor position)")
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'channel_read_cursors'
+        verbose_name = _('Channel Read Cursor')
+        verbose_name_plural = _('Channel Read Cursors')
+        unique_together = [['user', 'channel']]
+        indexes = [
+            models.Index(fields=['channel', 'last_read_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} read #{self.channel.name} up to {self.last_read_at}"
+
+    @classmethod
+    def advance(cls, user, message):
+        """
+        Move the user's cursor forward to ``message``.
+        Never moves backwards; returns True if the cursor actually advanced.
+        """
+        def move_forward():
+            return cls.objects.filter(
+                user=user,
+                channel_id=message.channel_id,
+                last_read_at__lt=message.created_at
+            ).update(
+                last_read_message=message,
+                last_read_at=message.created_at,
+                updated_at=timezone.now()
+            )
+
+        if move_forward():
+            from connectflow.api import bump_versions
+            bump_versions(cls)
+            return True
+
+        _, created = cls.objects.get_or_create(
+            user=user,
+            channel_id=message.channel_id,
+            defaults={
+                'last_read_message': message,
+                'last_read_at': message.created_at,
+            }
+        )
+        if created:
+            return True
+        # Either the cursor was already ahead, or a concurrent advance created
+        # it (possibly on an older message) between our update and the insert
+        if move_forward():
+            from connectflow.api import bump_versions
+            bump_versions(cls)
+            return True
+        return False
+
+    @classmethod
+    def unread_count(cls, user, channel):
+        """Number of messages from others in ``channel`` newer than the user's cursor."""
+        cursor = cls.objects.filter(user=user, channel=channel).values_list('last_read_at', flat=True).first()
+        unread = Message.objects.filter(channel=channel).exclude(sender=user)
+        if cursor is not None:
+            unread = unread.filter(created_at__gt=cursor)
+        return unread.count()
+
+    @classmethod
+    def annotate_unread_counts(cls, channels, user):
+        """Annotate a Channel queryset with ``unread_count`` for ``user`` in a single query."""
+        cursor_position = cls.objects.filter(
+            user=user,
+            channel=models.OuterRef('channel')
+        ).values('last_read_at')[:1]
+        unread = Message.objects.filter(
+            channel=models.OuterRef('pk')
+        ).exclude(sender=user).annotate(
+            cursor_position=models.Subquery(cursor_position)
+        ).filter(
+            models.Q(cursor_position__isnull=True) | models.Q(created_at__gt=models.F('cursor_position'))
+        ).order_by().values('channel').annotate(total=models.Count('id')).values('total')
+        return channels.annotate(
+            unread_count=Coalesce(models.Subquery(unread), 0)
+        )
+
+    @classmethod
+    def readers_of(cls, message):
+        """Derived read receipts: cursors in the message's channel at or past it."""
+        return cls.objects.filter(
+            channel_id=message.channel_id,
+            last_read_at__gte=message.created_at
+        ).exclude(user_id=message.sender_id).select_related('user')
+
+
+class ChannelStats(models.Model):
+    """
+    ChannelStats model - denormalized per-channel activity counters.
+    Maintained transactionally on message create / delete so sidebars can
+    sort and render last activity without aggregating over messages.
+    """
+
+    PREVIEW_LENGTH = 100
+
+    channel = models.OneToOneField(
+        Channel,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        help_text=_("Channel these stats belong to")
+    )
+
+    last_message = models.ForeignKey(
+        Message,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text=_("Most recent visible message")
+    )
+
+    last_message_preview = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        help_text=_("Short preview of the most recent message")
+    )
+
+    last_message_sender = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text=_("Sender of the most recent message")
+    )
+
+    last_message_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text=_("Timestamp of the most recent message")
+    )
+
+    message_count = models.PositiveIntegerField(
+        default=0,
+        help_text=_("Number of visible messages in the channel")
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'channel_stats'
+        verbose_name = _('Channel Stats')
+        verbose_name_plural = _('Channel Stats')
+
+    def __str__(self):
+        return f"Stats for {self.channel_id}: {self.message_count} messages"
+
+    @classmethod
+    def preview_for(cls, message):
+        """Return the sidebar preview text for a message."""
+        if message.content:
+            return message.content[:cls.PREVIEW_LENGTH]
+        previews = {
+            Message.MessageType.VOICE: 'Voice message',
+            Message.MessageType.IMAGE: 'Photo',
+            Message.MessageType.VIDEO: 'Video',
+            Message.MessageType.FILE: 'File',
+        }
+        return previews.get(message.message_type, '')
+
+    def _set_last_message(self, message):
+        self.last_message = message
+        self.last_message_sender_id = message.sender_id if message else None
+        self.last_message_preview = self.preview_for(message) if message else ''
+        self.last_message_at = message.created_at if message else None
+
+    @classmethod
+    def record_message(cls, message):
+        """Account for a newly created message. Call inside the creating transaction."""
+        with transaction.atomic():
+            stats, _ = cls.objects.select_for_update().get_or_create(channel_id=message.channel_id)
+            stats.message_count = models.F('message_count') + 1
+            if stats.last_message_at is None or message.created_at >= stats.last_message_at:
+                stats._set_last_message(message)
+            stats.save()
+
+    @classmethod
+    def record_removal(cls, message):
+        """Account for a message that was soft or hard deleted."""
+        with transaction.atomic():
+            stats = cls.objects.select_for_update().filter(channel_id=message.channel_id).first()
+            if stats is None:
+                return
+            stats.message_count = models.Case(
+                models.When(message_count__gt=0, then=models.F('message_count') - 1),
+                default=0,
+            )
+            if stats.last_message_id in (None, message.pk):
+                latest = Message.objects.filter(
+                    channel_id=message.channel_id
+                ).exclude(pk=message.pk).order_by('-created_at', '-id').first()
+                stats._set_last_message(latest)
+            stats.save()
+
+    @classmethod
+    def refresh_preview(cls, message):
+        """Keep the preview in sync when the latest message is edited."""
+        from connectflow.api import bump_versions
+        if cls.objects.filter(last_message_id=message.pk).update(
+            last_message_preview=cls.preview_for(message),
+            updated_at=timezone.now()
+        ):
+            bump_versions(cls)
+
+    @classmethod
+    def rebuild(cls, channel):
+        """Recompute stats for a channel from the message table."""
+        visible = Message.objects.filter(channel=channel)
+        latest = visible.order_by('-created_at', '-id').first()
+        stats, _ = cls.objects.get_or_create(channel=channel)
+        stats.message_count = visible.count()
+        stats._set_last_message(latest)
+        stats.save()
+        return stats
+
+
+class ChannelEvent(models.Model):
+    """
+    ChannelEvent model - short-lived, per-channel log of the room broadcasts
+    a reconnecting client may have missed (new messages, edits, deletes,
+    reactions and pins). The id is the resume cursor. Rows older than
+    ``CHAT_EVENT_LOG_RETENTION_HOURS`` or beyond the newest
+    ``CHAT_EVENT_LOG_MAX_PER_CHANNEL`` are removed by ``prune``.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+
+    channel = models.ForeignKey(
+        Channel,
+        on_delete=models.CASCADE,
+        related_name='events',
+        help_text=_("Channel the event was broadcast to")
+    )
+
+    event_type = models.CharField(
+        max_length=32,
+        help_text=_("Channel layer event type (ChatConsumer handler name)")
+    )
+
+    payload = models.JSONField(
+        default=dict,
+        help_text=_("Event body as sent on the channel layer")
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = 'channel_events'
+        verbose_name = _('Channel Event')
+        verbose_name_plural = _('Channel Events')
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['channel', 'id'], name='channel_events_cursor_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} #{self.pk} in {self.channel_id}"
+
+    @classmethod
+    def record(cls, channel_id, event):
+        """Log a room broadcast and stamp it with its ``event_id``. Returns the event."""
+        payload = {key: value for key, value in event.items() if key != 'type'}
+        logged = cls.objects.create(channel_id=channel_id, event_type=event['type'], payload=payload)
+        event['event_id'] = logged.pk
+        return event
+
+    @classmethod
+    def latest_id(cls, channel_id):
+        latest = cls.objects.filter(channel_id=channel_id).order_by('-id').values_list('id', flat=True).first()
+        return latest or 0
+
+    @classmethod
+    def since(cls, channel_id, last_event_id=None, timestamp=None, limit=None):
+        """
+        Events after ``last_event_id`` (0 for the start of the log) or after
+        ``timestamp``, as channel layer events, oldest first. Returns None when
+        the log no longer reaches back that far and the client has to reload.
+        """
+        limit = limit or getattr(settings, 'CHAT_RESUME_MAX_EVENTS', 500)
+        events = cls.objects.filter(channel_id=channel_id)
+        if last_event_id is not None:
+            # Pruning removes the oldest rows first, so if the client's last
+            # event is still here nothing after it is gone either
+            if last_event_id and not events.filter(id=last_event_id).exists():
+                return None
+            events = events.filter(id__gt=last_event_id)
+        elif timestamp:
+            retention = timedelta(hours=getattr(settings, 'CHAT_EVENT_LOG_RETENTION_HOURS', 72))
+            if timestamp < timezone.now() - retention:
+                return None
+            # Busy channels are also trimmed to CHAT_EVENT_LOG_MAX_PER_CHANNEL.
+            # Only a log still at that size can have lost events newer than
+            # the retention window, and then only before its oldest row.
+            max_per_channel = getattr(settings, 'CHAT_EVENT_LOG_MAX_PER_CHANNEL', 1000)
+            oldest = events.order_by('id').values_list('created_at', flat=True).first()
+            if oldest is not None and oldest > timestamp and events.count() >= max_per_channel:
+                return None
+            events = events.filter(created_at__gt=timestamp)
+        else:
+            return None
+
+        rows = list(events.order_by('id')[:limit + 1])
+        if len(rows) > limit:
+            return None
+        return [
+            {**row.payload, 'type': row.event_type, 'event_id': row.pk}
+            for row in rows
+        ]
+
+    @classmethod
+    def prune(cls, retention_hours=None, max_per_channel=None):
+        """Apply the retention limits. Returns the number of events deleted."""
+        retention_hours = retention_hours or getattr(settings, 'CHAT_EVENT_LOG_RETENTION_HOURS', 72)
+        max_per_channel = max_per_channel or getattr(settings, 'CHAT_EVENT_LOG_MAX_PER_CHANNEL', 1000)
+
+        deleted, _ = cls.objects.filter(
+            created_at__lt=timezone.now() - timedelta(hours=retention_hours)
+        ).delete()
+
+        crowded = cls.objects.values('channel_id').annotate(
+            total=models.Count('id')
+        ).filter(total__gt=max_per_channel).values_list('channel_id', flat=True)
+        for channel_id in crowded:
+            cutoff = cls.objects.filter(channel_id=channel_id).order_by('-id').values_list(
+                'id', flat=True
+            )[max_per_channel]
+            count, _ = cls.objects.filter(channel_id=channel_id, id__lte=cutoff).delete()
+            deleted += count
+        return deleted
+
+
 # SIGNALS (Placed at the bottom to avoid NameErrors)
 from django.db.models.signals import m2m_changed, post_delete
 from django.dispatch import receiver
 from django.urls import reverse
-import cloudinary.uploader
+from apps.jobs.jobs import enqueue_cloudinary_destroy
 
 @receiver(post_delete, sender=Message)
 def delete_message_voice_from_cloudinary(sender, instance, **kwargs):
-    if instance.voice_message:
-        try:
-            cloudinary.uploader.destroy(instance.voice_message.public_id)
-        except Exception as e:
-            try:
-                cloudinary.uploader.destroy(instance.voice_message.name)
-            except:
-                print(f"Cloudinary deletion error: {e}")
+    enqueue_cloudinary_destroy(instance.voice_message)
 
 @receiver(post_delete, sender=Attachment)
 def delete_attachment_from_cloudinary(sender, instance, **kwargs):
-    if instance.file:
-        try:
-            cloudinary.uploader.destroy(instance.file.public_id)
-        except Exception as e:
-            print(f"Cloudinary deletion error: {e}")
+    enqueue_cloudinary_destroy(instance.file)
 
 @receiver(m2m_changed, sender=Channel.members.through)
 def notify_members_added_to_channel(sender, instance, action, pk_set, **kwargs):
     if action == "post_add":
-        from apps.accounts.models import Notification, User
-        from asgiref.sync import async_to_sync
-        from channels.layers import get_channel_layer
-        
-        channel_layer = get_channel_layer()
-        
-        for user_id in pk_set:
-            try:
-                user = User.objects.get(pk=user_id)
-                if user == instance.created_by:
-                    continue
-                
-                link = reverse('chat_channels:channel_detail', kwargs={'pk': instance.pk})
-                notification = Notification.notify(
-                    recipient=user,
-                    sender=instance.created_by,
-                    title=f"New Channel: #{instance.name}",
-                    content=f"You have been added to the channel #{instance.name}.",
-                    notification_type='CHANNEL',
-                    link=link
-                )
-                
-                # Broadcast via WebSocket
-                async_to_sync(channel_layer.group_send)(
-                    f"notifications_{user.id}",
-                    {
-                        'type': 'send_notification',
-                        'id': str(notification.id),
-                        'title': notification.title,
-                        'content': notification.content,
-                        'notification_type': notification.notification_type,
-                        'link': notification.link,
-                    }
-                )
-            except Exception as e:
-                print(f"Error sending notification: {e}")
+        from apps.accounts.notifications import dispatch_notifications
+
+        try:
+            dispatch_notifications(
+                pk_set,
+                title=f"New Channel: #{instance.name}",
+                content=f"You have been added to the channel #{instance.name}.",
+                notification_type='CHANNEL',
+                sender=instance.created_by,
+                link=reverse('chat_channels:channel_detail', kwargs={'pk': instance.pk}),
+                exclude=[instance.created_by]
+            )
+        except Exception:
+            logger.exception('Error sending notification')
+
+from django.db.models.signals import post_save
+from apps.organizations.models import SharedProject, Team
+
+
+@receiver(post_save, sender=User)
+def reindex_renamed_sender(sender, instance, created, update_fields=None, **kwargs):
+    """Sender names are copied into the message search index."""
+    if update_fields is not None and not set(update_fields) & set(User.NAME_FIELDS):
+        return
+    if not created and instance.names_changed():
+        search.reindex_sender(instance.pk)
+    instance._loaded_names = instance._names()
+
+
+@receiver(post_save, sender=MessageReaction)
+def count_added_reaction(sender, instance, created, **kwargs):
+    if created:
+        MessageReactionCount.apply(instance.message_id, instance.emoji, 1)
+
+
+@receiver(post_delete, sender=MessageReaction)
+def count_removed_reaction(sender, instance, **kwargs):
+    MessageReactionCount.apply(instance.message_id, instance.emoji, -1)
+
+
+@receiver(m2m_changed, sender=Channel.members.through)
+@receiver(m2m_changed, sender=Team.members.through)
+@receiver(m2m_changed, sender=SharedProject.members.through)
+def invalidate_channel_visibility_on_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    from .visibility import invalidate_all, invalidate_users
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # user.channels / user.teams / user.shared_projects changed
+        invalidate_users([instance.pk])
+    elif pk_set:
+        invalidate_users(pk_set)
+    else:
+        # clear() on the channel/team/project side doesn't report who left
+        invalidate_all()
+
+@receiver(post_save, sender=Channel)
+@receiver(post_delete, sender=Channel)
+@receiver(post_save, sender=Team)
+def invalidate_channel_visibility_on_structure(sender, **kwargs):
+    """New channels and team/department moves can change visibility for many users."""
+    from .visibility import invalidate_all
+    invalidate_all()
 
 class ChannelNotificationSettings(models.Model):
     """User-specific notification settings for a channel."""
@@ -0,0 +1,139 @@
+"""
+Keyset (cursor) pagination for channel message history.
+
+Messages are windowed on ``(channel, created_at, id)`` so that loading a
+channel, or scrolling further back in it, only ever touches one page of rows
+regardless of how long the channel history is.
+"""
+
+import base64
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = getattr(settings, 'CHAT_MESSAGE_PAGE_SIZE', 50)
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(message):
+    """Return an opaque cursor pointing at ``message``."""
+    raw = f"{message.created_at.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by :func:`encode_cursor`.
+    Returns a ``(created_at, id)`` tuple, or ``None`` if the cursor is invalid.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, message_id = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(message_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def clamp_page_size(value):
+    """Parse a user supplied page size, falling back to the default."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _before(created_at, message_id):
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
+
+
+def _after(created_at, message_id):
+    return Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id)
+
+
+class MessageWindow:
+    """A chronologically ordered slice of a channel's messages."""
+
+    def __init__(self, messages, has_older, has_newer):
+        self.messages = messages
+        self.has_older = has_older
+        self.has_newer = has_newer
+
+    @property
+    def older_cursor(self):
+        return encode_cursor(self.messages[0]) if self.messages else None
+
+    @property
+    def newer_cursor(self):
+        return encode_cursor(self.messages[-1]) if self.messages else None
+
+
+def latest_window(queryset, page_size=DEFAULT_PAGE_SIZE):
+    """Return the most recent ``page_size`` messages of ``queryset``."""
+    rows = list(queryset.order_by('-created_at', '-id')[:page_size + 1])
+    has_older = len(rows) > page_size
+    messages = rows[:page_size][::-1]
+    annotate_date_separators(queryset, messages)
+    return MessageWindow(messages, has_older=has_older, has_newer=False)
+
+
+def older_window(queryset, cursor, page_size=DEFAULT_PAGE_SIZE):
+    """Return up to ``page_size`` messages strictly older than ``cursor``."""
+    position = decode_cursor(cursor)
+    if position is None:
+        return latest_window(queryset, page_size)
+    rows = list(
+        queryset.filter(_before(*position)).order_by('-created_at', '-id')[:page_size + 1]
+    )
+    has_older = len(rows) > page_size
+    messages = rows[:page_size][::-1]
+    annotate_date_separators(queryset, messages)
+    return MessageWindow(messages, has_older=has_older, has_newer=True)
+
+
+def newer_window(queryset, cursor, page_size=DEFAULT_PAGE_SIZE):
+    """Return up to ``page_size`` messages strictly newer than ``cursor``."""
+    position = decode_cursor(cursor)
+    if position is None:
+        return latest_window(queryset, page_size)
+    rows = list(
+        queryset.filter(_after(*position)).order_by('created_at', 'id')[:page_size + 1]
+    )
+    has_newer = len(rows) > page_size
+    messages = rows[:page_size]
+    annotate_date_separators(queryset, messages)
+    return MessageWindow(messages, has_older=True, has_newer=has_newer)
+
+
+def annotate_date_separators(queryset, messages):
+    """
+    Flag the messages of a window that start a new calendar day.
+
+    The first message is compared against the message immediately preceding
+    the window, so windows stitched together client-side never repeat or drop
+    a separator.
+    """
+    if not messages:
+        return messages
+
+    first = messages[0]
+    prev_created = queryset.filter(
+        _before(first.created_at, first.id)
+    ).order_by('-created_at', '-id').values_list('created_at', flat=True).first()
+    prev_date = prev_created.date() if prev_created else None
+
+    for msg in messages:
+        msg_date = msg.created_at.date()
+        if prev_date is None or msg_date != prev_date:
+            msg.show_date_separator = True
+            msg.date_label = msg.created_at
+        else:
+            msg.show_date_separator = False
+        msg.cursor = encode_cursor(msg)
+        prev_date = msg_date
+    return messages
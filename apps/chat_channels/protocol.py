@@ -0,0 +1,144 @@
+"""
+Wire formats for the chat websocket.
+
+Clients pick a format with the WebSocket subprotocol header:
+
+* no subprotocol - the original verbose JSON frames (default, old clients);
+* ``connectflow.v2.json`` - compact JSON text frames;
+* ``connectflow.v2.msgpack`` - the same compact frames as msgpack binary.
+
+Compact frames use the short keys in ``KEYS`` and leave out ``None`` values.
+Sender metadata (name, avatar, organization) is kept in a per-connection
+dictionary: the first frame from a sender, or the first after their details
+change, is preceded by a ``{"t": "sender", "s": id, "n": ..., "a": ...}``
+frame, and later frames carry only ``"s": id``.
+
+Incoming frames are decoded with the same codec; compact codecs accept long
+keys too, so a client may switch formats one direction at a time.
+"""
+
+import json
+
+import msgpack
+
+JSON_SUBPROTOCOL = 'connectflow.v2.json'
+MSGPACK_SUBPROTOCOL = 'connectflow.v2.msgpack'
+
+KEYS = {
+    'type': 't',
+    'message_id': 'id',
+    'message': 'm',
+    'message_type': 'mt',
+    'status': 'st',
+    'sender_id': 's',
+    'timestamp': 'ts',
+    'voice_message_url': 'vu',
+    'voice_duration': 'vd',
+    'attachments': 'at',
+    'parent_message_id': 'pm',
+    'parent_details': 'pd',
+    'is_pinned': 'pn',
+    'is_starred': 'sr',
+    'is_typing': 'ty',
+    'deleted_at': 'da',
+    'deleted_by': 'db',
+    'user_id': 'u',
+    'reactions': 'r',
+    'emoji': 'e',
+    'target_channel': 'tc',
+    'content': 'c',
+    'client_key': 'k',
+    'created_at': 'ca',
+    'duplicate': 'dp',
+    'event_id': 'ev',
+    'last_event_id': 'le',
+    'delta': 'dl',
+    'count': 'ct',
+}
+LONG_KEYS = {short: long for long, short in KEYS.items()}
+
+# Moved out of frames into the sender dictionary
+SENDER_KEYS = {
+    'sender_name': 'n',
+    'sender_avatar': 'a',
+    'sender_organization': 'o',
+}
+
+
+class ProtocolError(ValueError):
+    """An incoming frame could not be decoded."""
+
+
+def _as_frame(data):
+    if not isinstance(data, dict):
+        raise ProtocolError('Frames must be objects')
+    return data
+
+
+class LegacyCodec:
+    """The original format: one verbose JSON text frame per event."""
+    subprotocol = None
+
+    def encode(self, frame):
+        """Return the ``send()`` keyword arguments for each websocket frame."""
+        return [{'text_data': json.dumps(frame)}]
+
+    def decode(self, text_data=None, bytes_data=None):
+        try:
+            return _as_frame(json.loads(text_data if text_data is not None else bytes_data))
+        except ValueError as exc:
+            raise ProtocolError(str(exc)) from exc
+
+
+class CompactCodec(LegacyCodec):
+    """Short keys and a sender dictionary, as JSON text or msgpack binary."""
+
+    def __init__(self, binary=False):
+        self.binary = binary
+        self.subprotocol = MSGPACK_SUBPROTOCOL if binary else JSON_SUBPROTOCOL
+        self.senders = {}
+
+    def _pack(self, frame):
+        if self.binary:
+            return {'bytes_data': msgpack.packb(frame, use_bin_type=True)}
+        return {'text_data': json.dumps(frame, separators=(',', ':'))}
+
+    def encode(self, frame):
+        payloads = []
+        sender_id = frame.get('sender_id')
+        if sender_id is not None:
+            details = {short: frame[key] for key, short in SENDER_KEYS.items() if key in frame}
+            known = self.senders.get(sender_id)
+            if known is None or any(known.get(k) != v for k, v in details.items()):
+                known = {**(known or {}), **details}
+                self.senders[sender_id] = known
+                entry = {'t': 'sender', 's': sender_id}
+                entry.update((k, v) for k, v in known.items() if v is not None)
+                payloads.append(self._pack(entry))
+
+        payloads.append(self._pack({
+            KEYS.get(key, key): value
+            for key, value in frame.items()
+            if value is not None and key not in SENDER_KEYS
+        }))
+        return payloads
+
+    def decode(self, text_data=None, bytes_data=None):
+        if bytes_data is not None and self.binary:
+            try:
+                data = msgpack.unpackb(bytes_data, raw=False)
+            except (ValueError, msgpack.UnpackException) as exc:
+                raise ProtocolError(str(exc)) from exc
+        else:
+            data = super().decode(text_data, bytes_data)
+        return {LONG_KEYS.get(key, key): value for key, value in _as_frame(data).items()}
+
+
+def negotiate(subprotocols):
+    """The codec for the first subprotocol the client offers that we speak."""
+    for subprotocol in subprotocols or ():
+        if subprotocol == MSGPACK_SUBPROTOCOL:
+            return CompactCodec(binary=True)
+        if subprotocol == JSON_SUBPROTOCOL:
+            return CompactCodec()
+    return LegacyCodec()
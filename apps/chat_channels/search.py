@@ -0,0 +1,336 @@
+"""
+Full-text search over channel messages.
+
+The index lives next to the ``messages`` table and is kept current from
+``Message.save`` / ``delete`` (create, edit and soft delete):
+
+* PostgreSQL - a weighted ``search_vector tsvector`` column with a GIN index;
+* SQLite - an FTS5 table ``message_search`` keyed by a 63-bit slice of the
+  message UUID, so no lookup is needed to update or delete an entry.
+
+Other databases (or SQLite builds without FTS5) fall back to ``icontains``.
+Renaming a user re-indexes their messages (a ``User`` post_save hook in
+``models.py``). ``python manage.py rebuild_message_search`` re-indexes
+everything, e.g. after bulk ``QuerySet.update()`` calls that bypass ``save()``.
+
+Query syntax: free text (prefix matched, all terms required) plus
+``from:<user>`` and ``has:<file|link|attachment|image|video>``, all of which
+are evaluated in SQL.
+"""
+
+import re
+import uuid
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+FTS_TABLE = 'message_search'
+SNIPPET_TOKENS = 12
+
+# Sentinels survive HTML escaping and are swapped for <mark> afterwards
+_MARK_START, _MARK_END = '\x02', '\x03'
+
+_FILTER_FROM = re.compile(r'from:(\S+)')
+_FILTER_HAS = re.compile(r'has:(file|link|attachment|image|video)')
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+_fts5_available = None
+
+
+def backend():
+    """Return ``'postgresql'``, ``'sqlite'`` or ``None`` (no index available)."""
+    global _fts5_available
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite':
+        if not _fts5_available:
+            # Only a positive answer is cached: the table appears once migrated
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+                _fts5_available = cursor.fetchone() is not None
+        return 'sqlite' if _fts5_available else None
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Schema
+# ---------------------------------------------------------------------------
+
+def create_schema(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector")
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS messages_search_vector_gin ON messages USING GIN (search_vector)"
+        )
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "content, sender, message_id UNINDEXED, tokenize='unicode61 remove_diacritics 2')"
+            )
+        except Exception:
+            # SQLite built without FTS5: search keeps using icontains
+            pass
+
+
+def drop_schema(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS messages_search_vector_gin")
+        schema_editor.execute("ALTER TABLE messages DROP COLUMN IF EXISTS search_vector")
+    elif vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+# ---------------------------------------------------------------------------
+# Indexing
+# ---------------------------------------------------------------------------
+
+def _fts_rowid(message_id):
+    return uuid.UUID(str(message_id)).int >> 65
+
+
+def _sender_document(sender):
+    if sender is None:
+        return ''
+    return f'{sender.first_name} {sender.last_name} {sender.username}'.strip()
+
+
+def _index_rows(rows):
+    """Write ``(message_id, content, sender_document)`` rows to the index."""
+    kind = backend()
+    if not rows or kind is None:
+        return
+    with connection.cursor() as cursor:
+        if kind == 'postgresql':
+            cursor.executemany(
+                "UPDATE messages SET search_vector = "
+                "setweight(to_tsvector('english', %s), 'A') || "
+                "setweight(to_tsvector('simple', %s), 'B') "
+                "WHERE id = %s",
+                [(content or '', sender, message_id) for message_id, content, sender in rows]
+            )
+        else:
+            cursor.executemany(
+                f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, content, sender, message_id) VALUES (%s, %s, %s, %s)",
+                [(_fts_rowid(message_id), content or '', sender, uuid.UUID(str(message_id)).hex)
+                 for message_id, content, sender in rows]
+            )
+
+
+def index_message(message):
+    """Add or refresh a message in the index (removes it if soft deleted)."""
+    if message.is_deleted:
+        remove_message(message.pk)
+        return
+    _index_rows([(message.pk, message.content, _sender_document(message.sender))])
+
+
+def remove_message(message_id):
+    kind = backend()
+    if kind is None:
+        return
+    with connection.cursor() as cursor:
+        if kind == 'postgresql':
+            cursor.execute("UPDATE messages SET search_vector = NULL WHERE id = %s", [message_id])
+        else:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [_fts_rowid(message_id)])
+
+
+def rebuild_index(messages=None, batch_size=1000):
+    """Re-index every visible message in batches. Returns the number indexed."""
+    if messages is None:
+        from .models import Message
+        messages = Message.all_objects
+
+    kind = backend()
+    if kind is None:
+        return 0
+
+    with connection.cursor() as cursor:
+        if kind == 'postgresql':
+            cursor.execute("UPDATE messages SET search_vector = NULL WHERE search_vector IS NOT NULL")
+        else:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+    return _index_queryset(messages, batch_size)
+
+
+def reindex_sender(user_id, batch_size=1000):
+    """Refresh the sender names indexed with a user's messages. Returns the number indexed."""
+    from .models import Message
+    if backend() is None:
+        return 0
+    return _index_queryset(Message.all_objects.filter(sender_id=user_id), batch_size)
+
+
+def _index_queryset(messages, batch_size):
+    rows = messages.filter(is_deleted=False).order_by().values_list(
+        'pk', 'content', 'sender__first_name', 'sender__last_name', 'sender__username'
+    )
+    batch, count = [], 0
+    for pk, content, first, last, username in rows.iterator(chunk_size=batch_size):
+        batch.append((pk, content, f'{first} {last} {username}'.strip()))
+        if len(batch) >= batch_size:
+            _index_rows(batch)
+            count += len(batch)
+            batch = []
+    _index_rows(batch)
+    return count + len(batch)
+
+
+# ---------------------------------------------------------------------------
+# Querying
+# ---------------------------------------------------------------------------
+
+def parse_query(text):
+    """Split search box input into ``(free_text, from_user, has)``."""
+    text = text or ''
+    from_user = _FILTER_FROM.search(text)
+    has = _FILTER_HAS.search(text)
+    for match in (from_user, has):
+        if match:
+            text = text.replace(match.group(0), '')
+    return (
+        text.strip(),
+        from_user.group(1) if from_user else None,
+        has.group(1) if has else None,
+    )
+
+
+def apply_filters(queryset, from_user=None, has=None):
+    """Apply ``from:`` / ``has:`` filters as SQL conditions."""
+    if from_user:
+        queryset = queryset.filter(
+            Q(sender__username__iexact=from_user) |
+            Q(sender__first_name__icontains=from_user) |
+            Q(sender__last_name__icontains=from_user)
+        )
+
+    if has in ('file', 'attachment'):
+        queryset = queryset.filter(attachments__isnull=False).distinct()
+    elif has == 'link':
+        # Messages containing URLs
+        queryset = queryset.filter(
+            Q(content__icontains='http://') |
+            Q(content__icontains='https://')
+        )
+    elif has == 'image':
+        queryset = queryset.filter(message_type='IMAGE')
+    elif has == 'video':
+        queryset = queryset.filter(message_type='VIDEO')
+    return queryset
+
+
+def _terms(text):
+    return _TERM.findall(text)[:16]
+
+
+def _fts5_query(terms):
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _tsquery(terms):
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def _highlight(snippet):
+    return escape(snippet).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+
+def filter_text(queryset, text):
+    """Restrict ``queryset`` to messages matching ``text`` (ordering untouched)."""
+    terms = _terms(text)
+    if not terms:
+        return queryset
+    kind = backend()
+    if kind == 'postgresql':
+        return queryset.extra(
+            where=["messages.search_vector @@ to_tsquery('english', %s)"],
+            params=[_tsquery(terms)]
+        )
+    if kind == 'sqlite':
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT message_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            [_fts5_query(terms)]
+        ))
+    return queryset.filter(
+        Q(content__icontains=text) |
+        Q(sender__first_name__icontains=text) |
+        Q(sender__last_name__icontains=text) |
+        Q(sender__username__icontains=text)
+    )
+
+
+def filter_messages(queryset, search_query):
+    """Apply the full search box syntax to a message queryset."""
+    if not search_query:
+        return queryset
+    text, from_user, has = parse_query(search_query)
+    return apply_filters(filter_text(queryset, text), from_user, has)
+
+
+class SearchResult:
+    """A ranked search hit with an HTML-safe highlighted snippet."""
+
+    def __init__(self, message, rank, snippet):
+        self.message = message
+        self.rank = rank
+        self.snippet = snippet
+
+
+def search_messages(queryset, search_query, limit=20):
+    """
+    Ranked search over ``queryset`` (already restricted to what the user may see).
+    Returns a list of :class:`SearchResult`, best match first.
+    """
+    text, from_user, has = parse_query(search_query)
+    queryset = apply_filters(queryset, from_user, has).select_related('sender', 'channel')
+    terms = _terms(text)
+    kind = backend()
+
+    if not terms or kind is None:
+        # Filter-only search (or no index): newest first, plain snippet
+        messages = list(filter_text(queryset, text).order_by('-created_at')[:limit])
+        return [SearchResult(m, 0.0, escape(m.content[:200])) for m in messages]
+
+    if kind == 'postgresql':
+        tsquery = _tsquery(terms)
+        messages = queryset.extra(
+            select={
+                'search_rank': "ts_rank(messages.search_vector, to_tsquery('english', %s))",
+                'search_snippet': "ts_headline('english', messages.content, to_tsquery('english', %s), %s)",
+            },
+            select_params=[
+                tsquery,
+                tsquery, f'StartSel={_MARK_START}, StopSel={_MARK_END}, MaxWords=20, MinWords=5',
+            ],
+            where=["messages.search_vector @@ to_tsquery('english', %s)"],
+            params=[tsquery],
+        ).order_by('-search_rank', '-created_at')[:limit]
+        return [SearchResult(m, m.search_rank, _highlight(m.search_snippet)) for m in messages]
+
+    # SQLite: rank and snippet come from FTS5, candidate set from the filtered queryset
+    scope_sql, scope_params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT message_id, bm25({FTS_TABLE}, 1.0, 0.4), "
+            f"snippet({FTS_TABLE}, 0, %s, %s, '…', {SNIPPET_TOKENS}) "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND message_id IN ({scope_sql}) "
+            f"ORDER BY bm25({FTS_TABLE}, 1.0, 0.4) LIMIT %s",
+            [_MARK_START, _MARK_END, _fts5_query(terms), *scope_params, limit]
+        )
+        hits = cursor.fetchall()
+
+    messages = queryset.model.all_objects.select_related('sender', 'channel').in_bulk(
+        [uuid.UUID(message_id) for message_id, _, _ in hits]
+    )
+    return [
+        # bm25() is lower-is-better; flip it so higher rank means a better match
+        SearchResult(messages[uuid.UUID(message_id)], -score, _highlight(snippet))
+        for message_id, score, snippet in hits
+        if uuid.UUID(message_id) in messages
+    ]
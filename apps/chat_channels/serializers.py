@@ -1,13 +1,20 @@
+from django.db.models import Count, Exists, OuterRef, Prefetch, Value
 from rest_framework import serializers
-from .models import Channel, Message, Attachment, MessageReaction, MessageReadReceipt, ChannelNotificationSettings
+from .models import Channel, ChannelReadCursor, ChannelStats, Message, Attachment, MessageReaction, ChannelNotificationSettings
 from apps.accounts.serializers import UserSerializer
 
-class MessageReadReceiptSerializer(serializers.ModelSerializer):
+class MessageReadReceiptSerializer(serializers.Serializer):
+    """
+    Read receipts derived from ChannelReadCursor rows.
+    Keeps the old per-message receipt shape for existing API clients.
+    """
+    id = serializers.UUIDField(read_only=True)
+    message = serializers.PrimaryKeyRelatedField(
+        source='last_read_message', queryset=Message.objects.all()
+    )
+    user = serializers.PrimaryKeyRelatedField(read_only=True)
     username = serializers.ReadOnlyField(source='user.username')
-    
-    class Meta:
-        model = MessageReadReceipt
-        fields = ['id', 'message', 'user', 'username', 'read_at']
+    read_at = serializers.DateTimeField(source='updated_at', read_only=True)
 
 class ChannelNotificationSettingsSerializer(serializers.ModelSerializer):
     class Meta:
@@ -50,6 +57,28 @@ class MessageSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['sender', 'is_edited', 'is_deleted', 'created_at', 'is_pinned']
 
+    @staticmethod
+    def setup_queryset(queryset, user=None):
+        """
+        Serialization plan: everything this serializer reads, fetched in a
+        fixed number of queries however many messages are serialized.
+        """
+        if user is not None and user.is_authenticated:
+            starred = Exists(Message.starred_by.through.objects.filter(
+                message_id=OuterRef('pk'), user_id=user.pk
+            ))
+        else:
+            starred = Value(False)
+        return queryset.select_related(
+            'sender', 'parent_message__sender'
+        ).prefetch_related(
+            'attachments',
+            Prefetch('reactions', queryset=MessageReaction.objects.select_related('user')),
+        ).annotate(
+            star_count_annotated=Count('starred_by', distinct=True),
+            is_starred_annotated=starred,
+        )
+
     def get_parent_details(self, obj):
         if obj.parent_message:
             return {
@@ -60,9 +89,14 @@ class MessageSerializer(serializers.ModelSerializer):
         return None
 
     def get_star_count(self, obj):
+        # Annotated by setup_queryset in list views
+        if hasattr(obj, 'star_count_annotated'):
+            return obj.star_count_annotated
         return obj.starred_by.count()
 
     def get_is_starred(self, obj):
+        if hasattr(obj, 'is_starred_annotated'):
+            return obj.is_starred_annotated
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.starred_by.filter(id=request.user.id).exists()
@@ -71,14 +105,40 @@ class MessageSerializer(serializers.ModelSerializer):
 class ChannelSerializer(serializers.ModelSerializer):
     member_count = serializers.SerializerMethodField()
     display_name = serializers.SerializerMethodField(required=False)
+    last_activity = serializers.SerializerMethodField()
+    unread_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Channel
         fields = [
             'id', 'name', 'description', 'channel_type', 'organization', 
-            'is_private', 'read_only', 'member_count', 'created_at', 'display_name'
+            'is_private', 'read_only', 'member_count', 'created_at', 'display_name',
+            'last_activity', 'unread_count'
         ]
 
+    def get_unread_count(self, obj):
+        # Annotated by ChannelReadCursor.annotate_unread_counts in list views
+        if hasattr(obj, 'unread_count'):
+            return obj.unread_count
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            return ChannelReadCursor.unread_count(request.user, obj)
+        return None
+
+    def get_last_activity(self, obj):
+        """Denormalized last message snapshot from ChannelStats (select_related('stats'))."""
+        try:
+            stats = obj.stats
+        except ChannelStats.DoesNotExist:
+            return None
+        return {
+            'message_id': str(stats.last_message_id) if stats.last_message_id else None,
+            'preview': stats.last_message_preview,
+            'sender_id': stats.last_message_sender_id,
+            'timestamp': stats.last_message_at,
+            'message_count': stats.message_count,
+        }
+
     def get_member_count(self, obj):
         # Prefer annotated value if available (more efficient)
         if hasattr(obj, 'member_count_annotated'):
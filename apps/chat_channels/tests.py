@@ -1,7 +1,12 @@
-from django.test import TestCase
+import asyncio
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from apps.organizations.models import Organization
 from apps.chat_channels.models import Channel, Message
+from connectflow.query_budget import QueryBudgetTestMixin
 from rest_framework.test import APIClient
 from rest_framework import status
 import uuid
@@ -80,4 +85,1276 @@ class PinMessageTests(TestCase):
         except KeyError as e:
             self.fail(f"_broadcast raised KeyError: {e}")
         except Exception as e:
-            self.fail(f"_broadcast raised unexpected exception: {e}")
\ No newline at end of file
+            self.fail(f"_broadcast raised unexpected exception: {e}")
+
+class MessageWindowTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Window Org', code='window-org')
+        self.user = User.objects.create_user(
+            username='windowuser',
+            email='window@example.com',
+            password='password123',
+            email_verified=True,
+            organization=self.org
+        )
+        self.channel = Channel.objects.create(
+            name='history',
+            organization=self.org,
+            channel_type=Channel.ChannelType.PRIVATE,
+            created_by=self.user
+        )
+        self.channel.members.add(self.user)
+        self.messages = [
+            Message.objects.create(channel=self.channel, sender=self.user, content=f"msg {i}")
+            for i in range(7)
+        ]
+        self.client.force_login(self.user)
+
+    def test_latest_window_and_older_cursor(self):
+        from apps.chat_channels.pagination import latest_window, older_window
+        queryset = Message.objects.filter(channel=self.channel)
+
+        window = latest_window(queryset, page_size=3)
+        self.assertEqual([m.content for m in window.messages], ['msg 4', 'msg 5', 'msg 6'])
+        self.assertTrue(window.has_older)
+
+        older = older_window(queryset, window.older_cursor, page_size=3)
+        self.assertEqual([m.content for m in older.messages], ['msg 1', 'msg 2', 'msg 3'])
+        self.assertTrue(older.has_older)
+
+        oldest = older_window(queryset, older.older_cursor, page_size=3)
+        self.assertEqual([m.content for m in oldest.messages], ['msg 0'])
+        self.assertFalse(oldest.has_older)
+        # Separator is only shown once per day across stitched windows
+        self.assertTrue(oldest.messages[0].show_date_separator)
+        self.assertFalse(older.messages[0].show_date_separator)
+
+    def test_newer_endpoint_returns_json_fragment(self):
+        from apps.chat_channels.pagination import encode_cursor
+        url = f'/channels/{self.channel.pk}/messages/newer/'
+        response = self.client.get(url, {
+            'cursor': encode_cursor(self.messages[4]),
+            'format': 'json',
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([m['content'] for m in data['messages']], ['msg 5', 'msg 6'])
+        self.assertFalse(data['has_more'])
+
+    def test_older_endpoint_returns_html_fragment(self):
+        from apps.chat_channels.pagination import encode_cursor
+        url = f'/channels/{self.channel.pk}/messages/older/'
+        response = self.client.get(url, {'cursor': encode_cursor(self.messages[2]), 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'id="message-{self.messages[1].pk}"')
+        self.assertEqual(response['X-Has-More'], 'true')
+
+    def test_channel_detail_renders_only_latest_window(self):
+        response = self.client.get(f'/channels/{self.channel.pk}/', {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['chat_messages']), 2)
+        self.assertContains(response, 'id="load-older-messages"')
+
+
+class ChannelStatsTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Stats Org', code='stats-org')
+        self.user = User.objects.create_user(
+            username='statsuser',
+            email='stats@example.com',
+            password='password123',
+            email_verified=True,
+            organization=self.org
+        )
+        self.channel = Channel.objects.create(
+            name='stats',
+            organization=self.org,
+            channel_type=Channel.ChannelType.PRIVATE,
+            created_by=self.user
+        )
+        self.channel.members.add(self.user)
+
+    def test_stats_follow_create_and_soft_delete(self):
+        from apps.chat_channels.models import ChannelStats
+        first = Message.objects.create(channel=self.channel, sender=self.user, content="first")
+        second = Message.objects.create(channel=self.channel, sender=self.user, content="second")
+
+        stats = ChannelStats.objects.get(channel=self.channel)
+        self.assertEqual(stats.message_count, 2)
+        self.assertEqual(stats.last_message_id, second.id)
+        self.assertEqual(stats.last_message_preview, "second")
+
+        second.soft_delete(user=self.user)
+        stats.refresh_from_db()
+        self.assertEqual(stats.message_count, 1)
+        self.assertEqual(stats.last_message_id, first.id)
+
+        self.assertEqual(ChannelStats.rebuild(self.channel).message_count, 1)
+
+    def test_preview_follows_edits_only(self):
+        from apps.chat_channels.models import ChannelStats
+        message = Message.objects.create(channel=self.channel, sender=self.user, content="draft")
+        stats = ChannelStats.objects.get(channel=self.channel)
+
+        message.is_pinned = True
+        # Savepoint, the UPDATE itself, release: no channel_stats write
+        with self.assertNumQueries(3):
+            message.save(update_fields=['is_pinned'])
+
+        message.content = "final"
+        message.save()
+        stats.refresh_from_db()
+        self.assertEqual(stats.last_message_preview, "final")
+
+    def test_channel_api_exposes_last_activity(self):
+        Message.objects.create(channel=self.channel, sender=self.user, content="hello sidebar")
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get('/api/v1/channels/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['last_activity']['preview'], "hello sidebar")
+        self.assertEqual(response.data['results'][0]['last_activity']['message_count'], 1)
+
+
+class ChannelReadCursorTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Cursor Org', code='cursor-org')
+        self.reader = User.objects.create_user(
+            username='reader',
+            email='reader@example.com',
+            password='password123',
+            email_verified=True,
+            organization=self.org
+        )
+        self.author = User.objects.create_user(
+            username='author',
+            email='author@example.com',
+            password='password123',
+            email_verified=True,
+            organization=self.org
+        )
+        self.channel = Channel.objects.create(
+            name='cursor',
+            organization=self.org,
+            channel_type=Channel.ChannelType.PRIVATE,
+            created_by=self.author
+        )
+        self.channel.members.add(self.reader, self.author)
+        self.messages = [
+            Message.objects.create(channel=self.channel, sender=self.author, content=f"msg {i}")
+            for i in range(3)
+        ]
+
+    def test_cursor_only_moves_forward(self):
+        from apps.chat_channels.models import ChannelReadCursor
+        self.assertEqual(ChannelReadCursor.unread_count(self.reader, self.channel), 3)
+
+        self.assertTrue(ChannelReadCursor.advance(self.reader, self.messages[1]))
+        self.assertFalse(ChannelReadCursor.advance(self.reader, self.messages[0]))
+
+        cursor = ChannelReadCursor.objects.get(user=self.reader, channel=self.channel)
+        self.assertEqual(cursor.last_read_message_id, self.messages[1].id)
+        self.assertEqual(ChannelReadCursor.unread_count(self.reader, self.channel), 1)
+
+        annotated = ChannelReadCursor.annotate_unread_counts(
+            Channel.objects.filter(pk=self.channel.pk), self.reader
+        ).get()
+        self.assertEqual(annotated.unread_count, 1)
+
+        readers = ChannelReadCursor.readers_of(self.messages[0])
+        self.assertEqual([c.user for c in readers], [self.reader])
+        self.assertFalse(ChannelReadCursor.readers_of(self.messages[2]).exists())
+
+    def test_receipt_api_is_derived_from_cursor(self):
+        from apps.chat_channels.models import ChannelReadCursor, MessageReadReceipt
+        client = APIClient()
+        client.force_authenticate(user=self.reader)
+
+        response = client.post('/api/v1/message-read-receipts/', {'message': str(self.messages[2].id)})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['message'], self.messages[2].id)
+        self.assertFalse(MessageReadReceipt.objects.exists())
+        self.assertEqual(ChannelReadCursor.unread_count(self.reader, self.channel), 0)
+
+        response = client.get('/api/v1/message-read-receipts/', {'message': str(self.messages[0].id)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['username'] for r in response.data['results']], ['reader'])
+
+        response = client.get('/api/v1/message-read-receipts/', {'message': 'zzz'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_advance_after_losing_the_insert_race(self):
+        from unittest import mock
+        from apps.chat_channels.models import ChannelReadCursor
+        real_get_or_create = ChannelReadCursor.objects.get_or_create
+
+        def racing_get_or_create(**kwargs):
+            # Another request inserts the cursor on an older message first
+            ChannelReadCursor.objects.create(
+                user=self.reader, channel=self.channel,
+                last_read_message=self.messages[0], last_read_at=self.messages[0].created_at
+            )
+            return real_get_or_create(**kwargs)
+
+        with mock.patch.object(ChannelReadCursor.objects, 'get_or_create', side_effect=racing_get_or_create):
+            self.assertTrue(ChannelReadCursor.advance(self.reader, self.messages[2]))
+
+        cursor = ChannelReadCursor.objects.get(user=self.reader, channel=self.channel)
+        self.assertEqual(cursor.last_read_message_id, self.messages[2].id)
+
+    def test_collapse_read_receipts_command(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from apps.chat_channels.models import ChannelReadCursor, MessageReadReceipt
+        for message in self.messages[:2]:
+            MessageReadReceipt.objects.create(message=message, user=self.reader)
+
+        call_command('collapse_read_receipts', '--delete', '--batch-size', '1', stdout=StringIO())
+
+        cursor = ChannelReadCursor.objects.get(user=self.reader, channel=self.channel)
+        self.assertEqual(cursor.last_read_message_id, self.messages[1].id)
+        self.assertFalse(MessageReadReceipt.objects.exists())
+
+
+    def test_migration_collapses_existing_receipts(self):
+        from importlib import import_module
+        from django.apps import apps
+        from apps.chat_channels.models import ChannelReadCursor, MessageReadReceipt
+        migration = import_module('apps.chat_channels.migrations.0030_collapse_read_receipts')
+        for message in self.messages[:2]:
+            MessageReadReceipt.objects.create(message=message, user=self.reader)
+        ChannelReadCursor.objects.create(
+            user=self.author, channel=self.channel,
+            last_read_message=self.messages[2], last_read_at=self.messages[2].created_at
+        )
+        MessageReadReceipt.objects.create(message=self.messages[0], user=self.author)
+
+        migration.collapse_read_receipts(apps, None)
+
+        cursors = dict(ChannelReadCursor.objects.values_list('user__username', 'last_read_message_id'))
+        self.assertEqual(cursors, {'reader': self.messages[1].id, 'author': self.messages[2].id})
+        self.assertEqual(ChannelReadCursor.unread_count(self.reader, self.channel), 1)
+
+
+class EventCoalescerTests(SimpleTestCase):
+    def _coalescer(self, **windows):
+        from apps.chat_channels.coalescing import EventCoalescer
+        self.reads, self.typing = [], []
+
+        async def flush_reads(message_ids):
+            self.reads.append(set(message_ids))
+
+        async def flush_typing(is_typing):
+            self.typing.append(is_typing)
+
+        return EventCoalescer(flush_reads, flush_typing, **windows)
+
+    def test_read_burst_collapses_into_one_flush(self):
+        from connectflow.metrics import COALESCER_FLUSHES, COALESCER_FRAMES
+        frames = COALESCER_FRAMES.values.get(('read',), 0)
+        flushes = COALESCER_FLUSHES.values.get(('read',), 0)
+        coalescer = self._coalescer(read_window=0.01, typing_window=0.01)
+
+        async def scenario():
+            for message_id in ('a', 'b', 'c'):
+                await coalescer.add_read(message_id)
+            await asyncio.sleep(0.05)
+
+        asyncio.run(scenario())
+        self.assertEqual(self.reads, [{'a', 'b', 'c'}])
+        self.assertEqual(coalescer.collapsed['read'], 2)
+        self.assertEqual(COALESCER_FRAMES.values[('read',)] - frames, 3)
+        self.assertEqual(COALESCER_FLUSHES.values[('read',)] - flushes, 1)
+
+    def test_typing_only_broadcasts_state_changes(self):
+        coalescer = self._coalescer(read_window=0, typing_window=0, typing_refresh=60)
+
+        async def scenario():
+            for state in (True, True, True, False, False):
+                await coalescer.set_typing(state)
+            await coalescer.set_typing(True)
+            await coalescer.close()
+
+        asyncio.run(scenario())
+        self.assertEqual(self.typing, [True, False, True, False])
+        self.assertEqual(coalescer.collapsed['typing'], 2)
+
+
+    def test_failed_flush_is_logged_and_retried_on_close(self):
+        from apps.chat_channels.coalescing import EventCoalescer
+        attempts = []
+
+        async def flush_reads(message_ids):
+            attempts.append(set(message_ids))
+            if len(attempts) == 1:
+                raise RuntimeError('layer down')
+
+        async def flush_typing(is_typing):
+            pass
+
+        coalescer = EventCoalescer(flush_reads, flush_typing, read_window=0.01)
+
+        async def scenario():
+            await coalescer.add_read('a')
+            await asyncio.sleep(0.05)
+            await coalescer.close()
+
+        with self.assertLogs('apps.chat_channels.coalescing', 'ERROR'):
+            asyncio.run(scenario())
+        self.assertEqual(attempts, [{'a'}, {'a'}])
+
+    def test_close_waits_for_a_running_flush(self):
+        from apps.chat_channels.coalescing import EventCoalescer
+        done = []
+
+        async def flush_reads(message_ids):
+            await asyncio.sleep(0.05)
+            done.append(set(message_ids))
+
+        async def flush_typing(is_typing):
+            pass
+
+        coalescer = EventCoalescer(flush_reads, flush_typing, read_window=0.01)
+
+        async def scenario():
+            await coalescer.add_read('a')
+            await asyncio.sleep(0.02)
+            await coalescer.close()
+            return list(done)
+
+        self.assertEqual(asyncio.run(scenario()), [{'a'}])
+
+
+class ChannelVisibilityTests(TestCase):
+    def setUp(self):
+        from apps.organizations.models import Department, Team
+        from django.core.cache import cache
+        cache.clear()
+        self.org = Organization.objects.create(name='Visibility Org', code='vis-org')
+        self.user = User.objects.create_user(
+            username='viewer',
+            email='viewer@example.com',
+            password='password123',
+            organization=self.org
+        )
+        self.department = Department.objects.create(organization=self.org, name='Eng')
+        self.team = Team.objects.create(department=self.department, name='Core')
+        self.official = Channel.objects.create(
+            name='general', organization=self.org, channel_type=Channel.ChannelType.OFFICIAL
+        )
+        self.team_channel = Channel.objects.create(
+            name='core', organization=self.org, channel_type=Channel.ChannelType.TEAM, team=self.team
+        )
+        self.dept_channel = Channel.objects.create(
+            name='eng', organization=self.org, channel_type=Channel.ChannelType.DEPARTMENT,
+            department=self.department
+        )
+        self.private = Channel.objects.create(
+            name='secret', organization=self.org, channel_type=Channel.ChannelType.PRIVATE
+        )
+
+    def assertVisible(self, expected):
+        visible = set(Channel.objects.visible_to(self.user).values_list('pk', flat=True))
+        self.assertEqual(visible, {c.pk for c in expected})
+        for channel in (self.official, self.team_channel, self.dept_channel, self.private):
+            self.assertEqual(channel.can_user_view(self.user), channel in expected)
+
+    def test_resolver_matches_access_rules_and_invalidates(self):
+        self.assertVisible([self.official])
+
+        self.team.members.add(self.user)
+        self.assertVisible([self.official, self.team_channel, self.dept_channel])
+
+        self.private.members.add(self.user)
+        self.assertVisible([self.official, self.team_channel, self.dept_channel, self.private])
+
+        self.user.channels.remove(self.private)
+        self.assertVisible([self.official, self.team_channel, self.dept_channel])
+
+    def test_cached_lookup_avoids_queries(self):
+        from apps.chat_channels.visibility import visible_channel_ids
+        visible_channel_ids(self.user)
+        with self.assertNumQueries(0):
+            self.assertIn(self.official.pk, visible_channel_ids(self.user))
+
+
+class MessageSearchTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.org = Organization.objects.create(name='Search Org', code='search-org')
+        self.user = User.objects.create_user(
+            username='searcher',
+            email='searcher@example.com',
+            password='password123',
+            first_name='Ada',
+            organization=self.org
+        )
+        self.other = User.objects.create_user(
+            username='bob',
+            email='bob@example.com',
+            password='password123',
+            organization=self.org
+        )
+        self.channel = Channel.objects.create(
+            name='search',
+            organization=self.org,
+            channel_type=Channel.ChannelType.PRIVATE,
+            created_by=self.user
+        )
+        self.channel.members.add(self.user, self.other)
+        self.hidden = Channel.objects.create(
+            name='hidden', organization=self.org, channel_type=Channel.ChannelType.PRIVATE
+        )
+
+    def search(self, query):
+        from apps.chat_channels.search import filter_messages
+        return set(filter_messages(Message.objects.all(), query).values_list('content', flat=True))
+
+    def test_index_follows_create_edit_and_delete(self):
+        message = Message.objects.create(channel=self.channel, sender=self.user, content="Deploying the release")
+        self.assertEqual(self.search('deploy'), {"Deploying the release"})
+
+        message.content = "Rolling back instead"
+        message.save()
+        self.assertEqual(self.search('deploy'), set())
+        self.assertEqual(self.search('rolling'), {"Rolling back instead"})
+
+        message.soft_delete(user=self.user)
+        self.assertEqual(self.search('rolling'), set())
+
+    def test_from_and_has_filters(self):
+        Message.objects.create(channel=self.channel, sender=self.user, content="docs at https://example.com")
+        Message.objects.create(channel=self.channel, sender=self.other, content="docs are stale")
+        self.assertEqual(self.search('docs from:bob'), {"docs are stale"})
+        self.assertEqual(self.search('docs has:link'), {"docs at https://example.com"})
+
+    def test_api_ranks_and_scopes_to_visible_channels(self):
+        Message.objects.create(channel=self.channel, sender=self.other, content="budget <b>review</b> tomorrow")
+        Message.objects.create(channel=self.hidden, sender=self.other, content="budget secrets")
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.get('/api/v1/messages/search/', {'q': 'budget'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['channel_id'], str(self.channel.id))
+        self.assertIn('<mark>budget</mark>', response.data[0]['snippet'])
+        self.assertNotIn('<b>', response.data[0]['snippet'])
+
+        self.assertEqual(client.get('/api/v1/messages/search/').status_code, status.HTTP_400_BAD_REQUEST)
+        response = client.get('/api/v1/messages/search/', {'q': 'budget', 'channel': 'zzz'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = client.get('/api/v1/messages/search/', {'q': 'budget', 'channel': str(self.hidden.id)})
+        self.assertEqual(response.data, [])
+
+    def test_metadata_saves_skip_the_index(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from apps.chat_channels.search import FTS_TABLE
+
+        message = Message.objects.get(
+            pk=Message.objects.create(channel=self.channel, sender=self.user, content="pin me").pk
+        )
+        message.is_pinned = True
+        with CaptureQueriesContext(connection) as queries:
+            message.save()
+        self.assertFalse([q['sql'] for q in queries if FTS_TABLE in q['sql'] or 'search_vector' in q['sql']])
+        self.assertEqual(self.search('pin'), {"pin me"})
+
+    def test_renaming_a_sender_reindexes_their_messages(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from apps.chat_channels.search import FTS_TABLE
+
+        Message.objects.create(channel=self.channel, sender=self.other, content="status update")
+        self.assertEqual(self.search('robert'), set())
+
+        other = User.objects.get(pk=self.other.pk)
+        other.first_name = 'Robert'
+        other.save()
+        self.assertEqual(self.search('robert'), {"status update"})
+
+        other.status = User.Status.AWAY
+        with CaptureQueriesContext(connection) as queries:
+            other.save()
+        self.assertFalse([q['sql'] for q in queries if FTS_TABLE in q['sql'] or 'search_vector' in q['sql']])
+
+    def test_rebuild_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        Message.objects.create(channel=self.channel, sender=self.user, content="indexed twice")
+        out = StringIO()
+        call_command('rebuild_message_search', stdout=out)
+        self.assertIn('Indexed 1 message(s)', out.getvalue())
+        self.assertEqual(self.search('twice'), {"indexed twice"})
+
+
+class MessageRenderingTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Render Org', code='render-org')
+        self.user = User.objects.create_user(
+            username='renderer',
+            email='renderer@example.com',
+            password='password123',
+            organization=self.org
+        )
+        self.channel = Channel.objects.create(
+            name='render',
+            organization=self.org,
+            channel_type=Channel.ChannelType.PRIVATE,
+            created_by=self.user
+        )
+
+    def test_renders_only_when_content_changes(self):
+        from apps.chat_channels.markdown_utils import RENDER_VERSION
+        message = Message.objects.create(channel=self.channel, sender=self.user, content="**hi**")
+        self.assertTrue(message.has_formatting)
+        self.assertEqual(message.formatted_content, "<strong>hi</strong>")
+        self.assertEqual(message.render_version, RENDER_VERSION)
+
+        message = Message.objects.get(pk=message.pk)
+        message.formatted_content = "untouched"
+        message.is_pinned = True
+        message.save()
+        self.assertEqual(message.formatted_content, "untouched")
+
+        message.content = "plain now"
+        message.save(update_fields=['content'])
+        message.refresh_from_db()
+        self.assertFalse(message.has_formatting)
+        self.assertIsNone(message.formatted_content)
+
+    def test_rerender_command_upgrades_stale_rows(self):
+        from io import StringIO
+        from django.core.management import call_command
+        message = Message.objects.create(channel=self.channel, sender=self.user, content="_old_")
+        Message.all_objects.filter(pk=message.pk).update(render_version=0, formatted_content="stale")
+
+        out = StringIO()
+        call_command('rerender_messages', '--batch-size', '1', stdout=out)
+        self.assertIn('Re-rendered 1 message(s)', out.getvalue())
+        message.refresh_from_db()
+        self.assertEqual(message.formatted_content, "<em>old</em>")
+
+
+class EmojiClassifierTests(SimpleTestCase):
+    def test_sequences_count_as_one_emoji(self):
+        from apps.chat_channels.emoji import emoji_count, emoji_only_count
+        self.assertEqual(emoji_only_count("👍🏽"), 1)
+        self.assertEqual(emoji_only_count("👨‍👩‍👧‍👦"), 1)
+        self.assertEqual(emoji_only_count("🇬🇭 🇺🇸"), 2)
+        self.assertEqual(emoji_only_count("1️⃣ ❤️"), 2)
+        self.assertEqual(emoji_only_count("©"), 0)
+        self.assertEqual(emoji_only_count("你好"), 0)
+        self.assertEqual(emoji_only_count("done 👍"), 0)
+        self.assertEqual(emoji_count("done 👍 and 👩‍💻"), 2)
+
+
+class MessageEmojiTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Emoji Org', code='emoji-org')
+        self.user = User.objects.create_user(
+            username='emojifan',
+            email='emoji@example.com',
+            password='password123',
+            organization=self.org
+        )
+        self.channel = Channel.objects.create(
+            name='emoji',
+            organization=self.org,
+            channel_type=Channel.ChannelType.PRIVATE,
+            created_by=self.user
+        )
+
+    def test_type_and_count_are_stored_at_write_time(self):
+        message = Message.objects.create(channel=self.channel, sender=self.user, content="🎉 🎉")
+        self.assertEqual(message.message_type, 'EMOJI')
+        self.assertEqual(message.emoji_count, 2)
+
+        message.content = "🎉 **party**"
+        message.save()
+        message.refresh_from_db()
+        self.assertEqual(message.message_type, 'TEXT')
+        self.assertEqual(message.emoji_count, 0)
+        self.assertTrue(message.has_formatting)
+
+        cjk = Message.objects.create(channel=self.channel, sender=self.user, content="你好")
+        self.assertEqual(cjk.message_type, 'TEXT')
+
+
+class ChatProtocolTests(SimpleTestCase):
+    frame = {
+        'type': 'chat_message',
+        'message': 'Hello',
+        'sender_id': 7,
+        'sender_name': 'Ama Mensah',
+        'sender_avatar': None,
+        'message_id': 'abc',
+        'voice_message_url': None,
+        'attachments': [],
+    }
+
+    def test_legacy_is_the_default(self):
+        from apps.chat_channels import protocol
+        codec = protocol.negotiate([])
+        self.assertIsNone(codec.subprotocol)
+        payloads = codec.encode(self.frame)
+        self.assertEqual(len(payloads), 1)
+        self.assertEqual(codec.decode(payloads[0]['text_data']), self.frame)
+
+        with self.assertRaises(protocol.ProtocolError):
+            codec.decode('[1, 2]')
+
+    def test_sender_details_are_sent_once(self):
+        import json
+        from apps.chat_channels import protocol
+        codec = protocol.negotiate(['chat', protocol.JSON_SUBPROTOCOL])
+        self.assertEqual(codec.subprotocol, protocol.JSON_SUBPROTOCOL)
+
+        first = [json.loads(p['text_data']) for p in codec.encode(self.frame)]
+        self.assertEqual(first[0], {'t': 'sender', 's': 7, 'n': 'Ama Mensah'})
+        self.assertEqual(first[1], {'t': 'chat_message', 'm': 'Hello', 's': 7, 'id': 'abc', 'at': []})
+
+        self.assertEqual(len(codec.encode(self.frame)), 1)
+        renamed = codec.encode({**self.frame, 'sender_name': 'Ama K. Mensah'})
+        self.assertEqual(json.loads(renamed[0]['text_data'])['n'], 'Ama K. Mensah')
+
+    def test_msgpack_round_trip(self):
+        import msgpack
+        from apps.chat_channels import protocol
+        codec = protocol.negotiate([protocol.MSGPACK_SUBPROTOCOL])
+        payloads = codec.encode({'type': 'presence', 'user_id': 7, 'status': 'ONLINE'})
+        self.assertEqual(msgpack.unpackb(payloads[0]['bytes_data']), {'t': 'presence', 'u': 7, 'st': 'ONLINE'})
+
+        incoming = msgpack.packb({'t': 'message_reaction', 'id': 'abc', 'e': '👍'})
+        self.assertEqual(
+            codec.decode(bytes_data=incoming),
+            {'type': 'message_reaction', 'message_id': 'abc', 'emoji': '👍'}
+        )
+        # Long keys in a JSON text frame are understood as well
+        self.assertEqual(codec.decode('{"type": "typing", "is_typing": true}'), {'type': 'typing', 'is_typing': True})
+        with self.assertRaises(protocol.ProtocolError):
+            codec.decode(bytes_data=b'\xc1')
+
+
+class MessageIdempotencyTests(TransactionTestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Retry Org', code='retry-org')
+        self.user = User.objects.create_user(
+            username='retrier',
+            email='retry@example.com',
+            password='password123',
+            organization=self.org
+        )
+        self.channel = Channel.objects.create(
+            name='retries',
+            organization=self.org,
+            channel_type=Channel.ChannelType.PRIVATE,
+            created_by=self.user
+        )
+        self.channel.members.add(self.user)
+
+    def _communicator(self):
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+        from apps.chat_channels.routing import websocket_urlpatterns
+
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.channel.id}/')
+        communicator.scope['user'] = self.user
+        return communicator
+
+    async def _frames_until(self, communicator, frame_type):
+        frames = []
+        while not frames or frames[-1]['type'] != frame_type:
+            frames.append(await communicator.receive_json_from(timeout=5))
+        return frames
+
+    def test_retried_send_is_acked_without_second_fan_out(self):
+        async def scenario():
+            sender, member = self._communicator(), self._communicator()
+            await sender.connect()
+            await member.connect()
+            await self._frames_until(member, 'presence')
+
+            frame = {'type': 'chat_message', 'message': 'Hello', 'client_key': 'k-1'}
+            await sender.send_json_to(frame)
+            first = await self._frames_until(sender, 'chat_message')
+            await self._frames_until(member, 'chat_message')
+
+            await sender.send_json_to(frame)
+            second = await self._frames_until(sender, 'chat_message')
+            self.assertTrue(await member.receive_nothing(timeout=0.2))
+
+            await sender.disconnect()
+            await member.disconnect()
+            return first, second
+
+        first, second = async_to_sync(scenario)()
+        ack = next(frame for frame in first if frame['type'] == 'ack')
+        duplicate_ack = next(frame for frame in second if frame['type'] == 'ack')
+        self.assertFalse(ack['duplicate'])
+        self.assertTrue(duplicate_ack['duplicate'])
+        self.assertEqual(ack['message_id'], duplicate_ack['message_id'])
+        self.assertEqual(second[-1]['message_id'], ack['message_id'])
+        self.assertEqual(Message.objects.filter(channel=self.channel).count(), 1)
+
+    def test_client_keys_are_scoped_to_the_channel(self):
+        other = Channel.objects.create(
+            name='elsewhere',
+            organization=self.org,
+            channel_type=Channel.ChannelType.PRIVATE,
+            created_by=self.user
+        )
+        other.members.add(self.user)
+        elsewhere = Message.objects.create(channel=other, sender=self.user, content='Secret', client_key='k-1')
+        deleted = Message.objects.create(channel=self.channel, sender=self.user, content='Gone', client_key='k-2')
+        Message.all_objects.filter(pk=deleted.pk).update(is_deleted=True)
+
+        async def scenario():
+            communicator = self._communicator()
+            await communicator.connect()
+            await communicator.send_json_to({'type': 'chat_message', 'message': 'Hello', 'client_key': 'k-1'})
+            fresh = await self._frames_until(communicator, 'chat_message')
+            await communicator.send_json_to({'type': 'chat_message', 'message': 'Gone', 'client_key': 'k-2'})
+            retried = await self._frames_until(communicator, 'ack')
+            self.assertTrue(await communicator.receive_nothing(timeout=0.2))
+            await communicator.disconnect()
+            return fresh, retried
+
+        fresh, retried = async_to_sync(scenario)()
+        ack = next(frame for frame in fresh if frame['type'] == 'ack')
+        self.assertFalse(ack['duplicate'])
+        self.assertNotEqual(ack['message_id'], str(elsewhere.id))
+        self.assertEqual(fresh[-1]['message'], 'Hello')
+        self.assertTrue(retried[-1]['duplicate'])
+        self.assertEqual(retried[-1]['message_id'], str(deleted.id))
+
+
+class ChannelEventLogTests(TransactionTestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Resume Org', code='resume-org')
+        self.user = User.objects.create_user(
+            username='resumer',
+            email='resume@example.com',
+            password='password123',
+            organization=self.org
+        )
+        self.channel = Channel.objects.create(
+            name='resume',
+            organization=self.org,
+            channel_type=Channel.ChannelType.PRIVATE,
+            created_by=self.user
+        )
+        self.channel.members.add(self.user)
+
+    def test_since_and_retention(self):
+        from apps.chat_channels.models import ChannelEvent
+        ids = [
+            ChannelEvent.record(self.channel.id, {'type': 'message_update', 'message_id': str(i), 'message': 'x'})['event_id']
+            for i in range(3)
+        ]
+        self.assertEqual(
+            [event['message_id'] for event in ChannelEvent.since(self.channel.id, ids[0])],
+            ['1', '2']
+        )
+        self.assertEqual(len(ChannelEvent.since(self.channel.id, 0)), 3)
+        self.assertIsNone(ChannelEvent.since(self.channel.id, ids[0], limit=1))
+
+        self.assertEqual(ChannelEvent.prune(max_per_channel=1), 2)
+        self.assertIsNone(ChannelEvent.since(self.channel.id, ids[0]))
+        self.assertEqual(ChannelEvent.since(self.channel.id, ids[2]), [])
+
+    def test_timestamp_resume_past_a_trimmed_log_resets(self):
+        from django.test import override_settings
+        from apps.chat_channels.models import ChannelEvent
+        before = timezone.now() - timedelta(seconds=1)
+        for i in range(3):
+            ChannelEvent.record(self.channel.id, {'type': 'message_update', 'message_id': str(i), 'message': 'x'})
+        self.assertEqual(len(ChannelEvent.since(self.channel.id, timestamp=before)), 3)
+
+        with override_settings(CHAT_EVENT_LOG_MAX_PER_CHANNEL=2):
+            ChannelEvent.prune()
+            self.assertIsNone(ChannelEvent.since(self.channel.id, timestamp=before))
+            oldest = ChannelEvent.objects.order_by('id').first()
+            self.assertEqual(
+                [event['message_id'] for event in ChannelEvent.since(self.channel.id, timestamp=oldest.created_at)],
+                ['2']
+            )
+
+    def test_scheduled_prune_runs_once_per_interval(self):
+        from django.core.cache import cache
+        from apps.chat_channels.jobs import prune_channel_events_if_due
+        from apps.chat_channels.models import ChannelEvent
+
+        cache.clear()
+        for _ in range(2):
+            ChannelEvent.record(self.channel.id, {'type': 'message_update', 'message_id': '1', 'message': 'x'})
+        ChannelEvent.objects.update(created_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(prune_channel_events_if_due(), 2)
+        ChannelEvent.record(self.channel.id, {'type': 'message_update', 'message_id': '1', 'message': 'x'})
+        ChannelEvent.objects.update(created_at=timezone.now() - timedelta(days=30))
+        # Another process already pruned this interval
+        self.assertEqual(prune_channel_events_if_due(), 0)
+
+    def test_reconnect_resumes_from_last_event(self):
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+        from apps.chat_channels.routing import websocket_urlpatterns
+
+        def communicator():
+            ws = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.channel.id}/')
+            ws.scope['user'] = self.user
+            return ws
+
+        async def next_frame(ws, frame_type):
+            while True:
+                frame = await ws.receive_json_from(timeout=5)
+                if frame['type'] == frame_type:
+                    return frame
+
+        async def scenario():
+            first = communicator()
+            await first.connect()
+            await first.send_json_to({'type': 'chat_message', 'message': 'Before the drop'})
+            sent = await next_frame(first, 'chat_message')
+            await first.disconnect()
+
+            # Changes made while the first socket was away
+            other = communicator()
+            await other.connect()
+            await other.send_json_to({'type': 'message_edit', 'message_id': sent['message_id'], 'message': 'Edited'})
+            await next_frame(other, 'message_update')
+            await other.send_json_to({'type': 'message_reaction', 'message_id': sent['message_id'], 'emoji': '👍'})
+            await next_frame(other, 'reaction_update')
+            await other.disconnect()
+
+            resumed = communicator()
+            await resumed.connect()
+            await resumed.send_json_to({'type': 'resume', 'last_event_id': sent['event_id']})
+            frames = []
+            while not frames or frames[-1]['type'] != 'resume_complete':
+                frame = await resumed.receive_json_from(timeout=5)
+                if frame['type'] != 'presence':
+                    frames.append(frame)
+
+            await resumed.send_json_to({'type': 'resume', 'last_event_id': 999999})
+            reset = await next_frame(resumed, 'resume_reset')
+
+            # Naive timestamps are read in the current time zone; invalid ones reset
+            naive = timezone.localtime().replace(tzinfo=None) - timedelta(minutes=1)
+            await resumed.send_json_to({'type': 'resume', 'since': naive.isoformat()})
+            replayed = await next_frame(resumed, 'resume_complete')
+            await resumed.send_json_to({'type': 'resume', 'since': '2026-13-45T00:00:00'})
+            await next_frame(resumed, 'resume_reset')
+            await resumed.disconnect()
+            return frames, reset, replayed
+
+        frames, reset, replayed = async_to_sync(scenario)()
+        self.assertEqual([frame['type'] for frame in frames], ['message_update', 'reaction_update', 'resume_complete'])
+        self.assertEqual(frames[0]['message'], 'Edited')
+        self.assertEqual((frames[1]['emoji'], frames[1]['delta'], frames[1]['count']), ('👍', 1, 1))
+        self.assertEqual(frames[2]['event_id'], frames[1]['event_id'])
+        self.assertEqual(replayed['event_id'], frames[1]['event_id'])
+
+
+class ReactionCountTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='React Org', code='react-org')
+        self.users = [
+            User.objects.create_user(
+                username=f'reactor{i}',
+                email=f'reactor{i}@example.com',
+                password='password123',
+                organization=self.org
+            )
+            for i in range(2)
+        ]
+        self.channel = Channel.objects.create(
+            name='reactions',
+            organization=self.org,
+            channel_type=Channel.ChannelType.PRIVATE,
+            created_by=self.users[0]
+        )
+        self.message = Message.objects.create(channel=self.channel, sender=self.users[0], content='React to me')
+
+    def test_toggles_maintain_counters(self):
+        from apps.chat_channels.models import MessageReaction
+        self.assertEqual(MessageReaction.toggle(self.message, self.users[0], '👍'), (1, 1))
+        self.assertEqual(MessageReaction.toggle(self.message, self.users[1], '👍'), (1, 2))
+        self.assertEqual(MessageReaction.toggle(self.message, self.users[1], '🎉'), (1, 1))
+        self.assertEqual(self.message.reaction_summary, {'👍': 2, '🎉': 1})
+
+        self.assertEqual(MessageReaction.toggle(self.message, self.users[0], '👍'), (-1, 1))
+        self.assertEqual(MessageReaction.toggle(self.message, self.users[1], '🎉'), (-1, 0))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.message.reaction_summary, {'👍': 1})
+
+    def test_repair_command_rebuilds_from_reactions(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from apps.chat_channels.models import MessageReaction, MessageReactionCount
+
+        MessageReaction.toggle(self.message, self.users[0], '👍')
+        MessageReaction.toggle(self.message, self.users[1], '👍')
+        MessageReactionCount.objects.update(count=7)
+        MessageReactionCount.objects.create(message=self.message, emoji='💥', count=3)
+
+        out = StringIO()
+        call_command('rebuild_reaction_counts', stdout=out)
+        self.assertIn('Rebuilt 1 reaction counter(s)', out.getvalue())
+        self.assertEqual(self.message.reaction_summary, {'👍': 2})
+
+
+class MessageSerializerQueryTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Plan Org', code='plan-org')
+        self.user = User.objects.create_user(
+            username='planner',
+            email='plan@example.com',
+            password='password123',
+            organization=self.org
+        )
+        self.other = User.objects.create_user(
+            username='planner2',
+            email='plan2@example.com',
+            password='password123',
+            organization=self.org
+        )
+        self.channel = Channel.objects.create(
+            name='plan',
+            organization=self.org,
+            channel_type=Channel.ChannelType.PRIVATE,
+            created_by=self.user
+        )
+        self.channel.members.add(self.user, self.other)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.parent = Message.objects.create(channel=self.channel, sender=self.other, content='Parent')
+
+    def add_messages(self, count):
+        from apps.chat_channels.models import Attachment, MessageReaction
+        for i in range(count):
+            sender = self.user if i % 2 else self.other
+            message = Message.objects.create(channel=self.channel, sender=sender, content=f'Message {i}')
+            reply = Message.objects.create(
+                channel=self.channel, sender=sender, content=f'Reply {i}', parent_message=self.parent
+            )
+            Attachment.objects.create(message=reply, file='messages/attachments/sample')
+            MessageReaction.toggle(reply, self.other, '👍')
+            message.starred_by.add(self.user)
+            reply.starred_by.add(self.other)
+
+    def count_queries(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.add_messages(2)
+        small, _ = self.count_queries('/api/v1/messages/')
+        small_channel, _ = self.count_queries(f'/api/v1/channels/{self.channel.id}/messages/')
+
+        self.add_messages(10)
+        large, page = self.count_queries('/api/v1/messages/')
+        data = page['results']
+        large_channel, _ = self.count_queries(f'/api/v1/channels/{self.channel.id}/messages/')
+
+        self.assertEqual(len(data), 25)
+        self.assertEqual(large, small)
+        self.assertEqual(large_channel, small_channel)
+
+        by_content = {message['content']: message for message in data}
+        self.assertEqual((by_content['Message 3']['star_count'], by_content['Message 3']['is_starred']), (1, True))
+        self.assertEqual((by_content['Reply 3']['star_count'], by_content['Reply 3']['is_starred']), (1, False))
+        self.assertEqual(by_content['Reply 3']['parent_details']['sender_name'], 'planner2')
+        self.assertEqual(by_content['Reply 3']['reactions'][0]['username'], 'planner2')
+        self.assertEqual(len(by_content['Reply 3']['attachments']), 1)
+
+
+class ApiPaginationTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Paging Org', code='paging-org')
+        self.user = User.objects.create_user(
+            username='pager',
+            email='pager@example.com',
+            password='password123',
+            organization=self.org
+        )
+        self.channel = Channel.objects.create(
+            name='paging',
+            organization=self.org,
+            channel_type=Channel.ChannelType.PRIVATE,
+            created_by=self.user
+        )
+        self.channel.members.add(self.user)
+        for i in range(5):
+            Message.objects.create(channel=self.channel, sender=self.user, content=f'Page {i}')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_lists_are_cursor_paginated(self):
+        response = self.client.get('/api/v1/messages/', {'page_size': 2})
+        self.assertEqual([m['content'] for m in response.data['results']], ['Page 4', 'Page 3'])
+        seen = [m['content'] for m in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen.extend(m['content'] for m in response.data['results'])
+        self.assertEqual(seen, [f'Page {i}' for i in range(4, -1, -1)])
+
+        from apps.chat_channels.api_views import MessageViewSet
+        self.assertEqual(MessageViewSet.max_page_size, 100)
+        response = self.client.get('/api/v1/messages/', {'page_size': 1000})
+        self.assertEqual(response.data['next'], None)
+
+        url = f'/api/v1/channels/{self.channel.id}/messages/'
+        response = self.client.get(url, {'page_size': 3})
+        self.assertEqual([m['content'] for m in response.data['results']], ['Page 4', 'Page 3', 'Page 2'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([m['content'] for m in response.data['results']], ['Page 1', 'Page 0'])
+
+    def test_sparse_fieldsets_trim_fields_and_columns(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        response = self.client.get('/api/v1/channels/', {'fields': 'id,name'})
+        self.assertEqual(response.json()['results'], [{'id': str(self.channel.id), 'name': 'paging'}])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/notifications/', {'fields': 'id,title'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        listing = next(q['sql'] for q in queries.captured_queries if 'FROM "notifications"' in q['sql'])
+        self.assertNotIn('"content"', listing)
+
+
+class ConditionalRequestTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.org = Organization.objects.create(name='Etag Org', code='etag-org')
+        self.user = User.objects.create_user(
+            username='poller',
+            email='poller@example.com',
+            password='password123',
+            organization=self.org
+        )
+        self.other = User.objects.create_user(
+            username='poster',
+            email='poster@example.com',
+            password='password123',
+            organization=self.org
+        )
+        self.channel = Channel.objects.create(
+            name='polled',
+            organization=self.org,
+            channel_type=Channel.ChannelType.PRIVATE,
+            created_by=self.user
+        )
+        self.channel.members.add(self.user, self.other)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def assertNotModified(self, url, response):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        # Served from the cached version key: no aggregate, no serialization
+        self.assertEqual(len(queries), 0)
+
+    def test_channel_list_revalidates_until_something_changes(self):
+        url = '/api/v1/channels/'
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', first)
+        self.assertNotModified(url, first)
+
+        Message.objects.create(channel=self.channel, sender=self.other, content='New')
+        second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data['results'][0]['unread_count'], 1)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+
+        self.channel.members.remove(self.other)
+        third = self.client.get(url, HTTP_IF_NONE_MATCH=second['ETag'])
+        self.assertEqual(third.data['results'][0]['member_count'], 1)
+
+        other_page = self.client.get(url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=third['ETag'])
+        self.assertEqual(other_page.status_code, status.HTTP_200_OK)
+
+    def test_notifications_follow_bulk_writes(self):
+        from apps.accounts.notifications import create_notifications
+
+        url = '/api/v1/notifications/'
+        create_notifications([self.user], 'Hello', 'First')
+        first = self.client.get(url)
+        self.assertNotModified(url, first)
+
+        self.client.post('/api/v1/notifications/mark_all_as_read/')
+        second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertTrue(second.data['results'][0]['is_read'])
+
+        detail = f"/api/v1/notifications/{second.data['results'][0]['id']}/"
+        response = self.client.get(detail)
+        self.assertNotModified(detail, response)
+        modified = self.client.get(detail, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_malformed_ids_are_not_found(self):
+        for url in ('/api/v1/channels/not-a-uuid/', '/api/v1/notifications/abc/',
+                    '/api/v1/projects/abc/', '/api/v1/announcements/abc/'):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND, url)
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Budget Org', code='budget-org')
+        self.user = User.objects.create_user(
+            username='budgeter',
+            email='budgeter@example.com',
+            password='password123',
+            email_verified=True,
+            organization=self.org
+        )
+        self.channel = Channel.objects.create(
+            name='budget',
+            organization=self.org,
+            channel_type=Channel.ChannelType.PRIVATE,
+            created_by=self.user
+        )
+        self.channel.members.add(self.user)
+        for i in range(12):
+            Message.objects.create(channel=self.channel, sender=self.user, content=f'Budget {i}')
+        self.client.force_login(self.user)
+
+    def test_sql_shapes_ignore_batch_sizes(self):
+        from connectflow.query_budget import sql_shape
+        self.assertEqual(
+            sql_shape('SELECT * FROM t WHERE id IN (%s, %s)'),
+            sql_shape('SELECT *  FROM t\nWHERE id IN (%s,%s,%s)')
+        )
+
+    def test_repeated_queries_break_the_budget(self):
+        with self.assertRaisesMessage(AssertionError, '12x SELECT'):
+            with self.assertQueryBudget(100):
+                for message in Message.objects.filter(channel=self.channel):
+                    Message.objects.get(pk=message.pk)
+
+    def test_channel_detail_budget_and_server_timing(self):
+        from django.test import override_settings
+        with override_settings(QUERY_BUDGET_ENABLED=True):
+            # Independent of the number of messages in the window
+            with self.assertQueryBudget(30) as profile:
+                response = self.client.get(f'/channels/{self.channel.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'desc="{profile.count} queries"', response['Server-Timing'])
+
+
+class MetricsTests(TransactionTestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Metrics Org', code='metrics-org')
+        self.user = User.objects.create_user(
+            username='scraped',
+            email='scraped@example.com',
+            password='password123',
+            email_verified=True,
+            organization=self.org
+        )
+        self.channel = Channel.objects.create(
+            name='metered',
+            organization=self.org,
+            channel_type=Channel.ChannelType.PRIVATE,
+            created_by=self.user
+        )
+        self.channel.members.add(self.user)
+
+    def scrape(self):
+        from django.test import override_settings
+        with override_settings(METRICS_TOKEN='scrape-token'):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def sample(self, text, series):
+        for line in text.splitlines():
+            if line.startswith(series + ' '):
+                return float(line.rsplit(' ', 1)[1])
+        return 0.0
+
+    def test_http_cache_and_group_send_series(self):
+        from channels.layers import get_channel_layer
+        from django.core.cache import cache
+        from django.test import override_settings
+        from connectflow.metrics import group_prefix
+
+        requests = 'connectflow_http_requests_total{view="chat_channels:channel_detail",method="GET",status="200"}'
+        initial = self.sample(self.scrape(), requests)
+        self.client.force_login(self.user)
+        self.client.get(f'/channels/{self.channel.pk}/')
+        before = self.scrape()
+        self.assertEqual(self.sample(before, requests), initial + 1)
+        self.assertIn('connectflow_http_request_duration_seconds_bucket{view="chat_channels:channel_detail"', before)
+        self.assertIn('connectflow_db_executor_queue_depth 0', before)
+
+        cache.set('metrics_test:key', 1)
+        cache.get('metrics_test:key')
+        cache.get('metrics_test:absent')
+        group = f'chat_{self.channel.pk}'
+        self.assertEqual(group_prefix(group), 'chat')
+        with override_settings(METRICS_GROUP_SEND_SAMPLE=1):
+            async_to_sync(get_channel_layer().group_send)(group, {'type': 'noop', 'payload': 'x' * 100})
+
+        after = self.scrape()
+        for result in ('hit', 'miss'):
+            series = f'connectflow_cache_requests_total{{prefix="metrics_test",result="{result}"}}'
+            self.assertEqual(self.sample(after, series) - self.sample(before, series), 1)
+        sends = 'connectflow_group_send_total{prefix="chat"}'
+        self.assertEqual(self.sample(after, sends) - self.sample(before, sends), 1)
+        self.assertGreater(self.sample(after, 'connectflow_group_send_bytes_total{prefix="chat"}'), 100)
+
+    def test_group_send_bytes_are_sampled(self):
+        from unittest import mock
+        from channels.layers import get_channel_layer
+        from django.test import override_settings
+        from connectflow import metrics
+
+        metrics.install()
+        group = 'metricsample_1'
+        with override_settings(METRICS_GROUP_SEND_SAMPLE=3), \
+                mock.patch.object(metrics.msgpack, 'packb', wraps=metrics.msgpack.packb) as packb:
+            for _ in range(7):
+                async_to_sync(get_channel_layer().group_send)(group, {'type': 'noop'})
+        # Sends 1, 4 and 7
+        self.assertEqual(packb.call_count, 3)
+        self.assertEqual(metrics.GROUP_SENDS.values[('metricsample',)], 7)
+
+    def test_open_websockets_per_consumer(self):
+        from asgiref.sync import sync_to_async
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+        from apps.chat_channels.routing import websocket_urlpatterns
+
+        series = 'connectflow_websocket_connections{consumer="ChatConsumer"}'
+        scrape = sync_to_async(lambda: self.sample(self.scrape(), series))
+
+        async def scenario():
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.channel.id}/')
+            communicator.scope['user'] = self.user
+            baseline = await scrape()
+            connected, _ = await communicator.connect(timeout=5)
+            self.assertTrue(connected)
+            opened = await scrape()
+            await communicator.disconnect()
+            return baseline, opened, await scrape()
+
+        baseline, opened, closed = async_to_sync(scenario)()
+        self.assertEqual(opened, baseline + 1)
+        self.assertEqual(closed, baseline)
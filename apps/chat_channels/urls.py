@@ -15,6 +15,8 @@ urlpatterns = [
     path('json/forward-message/', forward_message, name='forward_message'),
     
     path('<uuid:pk>/', views.channel_detail, name='channel_detail'),
+    path('<uuid:pk>/messages/older/', views.channel_messages_older, name='channel_messages_older'),
+    path('<uuid:pk>/messages/newer/', views.channel_messages_newer, name='channel_messages_newer'),
     path('<uuid:pk>/edit/', views.channel_edit, name='channel_edit'),
     path('<uuid:pk>/delete/', views.channel_delete, name='channel_delete'),
     
@@ -1,11 +1,13 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Count, Q
+from django.db.models import Count, F
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
-from .models import Channel, Message, MessageReaction, Attachment
+from .models import Channel, ChannelEvent, ChannelReadCursor, Message, MessageReaction, Attachment
 from .forms import ChannelForm, MessageForm, BreakoutRoomForm
+from .pagination import clamp_page_size, latest_window, older_window, newer_window
+from . import search
 
 
 @login_required
@@ -21,7 +23,9 @@ def channel_list(request):
     channels = Channel.objects.filter(
         organization=user.organization,
         is_archived=False
-    ).select_related('department', 'team', 'created_by').prefetch_related('members')
+    ).select_related('department', 'team', 'created_by', 'stats').prefetch_related('members').order_by(
+        F('stats__last_message_at').desc(nulls_last=True)
+    )
     
     # Filter by type
     official_channels = channels.filter(channel_type=Channel.ChannelType.OFFICIAL)
@@ -223,108 +227,25 @@ def channel_detail(request, pk):
         messages.error(request, 'You do not have permission to view this channel.')
         return redirect('chat_channels:channel_list')
     
-    # Get messages (WhatsApp style: all messages in one stream)
-    messages_query = Message.objects.filter(
+    # Read before the messages so a reconnect resumes from here without gaps
+    last_event_id = ChannelEvent.latest_id(channel.pk)
+
+    # Get messages (WhatsApp style: one stream, windowed on (created_at, id))
+    messages_query = Message.annotate_reply_counts(Message.objects.filter(
         channel=channel
-    ).select_related('sender', 'parent_message').prefetch_related(
-        'reactions',
+    )).select_related('sender', 'parent_message').prefetch_related(
+        'reaction_counts',
+        'reactions__user',
         'attachments'
     )
     
     # Handle search
     search_query = request.GET.get('q')
-    search_filters = {}
-    
-    if search_query:
-        # Parse advanced search filters
-        import re
-        
-        # Extract special filters
-        from_user = re.search(r'from:(\S+)', search_query)
-        has_filter = re.search(r'has:(file|link|attachment|image|video)', search_query)
-        
-        # Remove filters from query to get clean search text
-        clean_query = search_query
-        if from_user:
-            search_filters['from_user'] = from_user.group(1)
-            clean_query = clean_query.replace(from_user.group(0), '').strip()
-        if has_filter:
-            search_filters['has'] = has_filter.group(1)
-            clean_query = clean_query.replace(has_filter.group(0), '').strip()
-        
-        # Apply filters
-        if clean_query:
-            # Try PostgreSQL full-text search first
-            try:
-                from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
-                
-                # Create search vector for message content and sender name
-                search_vector = SearchVector('content', weight='A') + \
-                               SearchVector('sender__first_name', weight='B') + \
-                               SearchVector('sender__last_name', weight='B') + \
-                               SearchVector('sender__username', weight='C')
-                
-                search_query_obj = SearchQuery(clean_query)
-                
-                messages_query = messages_query.annotate(
-                    search=search_vector,
-                    rank=SearchRank(search_vector, search_query_obj)
-                ).filter(search=search_query_obj).order_by('-rank', '-created_at')
-                
-            except Exception as e:
-                # Fallback to basic search (SQLite or if PostgreSQL search fails)
-                messages_query = messages_query.filter(
-                    Q(content__icontains=clean_query) |
-                    Q(sender__first_name__icontains=clean_query) |
-                    Q(sender__last_name__icontains=clean_query) |
-                    Q(sender__username__icontains=clean_query)
-                )
-        
-        # Apply from:user filter
-        if 'from_user' in search_filters:
-            from_username = search_filters['from_user']
-            messages_query = messages_query.filter(
-                Q(sender__username__iexact=from_username) |
-                Q(sender__first_name__icontains=from_username) |
-                Q(sender__last_name__icontains=from_username)
-            )
-        
-        # Apply has:type filter
-        if 'has' in search_filters:
-            has_type = search_filters['has']
-            if has_type in ['file', 'attachment']:
-                messages_query = messages_query.filter(attachments__isnull=False).distinct()
-            elif has_type == 'link':
-                # Messages containing URLs
-                messages_query = messages_query.filter(
-                    Q(content__icontains='http://') |
-                    Q(content__icontains='https://')
-                )
-            elif has_type == 'image':
-                messages_query = messages_query.filter(
-                    message_type='IMAGE'
-                ).distinct()
-            elif has_type == 'video':
-                messages_query = messages_query.filter(
-                    message_type='VIDEO'
-                ).distinct()
-    
-    channel_messages = messages_query.order_by('created_at')
-    
-    # Add date separators info to messages
-    messages_with_dates = []
-    prev_date = None
-    for msg in channel_messages:
-        msg_date = msg.created_at.date()
-        if prev_date is None or msg_date != prev_date:
-            msg.show_date_separator = True
-            msg.date_label = msg.created_at
-        else:
-            msg.show_date_separator = False
-        prev_date = msg_date
-        messages_with_dates.append(msg)
+    messages_query = filter_message_search(messages_query, search_query)
     
-    channel_messages = messages_with_dates
+    # Only the latest window is rendered; older history is fetched on demand
+    window = latest_window(messages_query, clamp_page_size(request.GET.get('limit')))
+    channel_messages = window.messages
     
     # Get active breakout rooms for this channel
     breakout_rooms = Channel.objects.filter(
@@ -334,11 +255,14 @@ def channel_detail(request, pk):
     )
     
     # Get sidebar conversation list
+    # Ordered by denormalized last activity (ChannelStats), so no per-channel aggregate is needed
+    last_activity = F('stats__last_message_at').desc(nulls_last=True)
     user_channels_query = Channel.objects.filter(
         organization=user.organization,
         is_archived=False,
         members=user
-    ).exclude(channel_type=Channel.ChannelType.DIRECT).distinct()
+    ).exclude(channel_type=Channel.ChannelType.DIRECT).select_related('stats').order_by(last_activity).distinct()
+    user_channels_query = ChannelReadCursor.annotate_unread_counts(user_channels_query, user)
 
     # If the current channel is not a DM and not in user_channels (e.g. admin viewing it), add it to the list
     if channel.channel_type != Channel.ChannelType.DIRECT and channel not in user_channels_query:
@@ -352,7 +276,8 @@ def channel_detail(request, pk):
         organization=user.organization,
         channel_type=Channel.ChannelType.DIRECT,
         members=user
-    ).distinct()
+    ).select_related('stats').order_by(last_activity).distinct()
+    direct_messages = ChannelReadCursor.annotate_unread_counts(direct_messages, user)
     
     # Handle message posting
     if request.method == 'POST':
@@ -378,8 +303,6 @@ def channel_detail(request, pk):
             message.channel = channel
             message.sender = request.user
             
-            content = message.content.strip()
-            
             # Identify message type
             if request.FILES.get('voice_message'):
                 message.message_type = 'VOICE'
@@ -392,31 +315,8 @@ def channel_detail(request, pk):
                 else:
                     message.message_type = 'FILE'
             else:
-                # Check for Emoji-only
-                import re
-                emoji_pattern = re.compile(
-                    "["
-                    "\U0001F600-\U0001F64F"  # emoticons
-                    "\U0001F300-\U0001F5FF"  # symbols & pictographs
-                    "\U0001F680-\U0001F6FF"  # transport & map symbols
-                    "\U0001F1E0-\U0001F1FF"  # flags (iOS)
-                    "\U00002702-\U000027B0"  # dingbats
-                    "\U000024C2-\U0001F251"
-                    "\U0001F900-\U0001F9FF"  # supplemental symbols
-                    "\U0001FA00-\U0001FA6F"  # extended symbols
-                    "\U00002600-\U000026FF"  # miscellaneous symbols
-                    "\U00002700-\U000027BF"  # dingbats
-                    "\U0001F191-\U0001F19A"  # enclosed characters
-                    "]+", 
-                    flags=re.UNICODE
-                )
-                text_without_emoji = emoji_pattern.sub('', content).strip()
-                has_emojis = bool(emoji_pattern.search(content))
-                
-                if has_emojis and not text_without_emoji:
-                    message.message_type = 'EMOJI'
-                else:
-                    message.message_type = 'TEXT'
+                # Emoji-only content is detected by Message.save
+                message.message_type = 'TEXT'
             
             message.save()
             
@@ -509,11 +409,96 @@ def channel_detail(request, pk):
         'can_edit': user.is_admin or channel.created_by == user,
         'is_member': user in channel.members.all(),
         'can_post': channel.can_user_post(user) if hasattr(channel, 'can_user_post') else user in channel.members.all(),
-        'pinned_messages': pinned_messages
+        'pinned_messages': pinned_messages,
+        'has_older_messages': window.has_older,
+        'older_cursor': window.older_cursor,
+        'last_event_id': last_event_id,
     }
     return render(request, 'chat_channels/channel_detail.html', context)
 
 
+def filter_message_search(messages_query, search_query):
+    """
+    Apply the channel search box syntax to a message queryset.
+    Supports free text plus ``from:<user>`` and ``has:<file|link|attachment|image|video>``;
+    the text part is answered from the message search index (see ``search.py``).
+    """
+    return search.filter_messages(messages_query, search_query)
+
+
+def _message_window_response(request, pk, direction):
+    """Shared implementation of the load older / load newer endpoints."""
+    user = request.user
+    channel = get_object_or_404(Channel, pk=pk, organization=user.organization)
+    
+    if not channel.can_user_view(user):
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    messages_query = Message.annotate_reply_counts(Message.objects.filter(
+        channel=channel
+    )).select_related('sender', 'parent_message').prefetch_related(
+        'reaction_counts',
+        'reactions__user',
+        'attachments'
+    )
+    messages_query = filter_message_search(messages_query, request.GET.get('q'))
+    
+    cursor = request.GET.get('cursor')
+    page_size = clamp_page_size(request.GET.get('limit'))
+    if direction == 'older':
+        window = older_window(messages_query, cursor, page_size)
+        has_more, next_cursor = window.has_older, window.older_cursor
+    else:
+        window = newer_window(messages_query, cursor, page_size)
+        has_more, next_cursor = window.has_newer, window.newer_cursor
+    
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'messages': [{
+                'id': str(msg.id),
+                'cursor': msg.cursor,
+                'content': msg.content,
+                'formatted_content': msg.formatted_content if msg.has_formatting else None,
+                'message_type': msg.message_type,
+                'status': msg.status,
+                'sender_id': msg.sender_id,
+                'sender_name': msg.sender.get_full_name(),
+                'sender_avatar': msg.sender.avatar.url if msg.sender.avatar else None,
+                'parent_message_id': str(msg.parent_message_id) if msg.parent_message_id else None,
+                'voice_message_url': msg.voice_message.url if msg.voice_message else None,
+                'voice_duration': msg.voice_duration,
+                'is_pinned': msg.is_pinned,
+                'is_edited': msg.is_edited,
+                'is_deleted': msg.is_deleted,
+                'created_at': msg.created_at.isoformat(),
+                'timestamp': msg.created_at.strftime('%b %d, %I:%M %p'),
+                'show_date_separator': msg.show_date_separator,
+            } for msg in window.messages],
+            'has_more': has_more,
+            'next_cursor': next_cursor,
+        })
+    
+    response = render(request, 'chat_channels/partials/message_list.html', {
+        'channel': channel,
+        'chat_messages': window.messages,
+    })
+    response['X-Has-More'] = 'true' if has_more else 'false'
+    response['X-Next-Cursor'] = next_cursor or ''
+    return response
+
+
+@login_required
+def channel_messages_older(request, pk):
+    """Return the window of messages preceding ``?cursor=`` as an HTML (or JSON) fragment."""
+    return _message_window_response(request, pk, 'older')
+
+
+@login_required
+def channel_messages_newer(request, pk):
+    """Return the window of messages following ``?cursor=`` as an HTML (or JSON) fragment."""
+    return _message_window_response(request, pk, 'newer')
+
+
 @login_required
 def channel_edit(request, pk):
     """Edit a channel."""
@@ -624,15 +609,13 @@ def message_delete(request, pk):
         from asgiref.sync import async_to_sync
         
         channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f'chat_{channel_id}',
-            {
-                'type': 'message_deleted',
-                'message_id': str(pk),
-                'deleted_at': message.deleted_at.isoformat() if message.deleted_at else None,
-                'deleted_by': user.id
-            }
-        )
+        event = ChannelEvent.record(message.channel_id, {
+            'type': 'message_deleted',
+            'message_id': str(pk),
+            'deleted_at': message.deleted_at.isoformat() if message.deleted_at else None,
+            'deleted_by': user.id
+        })
+        async_to_sync(channel_layer.group_send)(f'chat_{channel_id}', event)
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
@@ -652,19 +635,9 @@ def message_react(request, pk):
     message = get_object_or_404(Message, pk=pk)
     emoji = request.POST.get('emoji', '👍')
     
-    # Check if reaction already exists
-    reaction, created = MessageReaction.objects.get_or_create(
-        message=message,
-        user=user,
-        emoji=emoji
-    )
-    
-    if not created:
-        # Remove reaction if it already exists
-        reaction.delete()
-        action = 'removed'
-    else:
-        action = 'added'
+    # Adds the reaction, or removes it if it already exists
+    delta, count = MessageReaction.toggle(message, user, emoji)
+    action = 'added' if delta > 0 else 'removed'
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         # Return JSON for AJAX requests
@@ -0,0 +1,108 @@
+"""
+Channel visibility resolver.
+
+Computes the full set of channel ids a user may view with one query per
+access rule, instead of running ``Channel.can_user_view`` channel by channel.
+The result is cached per user and invalidated when memberships change (see
+the m2m receivers in ``models.py``).
+
+Rules, in order of precedence:
+
+* shared project channels - project members only;
+* organization admins - every other channel of their organization;
+* official channels - everyone in the organization;
+* department channels - members of any team in the department;
+* team channels - team members;
+* everything else - explicit channel members.
+"""
+
+from django.core.cache import cache
+from django.db.models import Q
+
+CACHE_TIMEOUT = 300
+GENERATION_KEY = 'channel_visibility:generation'
+
+
+def _generation(key):
+    return cache.get_or_set(key, 1, timeout=None)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, timeout=None)
+
+
+def _user_generation_key(user_id):
+    return f'channel_visibility:user:{user_id}'
+
+
+def _cache_key(user):
+    # Role and organization are part of the key, so promotions and org moves
+    # need no explicit invalidation.
+    return 'channel_visibility:{}:{}:{}:{}:{}'.format(
+        _generation(GENERATION_KEY),
+        user.pk,
+        _generation(_user_generation_key(user.pk)),
+        user.organization_id,
+        int(user.is_admin),
+    )
+
+
+def compute_visible_channel_ids(user):
+    """Resolve visible channel ids straight from the database (no cache)."""
+    from .models import Channel
+
+    Type = Channel.ChannelType
+    ids = set(
+        Channel.objects.filter(shared_project__members=user).values_list('pk', flat=True)
+    )
+
+    own_channels = Channel.objects.filter(shared_project__isnull=True)
+    if user.organization_id:
+        org_channels = own_channels.filter(organization_id=user.organization_id)
+        if user.is_admin:
+            ids.update(org_channels.values_list('pk', flat=True))
+        else:
+            ids.update(org_channels.filter(channel_type=Type.OFFICIAL).values_list('pk', flat=True))
+
+    ids.update(own_channels.filter(
+        channel_type=Type.DEPARTMENT,
+        department__teams__members=user
+    ).values_list('pk', flat=True))
+
+    ids.update(own_channels.filter(
+        channel_type=Type.TEAM,
+        team__members=user
+    ).values_list('pk', flat=True))
+
+    ids.update(own_channels.filter(members=user).exclude(
+        Q(channel_type=Type.OFFICIAL) |
+        Q(channel_type=Type.DEPARTMENT, department__isnull=False) |
+        Q(channel_type=Type.TEAM, team__isnull=False)
+    ).values_list('pk', flat=True))
+    return ids
+
+
+def visible_channel_ids(user):
+    """Cached set of ids of every channel ``user`` can view."""
+    if not getattr(user, 'is_authenticated', False):
+        return frozenset()
+    key = _cache_key(user)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(compute_visible_channel_ids(user))
+        cache.set(key, ids, CACHE_TIMEOUT)
+    return ids
+
+
+def invalidate_users(user_ids):
+    """Drop cached visibility for specific users (membership changed)."""
+    for user_id in user_ids:
+        _bump(_user_generation_key(user_id))
+
+
+def invalidate_all():
+    """Drop cached visibility for everyone (channels or team structure changed)."""
+    _bump(GENERATION_KEY)
@@ -0,0 +1,19 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Admin interface for Job model."""
+    
+    list_display = ('name', 'status', 'attempts', 'max_attempts', 'run_at', 'created_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'last_error')
+    readonly_fields = ('id', 'created_at', 'updated_at', 'locked_at', 'locked_by', 'last_error')
+    
+    actions = ['retry_jobs']
+    
+    def retry_jobs(self, request, queryset):
+        queryset.update(status=Job.Status.PENDING, attempts=0, run_at=timezone.now())
+    retry_jobs.short_description = "Retry selected jobs"
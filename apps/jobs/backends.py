@@ -0,0 +1,249 @@
+"""
+Storage backends for the background job queue.
+
+``database`` (default) keeps jobs in the ``background_jobs`` table and needs
+nothing beyond the project database. ``redis`` keeps them in Redis lists and
+a sorted set of delayed retries, for deployments that already run Redis for
+the channel layer. Both hand a job back to the queue when the worker running
+it dies, once ``JOBS_LOCK_TIMEOUT`` has passed, and give up on it once its
+attempts are used up.
+
+Finished database rows are deleted by ``prune`` after
+``JOBS_RETENTION_DAYS`` (``JOBS_FAILED_RETENTION_DAYS`` for failures); Redis
+keeps no finished jobs besides a capped list of failures.
+"""
+
+import json
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+
+def retry_delay(attempts):
+    """Exponential backoff: base, 2*base, 4*base, ... capped at JOBS_RETRY_MAX_DELAY."""
+    base = getattr(settings, 'JOBS_RETRY_BACKOFF', 10)
+    cap = getattr(settings, 'JOBS_RETRY_MAX_DELAY', 3600)
+    return min(base * (2 ** max(attempts - 1, 0)), cap)
+
+
+class DatabaseBackend:
+    """Jobs stored as Job rows; enqueued atomically with the caller's transaction."""
+
+    def enqueue(self, name, args, kwargs, max_attempts):
+        return Job.objects.create(
+            name=name,
+            args=args,
+            kwargs=kwargs,
+            max_attempts=max_attempts
+        )
+
+    def claim(self, worker_id, limit):
+        now = timezone.now()
+        lock_timeout = timedelta(seconds=getattr(settings, 'JOBS_LOCK_TIMEOUT', 600))
+
+        # Jobs left RUNNING by a crashed worker become claimable again,
+        # unless that run was their last attempt
+        abandoned = Job.objects.filter(status=Job.Status.RUNNING, locked_at__lt=now - lock_timeout)
+        abandoned.filter(attempts__gte=F('max_attempts')).update(
+            status=Job.Status.FAILED,
+            locked_at=None,
+            last_error='Worker died while running the job',
+            updated_at=now
+        )
+        abandoned.update(status=Job.Status.PENDING)
+
+        with transaction.atomic():
+            due = Job.objects.filter(status=Job.Status.PENDING, run_at__lte=now).order_by('run_at')
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            ids = list(due.values_list('pk', flat=True)[:limit])
+            # The status guard keeps two workers from claiming the same row
+            # on databases without SKIP LOCKED.
+            Job.objects.filter(pk__in=ids, status=Job.Status.PENDING).update(
+                status=Job.Status.RUNNING,
+                locked_at=now,
+                locked_by=worker_id,
+                attempts=F('attempts') + 1
+            )
+        return list(Job.objects.filter(pk__in=ids, status=Job.Status.RUNNING, locked_by=worker_id))
+
+    def complete(self, job):
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.SUCCEEDED,
+            locked_at=None,
+            last_error='',
+            updated_at=timezone.now()
+        )
+
+    def fail(self, job, error):
+        if job.attempts >= job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.Status.FAILED,
+                locked_at=None,
+                last_error=error,
+                updated_at=timezone.now()
+            )
+            return False
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.PENDING,
+            locked_at=None,
+            run_at=timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+            last_error=error
+        )
+        return True
+
+    def prune(self, batch_size=1000):
+        """Delete finished jobs past their retention. Returns the number deleted."""
+        now = timezone.now()
+        expired = (
+            Job.objects.filter(
+                status=Job.Status.SUCCEEDED,
+                updated_at__lt=now - timedelta(days=getattr(settings, 'JOBS_RETENTION_DAYS', 7))
+            ) | Job.objects.filter(
+                status=Job.Status.FAILED,
+                updated_at__lt=now - timedelta(days=getattr(settings, 'JOBS_FAILED_RETENTION_DAYS', 30))
+            )
+        )
+        deleted = 0
+        while True:
+            ids = list(expired.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += Job.objects.filter(pk__in=ids).delete()[0]
+
+
+class RedisJob:
+    """In-flight job claimed from Redis."""
+
+    def __init__(self, raw, payload):
+        # ``raw`` is the entry in the processing list, removed on complete/fail
+        self.raw = raw
+        self.payload = payload
+        self.pk = payload['id']
+        self.name = payload['name']
+        self.args = payload['args']
+        self.kwargs = payload['kwargs']
+        self.attempts = payload['attempts']
+        self.max_attempts = payload['max_attempts']
+
+
+class RedisBackend:
+    """
+    Jobs stored in Redis: a ready list, a sorted set of delayed retries keyed
+    by due time, and a capped list of permanently failed jobs.
+
+    Claiming moves a job atomically onto a processing list (LMOVE) and
+    records when; ``complete`` and ``fail`` acknowledge it. Entries left
+    there by a crashed worker are re-queued by the next ``claim`` after
+    ``JOBS_LOCK_TIMEOUT``, counting as an attempt.
+    """
+
+    def __init__(self):
+        import redis
+        self.client = redis.Redis.from_url(
+            getattr(settings, 'JOBS_REDIS_URL', 'redis://localhost:6379/0')
+        )
+        prefix = getattr(settings, 'JOBS_REDIS_PREFIX', 'connectflow:jobs')
+        self.ready_key = f'{prefix}:ready'
+        self.delayed_key = f'{prefix}:delayed'
+        self.failed_key = f'{prefix}:failed'
+        self.processing_key = f'{prefix}:processing'
+        self.claimed_key = f'{prefix}:claimed'
+
+    def enqueue(self, name, args, kwargs, max_attempts):
+        payload = {
+            'id': str(uuid.uuid4()),
+            'name': name,
+            'args': args,
+            'kwargs': kwargs,
+            'attempts': 0,
+            'max_attempts': max_attempts,
+        }
+        # Don't publish work for rows the caller may still roll back
+        transaction.on_commit(lambda: self.client.rpush(self.ready_key, json.dumps(payload)))
+        return RedisJob(None, payload)
+
+    def claim(self, worker_id, limit):
+        now = time.time()
+        due = self.client.zrangebyscore(self.delayed_key, 0, now)
+        for raw in due:
+            if self.client.zrem(self.delayed_key, raw):
+                self.client.rpush(self.ready_key, raw)
+        self._requeue_abandoned(now)
+
+        jobs = []
+        for _ in range(limit):
+            raw = self.client.lmove(self.ready_key, self.processing_key, 'LEFT', 'RIGHT')
+            if raw is None:
+                break
+            self.client.hset(self.claimed_key, raw, now)
+            payload = json.loads(raw)
+            payload['attempts'] += 1
+            jobs.append(RedisJob(raw, payload))
+        return jobs
+
+    def _requeue_abandoned(self, now):
+        lock_timeout = getattr(settings, 'JOBS_LOCK_TIMEOUT', 600)
+        for raw, claimed_at in self.client.hgetall(self.claimed_key).items():
+            if float(claimed_at) > now - lock_timeout:
+                continue
+            # LREM decides the race between two workers re-queueing it
+            if self.client.lrem(self.processing_key, 1, raw):
+                payload = json.loads(raw)
+                payload['attempts'] += 1
+                if payload['attempts'] >= payload['max_attempts']:
+                    self._bury(dict(payload, last_error='Worker died while running the job'))
+                else:
+                    self.client.rpush(self.ready_key, json.dumps(payload))
+            self.client.hdel(self.claimed_key, raw)
+
+    def _ack(self, job):
+        self.client.lrem(self.processing_key, 1, job.raw)
+        self.client.hdel(self.claimed_key, job.raw)
+
+    def _bury(self, payload):
+        self.client.lpush(self.failed_key, json.dumps(payload))
+        self.client.ltrim(self.failed_key, 0, 999)
+
+    def complete(self, job):
+        self._ack(job)
+
+    def fail(self, job, error):
+        payload = dict(job.payload, last_error=error)
+        if job.attempts >= job.max_attempts:
+            self._bury(payload)
+            self._ack(job)
+            return False
+        self.client.zadd(self.delayed_key, {
+            json.dumps(payload): time.time() + retry_delay(job.attempts)
+        })
+        self._ack(job)
+        return True
+
+    def prune(self, batch_size=1000):
+        # Finished jobs leave Redis on acknowledgement; failures are capped
+        return 0
+
+
+BACKENDS = {
+    'database': 'apps.jobs.backends.DatabaseBackend',
+    'redis': 'apps.jobs.backends.RedisBackend',
+}
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'JOBS_BACKEND', 'database')
+        _backend = import_string(BACKENDS.get(path, path))()
+    return _backend
@@ -0,0 +1,39 @@
+"""Generic jobs shared by several apps."""
+
+from django.conf import settings
+from django.core.mail import send_mail
+
+from .queue import enqueue, job
+
+
+@job(name='cloudinary.destroy', max_attempts=5)
+def destroy_cloudinary_asset(public_id, fallback_name=None, **options):
+    """Delete an asset from Cloudinary, retrying with its stored name if the public id fails."""
+    import cloudinary.uploader
+    try:
+        cloudinary.uploader.destroy(public_id, **options)
+    except Exception:
+        if not fallback_name or fallback_name == public_id:
+            raise
+        cloudinary.uploader.destroy(fallback_name, **options)
+
+
+@job(name='mail.send', max_attempts=5)
+def send_email(subject, message, recipient_list, html_message=None, from_email=None):
+    send_mail(
+        subject=subject,
+        message=message,
+        html_message=html_message,
+        from_email=from_email or getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@connectflow.com'),
+        recipient_list=recipient_list,
+        fail_silently=False,
+    )
+
+
+def enqueue_cloudinary_destroy(resource, **options):
+    """Schedule deletion of a CloudinaryField value (no-op for empty values)."""
+    if not resource:
+        return None
+    public_id = getattr(resource, 'public_id', None)
+    name = getattr(resource, 'name', None) or str(resource)
+    return enqueue(destroy_cloudinary_asset, public_id or name, name, **options)
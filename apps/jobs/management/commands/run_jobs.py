@@ -0,0 +1,73 @@
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.jobs.backends import get_backend
+from apps.jobs.queue import run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (notifications, emails, Cloudinary cleanup)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Number of jobs executed in parallel')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the jobs that are currently due, then exit')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        backend = get_backend()
+        succeeded = failed = 0
+
+        self.stdout.write(f'Worker {worker_id} started (concurrency={concurrency})')
+
+        # With --concurrency 1 jobs run on the main thread (and its DB connection)
+        pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='job') if concurrency > 1 else None
+        run = lambda j: self._run(j, backend)
+        prune_interval = getattr(settings, 'JOBS_PRUNE_INTERVAL', 3600)
+        pruned_at = None
+        try:
+            while True:
+                if prune_interval > 0 and (pruned_at is None or time.monotonic() - pruned_at >= prune_interval):
+                    pruned_at = time.monotonic()
+                    pruned = backend.prune()
+                    if pruned:
+                        self.stdout.write(f'Pruned {pruned} finished job(s)')
+
+                jobs = backend.claim(worker_id, concurrency)
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                for ok in (pool.map(run, jobs) if pool else map(run, jobs)):
+                    if ok:
+                        succeeded += 1
+                    else:
+                        failed += 1
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool:
+                pool.shutdown(wait=True)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Processed {succeeded + failed} job(s): {succeeded} succeeded, {failed} failed')
+        )
+
+    def _run(self, job, backend):
+        try:
+            return run_job(job, backend)
+        finally:
+            close_old_connections()
@@ -0,0 +1,76 @@
+"""
+Background job queue.
+
+Slow side effects (SMTP, Cloudinary, notification fan-out) are declared with
+``@job`` in an app's ``jobs.py`` and scheduled with :func:`enqueue`, so the
+request or consumer that triggers them never waits on third-party network
+time. Jobs are executed by ``python manage.py run_jobs``.
+
+Arguments must be JSON serializable: pass primary keys, not model instances.
+"""
+
+import logging
+import traceback
+
+from django.conf import settings
+from django.db import transaction
+
+from .backends import get_backend
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def job(name=None, max_attempts=3):
+    """Register a function as a background job under ``name`` (default: dotted path)."""
+    def decorator(func):
+        func.job_name = name or f'{func.__module__}.{func.__qualname__}'
+        func.max_attempts = max_attempts
+        registry[func.job_name] = func
+        return func
+    return decorator
+
+
+def enqueue(func, *args, **kwargs):
+    """
+    Schedule ``func(*args, **kwargs)`` on the job queue.
+
+    With ``JOBS_EAGER`` the job runs in-process once the current transaction
+    commits instead, which keeps development setups working without a worker.
+    """
+    name = getattr(func, 'job_name', func)
+    if name not in registry:
+        raise KeyError(f'Unknown job: {name}')
+
+    if getattr(settings, 'JOBS_EAGER', False):
+        transaction.on_commit(lambda: _run_eagerly(name, args, kwargs))
+        return None
+    return get_backend().enqueue(name, list(args), kwargs, registry[name].max_attempts)
+
+
+def _run_eagerly(name, args, kwargs):
+    try:
+        registry[name](*args, **kwargs)
+    except Exception as e:
+        logger.error(f'Job {name} failed: {e}', exc_info=True)
+
+
+def run_job(job, backend=None):
+    """Execute a claimed job and record the outcome. Returns True on success."""
+    backend = backend or get_backend()
+    func = registry.get(job.name)
+    try:
+        if func is None:
+            raise KeyError(f'Unknown job: {job.name}')
+        func(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        will_retry = backend.fail(job, error)
+        logger.warning(
+            f'Job {job.name} failed (attempt {job.attempts}/{job.max_attempts})'
+            f'{", will retry" if will_retry else ""}: {error.strip().splitlines()[-1]}'
+        )
+        return False
+    backend.complete(job)
+    return True
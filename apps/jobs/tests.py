@@ -0,0 +1,104 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from apps.jobs.models import Job
+from apps.jobs.queue import enqueue, job
+
+calls = []
+
+
+@job(name='tests.record')
+def record(value, suffix=''):
+    calls.append(f'{value}{suffix}')
+
+
+@job(name='tests.explode', max_attempts=2)
+def explode():
+    raise ValueError('boom')
+
+
+@override_settings(JOBS_EAGER=False)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_run_worker(self):
+        enqueue(record, 'hello', suffix='!')
+        queued = Job.objects.get()
+        self.assertEqual(queued.status, Job.Status.PENDING)
+        self.assertEqual(calls, [])
+
+        call_command('run_jobs', '--once', '--concurrency', '1', stdout=StringIO())
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.Status.SUCCEEDED)
+        self.assertEqual(queued.attempts, 1)
+        self.assertEqual(calls, ['hello!'])
+
+    def test_failed_job_backs_off_then_gives_up(self):
+        enqueue(explode)
+        call_command('run_jobs', '--once', '--concurrency', '1', stdout=StringIO())
+
+        queued = Job.objects.get()
+        self.assertEqual(queued.status, Job.Status.PENDING)
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertIn('ValueError: boom', queued.last_error)
+
+        Job.objects.update(run_at=timezone.now())
+        call_command('run_jobs', '--once', '--concurrency', '1', stdout=StringIO())
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.Status.FAILED)
+        self.assertEqual(queued.attempts, 2)
+
+    def test_abandoned_job_on_its_last_attempt_fails(self):
+        from datetime import timedelta
+        from apps.jobs.backends import get_backend
+        stale = timezone.now() - timedelta(hours=1)
+        enqueue(record, 'retry')
+        enqueue(record, 'dead')
+        retry, dead = Job.objects.order_by('created_at')
+        Job.objects.filter(pk=retry.pk).update(status=Job.Status.RUNNING, locked_at=stale, attempts=1)
+        Job.objects.filter(pk=dead.pk).update(status=Job.Status.RUNNING, locked_at=stale, attempts=3)
+
+        claimed = get_backend().claim('worker', 10)
+
+        self.assertEqual([job.pk for job in claimed], [retry.pk])
+        dead.refresh_from_db()
+        self.assertEqual(dead.status, Job.Status.FAILED)
+        self.assertEqual(dead.last_error, 'Worker died while running the job')
+
+    def test_worker_prunes_finished_jobs(self):
+        from datetime import timedelta
+        now = timezone.now()
+        for status, age in (
+            (Job.Status.SUCCEEDED, 8), (Job.Status.SUCCEEDED, 1),
+            (Job.Status.FAILED, 8), (Job.Status.FAILED, 31), (Job.Status.PENDING, 60),
+        ):
+            queued = enqueue(record, f'{status}-{age}')
+            Job.objects.filter(pk=queued.pk).update(status=status, updated_at=now - timedelta(days=age))
+
+        out = StringIO()
+        call_command('run_jobs', '--once', '--concurrency', '1', stdout=out)
+
+        self.assertIn('Pruned 2 finished job(s)', out.getvalue())
+        self.assertEqual(
+            sorted(Job.objects.values_list('args', flat=True)),
+            [['FAILED-8'], ['PENDING-60'], ['SUCCEEDED-1']]
+        )
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_mode_runs_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue(record, 'now')
+        self.assertEqual(calls, ['now'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_cloudinary_delete_is_queued(self):
+        from apps.jobs.jobs import enqueue_cloudinary_destroy
+        self.assertIsNone(enqueue_cloudinary_destroy(None))
+        enqueue_cloudinary_destroy('voice/abc', resource_type='auto')
+        queued = Job.objects.get()
+        self.assertEqual(queued.name, 'cloudinary.destroy')
+        self.assertEqual(queued.args, ['voice/abc', 'voice/abc'])
+        self.assertEqual(queued.kwargs, {'resource_type': 'auto'})
@@ -1,6 +1,8 @@
 from rest_framework import viewsets, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from connectflow.api import ConditionalMixin, SparseFieldsetMixin
+from apps.accounts.models import User
 from .models import (
     Organization, Department, Team, SharedProject, ProjectTask, 
     ProjectMilestone, ProjectFile, ProjectMeeting, ProjectRiskRegister,
@@ -16,14 +18,14 @@ from .serializers import (
 )
 from .permissions import HasSubscriptionFeature
 
-class OrganizationViewSet(viewsets.ReadOnlyModelViewSet):
+class OrganizationViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = OrganizationSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         return Organization.objects.filter(id=self.request.user.organization_id)
 
-class DepartmentViewSet(viewsets.ModelViewSet):
+class DepartmentViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = DepartmentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -33,21 +35,32 @@ class DepartmentViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(organization=self.request.user.organization)
 
-class TeamViewSet(viewsets.ModelViewSet):
+class TeamViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = TeamSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         return Team.objects.filter(department__organization=self.request.user.organization)
 
-class SharedProjectViewSet(viewsets.ModelViewSet):
+class SharedProjectViewSet(ConditionalMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = SharedProjectSerializer
     permission_classes = [permissions.IsAuthenticated]
+    version_models = (SharedProject, SharedProject.members.through, Organization, User)
+    # Milestones have no updated_at to aggregate
+    version_strict_models = (ProjectMilestone,)
 
     def get_queryset(self):
         user = self.request.user
         return SharedProject.objects.filter(members=user)
 
+    def get_version_aggregates(self, model):
+        from django.db.models import Max
+        return {
+            **super().get_version_aggregates(model),
+            'hosts': Max('host_organization__updated_at'),
+            'creators': Max('created_by__updated_at'),
+        }
+
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user, host_organization=self.request.user.organization)
 
@@ -63,7 +76,7 @@ class SharedProjectViewSet(viewsets.ModelViewSet):
         }
         return Response(data)
 
-class ProjectTaskViewSet(viewsets.ModelViewSet):
+class ProjectTaskViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = ProjectTaskSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter]
@@ -75,14 +88,14 @@ class ProjectTaskViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(creator=self.request.user)
 
-class ProjectMilestoneViewSet(viewsets.ModelViewSet):
+class ProjectMilestoneViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = ProjectMilestoneSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         return ProjectMilestone.objects.filter(project__members=self.request.user)
 
-class ProjectFileViewSet(viewsets.ModelViewSet):
+class ProjectFileViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = ProjectFileSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -92,7 +105,7 @@ class ProjectFileViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(uploader=self.request.user)
 
-class ProjectMeetingViewSet(viewsets.ModelViewSet):
+class ProjectMeetingViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = ProjectMeetingSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -102,47 +115,49 @@ class ProjectMeetingViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(organizer=self.request.user)
 
-class ProjectRiskRegisterViewSet(viewsets.ModelViewSet):
+class ProjectRiskRegisterViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = ProjectRiskRegisterSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         return ProjectRiskRegister.objects.filter(project__members=self.request.user)
 
-class SubscriptionPlanViewSet(viewsets.ReadOnlyModelViewSet):
+class SubscriptionPlanViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = SubscriptionPlan.objects.all()
     serializer_class = SubscriptionPlanSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class SubscriptionTransactionViewSet(viewsets.ReadOnlyModelViewSet):
+class SubscriptionTransactionViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = SubscriptionTransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         return SubscriptionTransaction.objects.filter(organization=self.request.user.organization)
 
-class AuditTrailViewSet(viewsets.ModelViewSet):
+class AuditTrailViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = AuditTrailSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Audit exports page through large histories
+    max_page_size = 500
 
     def get_queryset(self):
         return AuditTrail.objects.filter(project__members=self.request.user)
 
-class ControlTestViewSet(viewsets.ModelViewSet):
+class ControlTestViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = ControlTestSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         return ControlTest.objects.filter(project__members=self.request.user)
 
-class ComplianceRequirementViewSet(viewsets.ModelViewSet):
+class ComplianceRequirementViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = ComplianceRequirementSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         return ComplianceRequirement.objects.filter(project__members=self.request.user)
 
-class ComplianceEvidenceViewSet(viewsets.ModelViewSet):
+class ComplianceEvidenceViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = ComplianceEvidenceSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -1,8 +1,11 @@
+import logging
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 import uuid
 from cloudinary.models import CloudinaryField
 
+logger = logging.getLogger(__name__)
+
 
 class SubscriptionPlan(models.Model):
     """
@@ -694,7 +697,7 @@ class ComplianceEvidence(models.Model):
 from django.db.models.signals import m2m_changed, post_delete, pre_save
 from django.dispatch import receiver
 from django.urls import reverse
-import cloudinary.uploader
+from apps.jobs.jobs import enqueue_cloudinary_destroy
 
 @receiver(pre_save, sender=Organization)
 def delete_old_org_logo_on_change(sender, instance, **kwargs):
@@ -708,109 +711,48 @@ def delete_old_org_logo_on_change(sender, instance, **kwargs):
 
     new_logo = instance.logo
     if old_logo and old_logo != new_logo:
-        try:
-            cloudinary.uploader.destroy(old_logo.public_id)
-        except Exception:
-            try:
-                cloudinary.uploader.destroy(old_logo.name)
-            except Exception as e:
-                print(f"Cloudinary cleanup error: {e}")
+        enqueue_cloudinary_destroy(old_logo)
 
 @receiver(post_delete, sender=Organization)
 def delete_org_logo_from_cloudinary(sender, instance, **kwargs):
-    if instance.logo:
-        try:
-            cloudinary.uploader.destroy(instance.logo.public_id)
-        except Exception as e:
-            try:
-                cloudinary.uploader.destroy(instance.logo.name)
-            except:
-                print(f"Cloudinary deletion error: {e}")
+    enqueue_cloudinary_destroy(instance.logo)
 
 @receiver(post_delete, sender=ProjectFile)
 def delete_project_file_from_cloudinary(sender, instance, **kwargs):
-    if instance.file:
-        try:
-            cloudinary.uploader.destroy(instance.file.public_id, resource_type="auto")
-        except Exception as e:
-            try:
-                cloudinary.uploader.destroy(instance.file.name, resource_type="auto")
-            except:
-                print(f"Project file deletion error: {e}")
+    enqueue_cloudinary_destroy(instance.file, resource_type="auto")
 
 @receiver(m2m_changed, sender=Team.members.through)
 def notify_members_added_to_team(sender, instance, action, pk_set, **kwargs):
     if action == "post_add":
-        from apps.accounts.models import Notification, User
-        from asgiref.sync import async_to_sync
-        from channels.layers import get_channel_layer
-        
-        channel_layer = get_channel_layer()
-        
-        for user_id in pk_set:
-            try:
-                user = User.objects.get(pk=user_id)
-                # Team managers often add users, but we'll use instance manager if set
-                sender_user = instance.manager
-                
-                notification = Notification.notify(
-                    recipient=user,
-                    sender=sender_user,
-                    title=f"Joined Team: {instance.name}",
-                    content=f"You have been added to the team {instance.name}.",
-                    notification_type='MEMBERSHIP',
-                    link=reverse('organizations:overview') # Link to org overview where teams are listed
-                )
-                
-                # Broadcast via WebSocket
-                async_to_sync(channel_layer.group_send)(
-                    f"notifications_{user.id}",
-                    {
-                        'type': 'send_notification',
-                        'id': str(notification.id),
-                        'title': notification.title,
-                        'content': notification.content,
-                        'notification_type': notification.notification_type,
-                        'link': notification.link,
-                    }
-                )
-            except Exception as e:
-                print(f"Error sending notification: {e}")
+        from apps.accounts.notifications import dispatch_notifications
+
+        try:
+            # Team managers often add users, but we'll use instance manager if set
+            dispatch_notifications(
+                pk_set,
+                title=f"Joined Team: {instance.name}",
+                content=f"You have been added to the team {instance.name}.",
+                notification_type='MEMBERSHIP',
+                sender=instance.manager,
+                link=reverse('organizations:overview') # Link to org overview where teams are listed
+            )
+        except Exception:
+            logger.exception('Error sending notification')
 
 @receiver(m2m_changed, sender=SharedProject.members.through)
 def notify_members_added_to_project(sender, instance, action, pk_set, **kwargs):
     if action == "post_add":
-        from apps.accounts.models import Notification, User
-        from asgiref.sync import async_to_sync
-        from channels.layers import get_channel_layer
-        
-        channel_layer = get_channel_layer()
-        
-        for user_id in pk_set:
-            try:
-                user = User.objects.get(pk=user_id)
-                # We don't have a clear "creator" but we can use project name
-                link = reverse('organizations:shared_project_detail', kwargs={'pk': instance.pk})
-                notification = Notification.notify(
-                    recipient=user,
-                    sender=instance.created_by if hasattr(instance, 'created_by') else None,
-                    title=f"Joined Project: {instance.name}",
-                    content=f"You have been added to the shared project {instance.name}.",
-                    notification_type='PROJECT',
-                    link=link
-                )
-                
-                # Broadcast via WebSocket
-                async_to_sync(channel_layer.group_send)(
-                    f"notifications_{user.id}",
-                    {
-                        'type': 'send_notification',
-                        'id': str(notification.id),
-                        'title': notification.title,
-                        'content': notification.content,
-                        'notification_type': notification.notification_type,
-                        'link': notification.link,
-                    }
-                )
-            except Exception as e:
-                print(f"Error sending notification: {e}")
+        from apps.accounts.notifications import dispatch_notifications
+
+        try:
+            # We don't have a clear "creator" but we can use project name
+            dispatch_notifications(
+                pk_set,
+                title=f"Joined Project: {instance.name}",
+                content=f"You have been added to the shared project {instance.name}.",
+                notification_type='PROJECT',
+                sender=instance.created_by if hasattr(instance, 'created_by') else None,
+                link=reverse('organizations:shared_project_detail', kwargs={'pk': instance.pk})
+            )
+        except Exception:
+            logger.exception('Error sending notification')
@@ -6,6 +6,7 @@ from django.http import JsonResponse
 from django.urls import reverse
 from django.views.decorators.http import require_POST
 from django.http import Http404
+from apps.accounts.notifications import dispatch_notifications
 from .models import (
     Organization, Department, Team, SharedProject, ProjectFile, ProjectMeeting, 
     ProjectTask, ProjectMilestone, ProjectRiskRegister, AuditTrail, ControlTest, 
@@ -266,32 +267,15 @@ def project_milestones(request, pk):
             milestone.save()
             
             # Notify members
-            from apps.accounts.models import Notification
-            from asgiref.sync import async_to_sync
-            from channels.layers import get_channel_layer
-            channel_layer = get_channel_layer()
-            
-            for member in project.members.all():
-                if member == request.user: continue
-                notification = Notification.notify(
-                    recipient=member,
-                    sender=request.user,
-                    title=f"New Milestone: {milestone.title}",
-                    content=f"A new milestone has been set for {project.name}: {milestone.title}",
-                    notification_type='PROJECT',
-                    link=reverse('organizations:shared_project_detail', kwargs={'pk': project.pk})
-                )
-                async_to_sync(channel_layer.group_send)(
-                    f"notifications_{member.id}",
-                    {
-                        'type': 'send_notification',
-                        'id': str(notification.id),
-                        'title': notification.title,
-                        'content': notification.content,
-                        'notification_type': notification.notification_type,
-                        'link': notification.link,
-                    }
-                )
+            dispatch_notifications(
+                project.members.all(),
+                title=f"New Milestone: {milestone.title}",
+                content=f"A new milestone has been set for {project.name}: {milestone.title}",
+                notification_type='PROJECT',
+                sender=request.user,
+                link=reverse('organizations:shared_project_detail', kwargs={'pk': project.pk}),
+                exclude=[request.user]
+            )
             
             messages.success(request, 'Milestone added.')
             return redirect('organizations:project_milestones', pk=pk)
@@ -317,38 +301,18 @@ def toggle_milestone(request, pk):
     milestone.completed_at = timezone.now() if milestone.is_completed else None
     milestone.save()
 
-    from apps.accounts.models import Notification
-    from asgiref.sync import async_to_sync
-    from channels.layers import get_channel_layer
-    channel_layer = get_channel_layer()
-    
     title = f"Milestone Achieved: {milestone.title}" if milestone.is_completed else f"Milestone Re-opened: {milestone.title}"
     status_text = "completed" if milestone.is_completed else "re-opened"
-    
-    for member in milestone.project.members.all():
-        if member == request.user:
-            continue
-            
-        notification = Notification.notify(
-            recipient=member,
-            sender=request.user,
-            title=title,
-            content=f"{request.user.get_full_name()} {status_text} a milestone in {milestone.project.name}.",
-            notification_type='PROJECT',
-            link=reverse('organizations:shared_project_detail', kwargs={'pk': milestone.project.pk})
-        )
-        
-        async_to_sync(channel_layer.group_send)(
-            f"notifications_{member.id}",
-            {
-                'type': 'send_notification',
-                'id': str(notification.id),
-                'title': notification.title,
-                'content': notification.content,
-                'notification_type': notification.notification_type,
-                'link': notification.link,
-            }
-        )
+
+    dispatch_notifications(
+        milestone.project.members.all(),
+        title=title,
+        content=f"{request.user.get_full_name()} {status_text} a milestone in {milestone.project.name}.",
+        notification_type='PROJECT',
+        sender=request.user,
+        link=reverse('organizations:shared_project_detail', kwargs={'pk': milestone.project.pk}),
+        exclude=[request.user]
+    )
     
     return JsonResponse({
         'success': True, 
@@ -384,33 +348,15 @@ def project_files(request, pk):
             project_file.save()
 
             # Notification logic
-            from apps.accounts.models import Notification
-            from asgiref.sync import async_to_sync
-            from channels.layers import get_channel_layer
-            channel_layer = get_channel_layer()
-            
-            for member in project.members.all():
-                if member == request.user:
-                    continue
-                notification = Notification.notify(
-                    recipient=member,
-                    sender=request.user,
-                    title=f"New File in {project.name}",
-                    content=f"{request.user.get_full_name()} uploaded {project_file.name}",
-                    notification_type='PROJECT',
-                    link=reverse('organizations:project_files', kwargs={'pk': project.pk})
-                )
-                async_to_sync(channel_layer.group_send)(
-                    f"notifications_{member.id}",
-                    {
-                        'type': 'send_notification',
-                        'id': str(notification.id),
-                        'title': notification.title,
-                        'content': notification.content,
-                        'notification_type': notification.notification_type,
-                        'link': notification.link,
-                    }
-                )
+            dispatch_notifications(
+                project.members.all(),
+                title=f"New File in {project.name}",
+                content=f"{request.user.get_full_name()} uploaded {project_file.name}",
+                notification_type='PROJECT',
+                sender=request.user,
+                link=reverse('organizations:project_files', kwargs={'pk': project.pk}),
+                exclude=[request.user]
+            )
 
             messages.success(request, 'File uploaded successfully.')
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -472,33 +418,15 @@ def project_meetings(request, pk):
             meeting.save()
 
             # Notification logic
-            from apps.accounts.models import Notification
-            from asgiref.sync import async_to_sync
-            from channels.layers import get_channel_layer
-            channel_layer = get_channel_layer()
-            
-            for member in project.members.all():
-                if member == request.user:
-                    continue
-                notification = Notification.notify(
-                    recipient=member,
-                    sender=request.user,
-                    title=f"Meeting Scheduled: {meeting.title}",
-                    content=f"New meeting for project {project.name} on {meeting.start_time.strftime('%Y-%m-%d %H:%M')}",
-                    notification_type='PROJECT',
-                    link=reverse('organizations:project_meetings', kwargs={'pk': project.pk})
-                )
-                async_to_sync(channel_layer.group_send)(
-                    f"notifications_{member.id}",
-                    {
-                        'type': 'send_notification',
-                        'id': str(notification.id),
-                        'title': notification.title,
-                        'content': notification.content,
-                        'notification_type': notification.notification_type,
-                        'link': notification.link,
-                    }
-                )
+            dispatch_notifications(
+                project.members.all(),
+                title=f"Meeting Scheduled: {meeting.title}",
+                content=f"New meeting for project {project.name} on {meeting.start_time.strftime('%Y-%m-%d %H:%M')}",
+                notification_type='PROJECT',
+                sender=request.user,
+                link=reverse('organizations:project_meetings', kwargs={'pk': project.pk}),
+                exclude=[request.user]
+            )
 
             messages.success(request, 'Meeting scheduled.')
             return redirect('organizations:project_meetings', pk=pk)
@@ -536,32 +464,15 @@ def project_meeting_edit(request, project_pk, meeting_pk):
             meeting = form.save()
             
             # Notify members about update
-            from apps.accounts.models import Notification
-            from asgiref.sync import async_to_sync
-            from channels.layers import get_channel_layer
-            channel_layer = get_channel_layer()
-            
-            for member in project.members.all():
-                if member == request.user: continue
-                notification = Notification.notify(
-                    recipient=member,
-                    sender=request.user,
-                    title=f"Meeting Updated: {meeting.title}",
-                    content=f"Details for the meeting '{meeting.title}' have been updated.",
-                    notification_type='PROJECT',
-                    link=reverse('organizations:project_meetings', kwargs={'pk': project.pk})
-                )
-                async_to_sync(channel_layer.group_send)(
-                    f"notifications_{member.id}",
-                    {
-                        'type': 'send_notification',
-                        'id': str(notification.id),
-                        'title': notification.title,
-                        'content': notification.content,
-                        'notification_type': notification.notification_type,
-                        'link': notification.link,
-                    }
-                )
+            dispatch_notifications(
+                project.members.all(),
+                title=f"Meeting Updated: {meeting.title}",
+                content=f"Details for the meeting '{meeting.title}' have been updated.",
+                notification_type='PROJECT',
+                sender=request.user,
+                link=reverse('organizations:project_meetings', kwargs={'pk': project.pk}),
+                exclude=[request.user]
+            )
                 
             messages.success(request, 'Meeting updated.')
             return redirect('organizations:project_meetings', pk=project_pk)
@@ -598,32 +509,15 @@ def project_meeting_delete(request, project_pk, meeting_pk):
         meeting.delete()
         
         # Notify members about cancellation
-        from apps.accounts.models import Notification
-        from asgiref.sync import async_to_sync
-        from channels.layers import get_channel_layer
-        channel_layer = get_channel_layer()
-        
-        for member in project.members.all():
-            if member == request.user: continue
-            notification = Notification.notify(
-                recipient=member,
-                sender=request.user,
-                title=f"Meeting Cancelled: {meeting_title}",
-                content=f"The meeting '{meeting_title}' has been cancelled.",
-                notification_type='PROJECT',
-                link=reverse('organizations:project_meetings', kwargs={'pk': project.pk})
-            )
-            async_to_sync(channel_layer.group_send)(
-                f"notifications_{member.id}",
-                {
-                    'type': 'send_notification',
-                    'id': str(notification.id),
-                    'title': notification.title,
-                    'content': notification.content,
-                    'notification_type': notification.notification_type,
-                    'link': notification.link,
-                }
-            )
+        dispatch_notifications(
+            project.members.all(),
+            title=f"Meeting Cancelled: {meeting_title}",
+            content=f"The meeting '{meeting_title}' has been cancelled.",
+            notification_type='PROJECT',
+            sender=request.user,
+            link=reverse('organizations:project_meetings', kwargs={'pk': project.pk}),
+            exclude=[request.user]
+        )
 
         messages.success(request, 'Meeting cancelled.')
         return redirect('organizations:project_meetings', pk=project_pk)
@@ -648,30 +542,14 @@ def project_tasks(request, pk):
 
             # Notification logic (Notify assigned user)
             if task.assigned_to and task.assigned_to != request.user:
-                from apps.accounts.models import Notification
-                from asgiref.sync import async_to_sync
-                from channels.layers import get_channel_layer
-                channel_layer = get_channel_layer()
-                
-                notification = Notification.notify(
-                    recipient=task.assigned_to,
-                    sender=request.user,
+                dispatch_notifications(
+                    [task.assigned_to],
                     title=f"New Task Assigned: {task.title}",
                     content=f"You have been assigned a task in {project.name}: {task.title}",
                     notification_type='PROJECT',
+                    sender=request.user,
                     link=reverse('organizations:project_tasks', kwargs={'pk': project.pk})
                 )
-                async_to_sync(channel_layer.group_send)(
-                    f"notifications_{task.assigned_to.id}",
-                    {
-                        'type': 'send_notification',
-                        'id': str(notification.id),
-                        'title': notification.title,
-                        'content': notification.content,
-                        'notification_type': notification.notification_type,
-                        'link': notification.link,
-                    }
-                )
 
             messages.success(request, 'Task created.')
             return redirect('organizations:project_tasks', pk=pk)
@@ -1128,22 +1006,21 @@ def invite_member(request):
         form = InviteMemberForm(request.POST, organization=user.organization)
         if form.is_valid():
             email = form.cleaned_data['email']
-            from django.core.mail import send_mail
-            from django.conf import settings
+            from apps.jobs.queue import enqueue
+            from apps.jobs.jobs import send_email
             
             invite_link = request.build_absolute_uri(f"/accounts/register/?code={user.organization.code}&email={email}")
             
             try:
-                send_mail(
+                enqueue(
+                    send_email,
                     subject=f'Invitation to join {user.organization.name} on ConnectFlow',
                     message=f'You have been invited to join {user.organization.name}. Click here to join: {invite_link}',
-                    from_email=settings.DEFAULT_FROM_EMAIL if hasattr(settings, 'DEFAULT_FROM_EMAIL') else 'noreply@connectflow.com',
                     recipient_list=[email],
-                    fail_silently=False,
                 )
-                messages.success(request, f"Invitation sent to {email}")
+                messages.success(request, f"Invitation to {email} queued for sending")
             except Exception as e:
-                # Fallback if email is not configured
+                # Fallback if the job could not be queued
                 messages.success(request, f"Please ask them to register with code: {user.organization.code}")
                 # Log error in production
             
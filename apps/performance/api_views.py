@@ -1,4 +1,5 @@
 from rest_framework import viewsets, permissions, filters
+from connectflow.api import SparseFieldsetMixin
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import (
     KPIMetric, KPIThreshold, KPIAssignment, 
@@ -10,7 +11,7 @@ from .serializers import (
     PerformanceAuditLogSerializer, ResponsibilitySerializer
 )
 
-class PerformanceBaseViewSet(viewsets.ModelViewSet):
+class PerformanceBaseViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
 
@@ -31,7 +32,7 @@ class KPIThresholdViewSet(PerformanceBaseViewSet):
     def get_queryset(self):
         return self.queryset.filter(metric__organization=self.request.user.organization)
 
-class KPIAssignmentViewSet(viewsets.ModelViewSet):
+class KPIAssignmentViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = KPIAssignment.objects.all()
     serializer_class = KPIAssignmentSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -53,7 +54,7 @@ class PerformanceReviewViewSet(PerformanceBaseViewSet):
             return self.queryset.filter(organization=self.request.user.organization)
         return self.queryset.filter(user=self.request.user)
 
-class PerformanceScoreViewSet(viewsets.ModelViewSet):
+class PerformanceScoreViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = PerformanceScore.objects.all()
     serializer_class = PerformanceScoreSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -61,10 +62,12 @@ class PerformanceScoreViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return self.queryset.filter(review__organization=self.request.user.organization)
 
-class PerformanceAuditLogViewSet(viewsets.ReadOnlyModelViewSet):
+class PerformanceAuditLogViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = PerformanceAuditLog.objects.all()
     serializer_class = PerformanceAuditLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Audit exports page through large histories
+    max_page_size = 500
 
     def get_queryset(self):
         return self.queryset.filter(organization=self.request.user.organization)
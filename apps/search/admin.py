@@ -0,0 +1,12 @@
+from django.contrib import admin
+from .models import SearchEntry
+
+
+@admin.register(SearchEntry)
+class SearchEntryAdmin(admin.ModelAdmin):
+    """Admin interface for SearchEntry model."""
+    
+    list_display = ('title', 'kind', 'organization', 'access', 'updated_at')
+    list_filter = ('kind', 'access')
+    search_fields = ('title', 'subtitle', 'object_id')
+    readonly_fields = ('updated_at',)
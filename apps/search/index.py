@@ -0,0 +1,331 @@
+"""
+Workspace search index behind the live search dropdown.
+
+``SearchEntry`` rows are the durable, incrementally maintained index; each
+process keeps an in-memory copy per organization for matching:
+
+* a sorted word list searched with ``bisect`` for prefix matches (every query
+  word must prefix a word of the title or terms);
+* title trigrams for typo tolerance when prefixes find too little.
+
+Writes bump a per-organization generation in the cache so every process
+reloads that organization's rows on its next query. Final results are cached
+per user and query for ``GLOBAL_SEARCH_CACHE_TIMEOUT`` seconds.
+"""
+
+import hashlib
+import uuid
+from bisect import bisect_left
+from collections import Counter, OrderedDict, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import SearchEntry
+from .sources import SOURCES, normalize, source_for
+
+Access = SearchEntry.Access
+
+CACHE_TIMEOUT = getattr(settings, 'GLOBAL_SEARCH_CACHE_TIMEOUT', 15)
+MAX_CACHED_ORGANIZATIONS = getattr(settings, 'GLOBAL_SEARCH_MAX_CACHED_ORGANIZATIONS', 64)
+
+TITLE_WEIGHT = 3.0
+TERMS_WEIGHT = 1.0
+EXACT_WORD_BONUS = 1.0
+FUZZY_THRESHOLD = 0.3
+FUZZY_WEIGHT = 2.0
+
+# Breaks ties between equally good matches
+KIND_BOOST = {
+    SearchEntry.Kind.USER: 0.3,
+    SearchEntry.Kind.CHANNEL: 0.3,
+    SearchEntry.Kind.PROJECT: 0.2,
+    SearchEntry.Kind.TASK: 0.1,
+    SearchEntry.Kind.DOCUMENT: 0.1,
+    SearchEntry.Kind.ANNOUNCEMENT: 0.1,
+}
+
+ICONS = {
+    SearchEntry.Kind.USER: 'user',
+    SearchEntry.Kind.CHANNEL: 'hashtag',
+    SearchEntry.Kind.PROJECT: 'folder',
+    SearchEntry.Kind.TASK: 'check',
+    SearchEntry.Kind.DOCUMENT: 'document',
+    SearchEntry.Kind.ANNOUNCEMENT: 'megaphone',
+}
+
+_ENTRY_FIELDS = (
+    'kind', 'object_id', 'title', 'subtitle', 'url', 'terms',
+    'access', 'project_id', 'visible_from', 'visible_until'
+)
+
+_indexes = OrderedDict()
+
+
+# ---------------------------------------------------------------------------
+# Generations
+# ---------------------------------------------------------------------------
+
+def _generation_key(organization_id):
+    return f'search_index:{organization_id}:generation'
+
+
+def _generation(organization_id):
+    # Random tokens rather than counters: a flushed cache must never hand out
+    # a generation an in-memory index was already built for.
+    return cache.get_or_set(_generation_key(organization_id), lambda: uuid.uuid4().hex, timeout=None)
+
+
+def _bump(organization_ids):
+    cache.set_many({
+        _generation_key(organization_id): uuid.uuid4().hex
+        for organization_id in organization_ids
+    }, timeout=None)
+
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+
+def _row(entry):
+    return (entry.organization_id,) + tuple(getattr(entry, field) for field in _ENTRY_FIELDS)
+
+
+def update_object(obj):
+    """Bring the index rows for ``obj`` (and objects embedding it) up to date."""
+    source = source_for(type(obj))
+    _replace(source.kind, obj.pk, source.entries(obj))
+    for dependent in source.dependents(obj):
+        update_object(dependent)
+
+
+def remove_object(kind, pk):
+    _replace(kind, pk, [])
+
+
+def _replace(kind, pk, entries):
+    existing = SearchEntry.objects.filter(kind=kind, object_id=str(pk))
+    current = {_row(entry) for entry in existing}
+    wanted = {_row(entry) for entry in entries}
+    if current == wanted:
+        # Unchanged (e.g. a save that only touched unindexed fields)
+        return
+
+    with transaction.atomic():
+        existing.delete()
+        SearchEntry.objects.bulk_create(entries)
+    _bump({row[0] for row in current | wanted})
+
+
+def rebuild(batch_size=500):
+    """Re-index every source from scratch. Returns the number of rows written."""
+    organization_ids = set(SearchEntry.objects.values_list('organization_id', flat=True).distinct())
+    count = 0
+    with transaction.atomic():
+        SearchEntry.objects.all().delete()
+        for source in SOURCES:
+            batch = []
+            for obj in source.get_queryset().iterator(chunk_size=batch_size):
+                batch.extend(source.entries(obj))
+                if len(batch) >= batch_size:
+                    SearchEntry.objects.bulk_create(batch)
+                    count += len(batch)
+                    organization_ids.update(entry.organization_id for entry in batch)
+                    batch = []
+            SearchEntry.objects.bulk_create(batch)
+            count += len(batch)
+            organization_ids.update(entry.organization_id for entry in batch)
+    _bump(organization_ids)
+    return count
+
+
+# ---------------------------------------------------------------------------
+# In-memory index
+# ---------------------------------------------------------------------------
+
+def trigrams(words):
+    """pg_trgm style trigrams: each word padded with two leading and one trailing space."""
+    grams = set()
+    for word in words:
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class OrganizationIndex:
+    """Prefix and trigram lookup over one organization's entries."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.titles = []
+        postings = []
+        self.title_grams = []
+        self.grams = defaultdict(list)
+
+        for position, entry in enumerate(entries):
+            title_words = normalize(entry.title)
+            self.titles.append(' '.join(title_words))
+            for word in set(title_words):
+                postings.append((word, position, TITLE_WEIGHT))
+            for word in set(entry.terms.split()) - set(title_words):
+                postings.append((word, position, TERMS_WEIGHT))
+
+            grams = trigrams(title_words)
+            self.title_grams.append(len(grams))
+            for gram in grams:
+                self.grams[gram].append(position)
+
+        postings.sort()
+        self.words = [word for word, _, _ in postings]
+        self.postings = [(position, weight) for _, position, weight in postings]
+
+    def prefix_matches(self, query_words):
+        """Entries where every query word prefixes some word, with a score each."""
+        scores = None
+        for query_word in query_words:
+            hits = {}
+            start = bisect_left(self.words, query_word)
+            end = bisect_left(self.words, query_word + '\uffff', start)
+            for i in range(start, end):
+                position, weight = self.postings[i]
+                score = weight + (EXACT_WORD_BONUS if self.words[i] == query_word else 0)
+                if score > hits.get(position, 0):
+                    hits[position] = score
+            if scores is None:
+                scores = hits
+            else:
+                scores = {p: scores[p] + s for p, s in hits.items() if p in scores}
+            if not scores:
+                return {}
+        return scores or {}
+
+    def fuzzy_matches(self, query_words):
+        """Entries whose title is trigram-similar to the query (Jaccard >= threshold)."""
+        query_grams = trigrams(query_words)
+        if not query_grams:
+            return {}
+        shared = Counter()
+        for gram in query_grams:
+            for position in self.grams.get(gram, ()):
+                shared[position] += 1
+        matches = {}
+        for position, count in shared.items():
+            similarity = count / (len(query_grams) + self.title_grams[position] - count)
+            if similarity >= FUZZY_THRESHOLD:
+                matches[position] = similarity * FUZZY_WEIGHT
+        return matches
+
+
+def organization_index(organization_id):
+    """The in-memory index for an organization, reloaded when its generation moves."""
+    generation = _generation(organization_id)
+    cached = _indexes.get(organization_id)
+    if cached and cached[0] == generation:
+        _indexes.move_to_end(organization_id)
+        return cached[1]
+
+    entries = list(SearchEntry.objects.filter(organization_id=organization_id).only(
+        'organization_id', *_ENTRY_FIELDS
+    ))
+    index = OrganizationIndex(entries)
+    _indexes[organization_id] = (generation, index)
+    _indexes.move_to_end(organization_id)
+    while len(_indexes) > MAX_CACHED_ORGANIZATIONS:
+        _indexes.popitem(last=False)
+    return index
+
+
+# ---------------------------------------------------------------------------
+# Querying
+# ---------------------------------------------------------------------------
+
+class _Viewer:
+    """Lazily resolved access checks for one user."""
+
+    def __init__(self, user):
+        self.user = user
+        self.now = timezone.now()
+        self._channels = None
+        self._projects = None
+
+    def can_see(self, entry):
+        if entry.visible_from and entry.visible_from > self.now:
+            return False
+        if entry.visible_until and entry.visible_until < self.now:
+            return False
+        if entry.access == Access.CHANNEL:
+            if self._channels is None:
+                from apps.chat_channels.visibility import visible_channel_ids
+                self._channels = {str(pk) for pk in visible_channel_ids(self.user)}
+            return entry.object_id in self._channels
+        if entry.access == Access.PROJECT:
+            if self._projects is None:
+                self._projects = set(self.user.shared_projects.values_list('pk', flat=True))
+            return entry.project_id in self._projects
+        return True
+
+
+def _result(entry):
+    return {
+        'type': entry.get_kind_display(),
+        'title': entry.title,
+        'subtitle': entry.subtitle,
+        'url': entry.url,
+        'icon': ICONS[entry.kind],
+    }
+
+
+def search(user, query, limit=15, per_kind=5):
+    """
+    Ranked results for ``query`` from the user's organization, best first,
+    as dicts ready for the search dropdown.
+    """
+    query_words = normalize(query)[:8]
+    if not query_words or not user.organization_id:
+        return []
+
+    cache_key = 'global_search:{}:{}:{}:{}:{}'.format(
+        user.organization_id,
+        _generation(user.organization_id),
+        user.pk,
+        limit,
+        hashlib.md5(' '.join(query_words).encode()).hexdigest()
+    )
+    results = cache.get(cache_key)
+    if results is not None:
+        return results
+
+    index = organization_index(user.organization_id)
+    scores = index.prefix_matches(query_words)
+    if len(scores) < limit and len(''.join(query_words)) >= 3:
+        for position, score in index.fuzzy_matches(query_words).items():
+            scores.setdefault(position, score)
+
+    phrase = ' '.join(query_words)
+    ranked = []
+    for position, score in scores.items():
+        title = index.titles[position]
+        if title == phrase:
+            score += 4
+        elif title.startswith(phrase):
+            score += 2
+        entry = index.entries[position]
+        ranked.append((-(score + KIND_BOOST[entry.kind]), title, position))
+    ranked.sort()
+
+    viewer = _Viewer(user)
+    per_kind_counts = Counter()
+    results = []
+    for _, _, position in ranked:
+        entry = index.entries[position]
+        if per_kind_counts[entry.kind] >= per_kind or not viewer.can_see(entry):
+            continue
+        per_kind_counts[entry.kind] += 1
+        results.append(_result(entry))
+        if len(results) >= limit:
+            break
+
+    cache.set(cache_key, results, CACHE_TIMEOUT)
+    return results
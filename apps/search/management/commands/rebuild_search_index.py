@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from apps.search.index import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the workspace search index (users, channels, projects, tasks, documents, announcements)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of rows to insert per statement')
+
+    def handle(self, *args, **options):
+        count = rebuild(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(f'✓ Indexed {count} search entr{"y" if count == 1 else "ies"}'))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('organizations', '0019_alter_projectfile_file'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('USER', 'User'), ('CHANNEL', 'Channel'), ('PROJECT', 'Project'), ('TASK', 'Task'), ('DOCUMENT', 'Document'), ('ANNOUNCEMENT', 'Announcement')], max_length=20)),
+                ('object_id', models.CharField(max_length=64)),
+                ('title', models.CharField(max_length=255)),
+                ('subtitle', models.CharField(blank=True, max_length=255)),
+                ('url', models.CharField(max_length=255)),
+                ('terms', models.TextField(blank=True, help_text='Normalized words matched besides the title')),
+                ('access', models.CharField(choices=[('ORGANIZATION', 'Everyone in the organization'), ('CHANNEL', 'Users who can view the channel'), ('PROJECT', 'Members of the shared project')], default='ORGANIZATION', max_length=20)),
+                ('project_id', models.UUIDField(blank=True, help_text='Shared project whose members may see this entry', null=True)),
+                ('visible_from', models.DateTimeField(blank=True, null=True)),
+                ('visible_until', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='organizations.organization')),
+            ],
+            options={
+                'verbose_name': 'Search Entry',
+                'verbose_name_plural': 'Search Entries',
+                'db_table': 'search_entries',
+                'indexes': [models.Index(fields=['kind', 'object_id'], name='search_entr_kind_b29ea0_idx')],
+                'unique_together': {('organization', 'kind', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def backfill_search_entries(apps, schema_editor):
+    from apps.search.index import rebuild
+    rebuild()
+
+
+def clear_search_entries(apps, schema_editor):
+    apps.get_model('search', 'SearchEntry').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+        ('accounts', '0014_user_status_last_seen_idx'),
+        ('chat_channels', '0029_message_reaction_counts'),
+        ('organizations', '0019_alter_projectfile_file'),
+        ('tools_documents', '0001_initial'),
+        ('tools_announcements', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_entries, clear_search_entries),
+    ]
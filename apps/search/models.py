@@ -0,0 +1,115 @@
+from django.db import models
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+
+
+class SearchEntry(models.Model):
+    """
+    SearchEntry model - one row per searchable object per organization that
+    can find it. Rows are written by the model signals below and loaded into
+    the in-memory workspace search index (see ``index.py``).
+    """
+
+    class Kind(models.TextChoices):
+        USER = 'USER', _('User')
+        CHANNEL = 'CHANNEL', _('Channel')
+        PROJECT = 'PROJECT', _('Project')
+        TASK = 'TASK', _('Task')
+        DOCUMENT = 'DOCUMENT', _('Document')
+        ANNOUNCEMENT = 'ANNOUNCEMENT', _('Announcement')
+
+    class Access(models.TextChoices):
+        ORGANIZATION = 'ORGANIZATION', _('Everyone in the organization')
+        CHANNEL = 'CHANNEL', _('Users who can view the channel')
+        PROJECT = 'PROJECT', _('Members of the shared project')
+
+    organization = models.ForeignKey(
+        'organizations.Organization',
+        on_delete=models.CASCADE,
+        related_name='search_entries'
+    )
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    object_id = models.CharField(max_length=64)
+
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True)
+    url = models.CharField(max_length=255)
+    terms = models.TextField(
+        blank=True,
+        help_text=_("Normalized words matched besides the title")
+    )
+
+    access = models.CharField(
+        max_length=20,
+        choices=Access.choices,
+        default=Access.ORGANIZATION
+    )
+    project_id = models.UUIDField(
+        null=True,
+        blank=True,
+        help_text=_("Shared project whose members may see this entry")
+    )
+    visible_from = models.DateTimeField(null=True, blank=True)
+    visible_until = models.DateTimeField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'search_entries'
+        verbose_name = _('Search Entry')
+        verbose_name_plural = _('Search Entries')
+        unique_together = ['organization', 'kind', 'object_id']
+        indexes = [
+            models.Index(fields=['kind', 'object_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.title}"
+
+
+# ============================================================================
+# SIGNALS
+# ============================================================================
+
+def _index_on_save(sender, instance, update_fields=None, **kwargs):
+    from .index import update_object
+    from .sources import source_for
+    source = source_for(sender)
+    # Presence heartbeats and similar partial saves never touch indexed fields
+    if update_fields and not set(update_fields) & source.fields:
+        return
+    update_object(instance)
+
+
+def _remove_on_delete(sender, instance, **kwargs):
+    from .index import remove_object
+    from .sources import source_for
+    remove_object(source_for(sender).kind, instance.pk)
+
+
+for _label in (
+    'accounts.User',
+    'chat_channels.Channel',
+    'organizations.SharedProject',
+    'organizations.ProjectTask',
+    'tools_documents.Document',
+    'tools_announcements.Announcement',
+):
+    post_save.connect(_index_on_save, sender=_label, dispatch_uid=f'search_index_save_{_label}')
+    post_delete.connect(_remove_on_delete, sender=_label, dispatch_uid=f'search_index_delete_{_label}')
+
+
+@receiver(m2m_changed, sender='organizations.SharedProject_guest_organizations')
+def reindex_project_guests(sender, instance, action, reverse, pk_set, **kwargs):
+    """Guest organizations join or leave a project: move its rows with it."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    from .index import update_object
+    if not reverse:
+        update_object(instance)
+    elif pk_set:
+        from apps.organizations.models import SharedProject
+        for project in SharedProject.objects.filter(pk__in=pk_set):
+            update_object(project)
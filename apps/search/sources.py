@@ -0,0 +1,237 @@
+"""
+What the workspace search index contains.
+
+Each source turns one model instance into ``SearchEntry`` rows, one per
+organization that should find it (a shared project is found from its host
+and every guest organization). Access rules are stored on the row and
+evaluated per user at query time, so membership changes need no reindexing.
+"""
+
+import re
+import unicodedata
+
+from django.urls import reverse
+
+from .models import SearchEntry
+
+Kind = SearchEntry.Kind
+Access = SearchEntry.Access
+
+# Only the start of long descriptions is worth matching in a dropdown
+MAX_TERMS_CHARS = 500
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(text):
+    """Lowercase, strip accents and split into words."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _WORD.findall(text.lower())
+
+
+def terms(*parts):
+    words = []
+    for part in parts:
+        words.extend(normalize((part or '')[:MAX_TERMS_CHARS]))
+    return ' '.join(dict.fromkeys(words))
+
+
+class Source:
+    """Base class: ``model`` label, the entry ``kind`` and the indexed ``fields``."""
+    model = None
+    kind = None
+    fields = frozenset()
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def entries(self, obj):
+        raise NotImplementedError
+
+    def dependents(self, obj):
+        """Other objects whose entries embed data from ``obj``."""
+        return []
+
+    def entry(self, organization_id, obj, **kwargs):
+        return SearchEntry(
+            organization_id=organization_id,
+            kind=self.kind,
+            object_id=str(obj.pk),
+            **kwargs
+        )
+
+
+class UserSource(Source):
+    model = 'accounts.User'
+    kind = Kind.USER
+    fields = frozenset({
+        'username', 'first_name', 'last_name', 'email', 'professional_role',
+        'organization', 'is_active'
+    })
+
+    def get_queryset(self):
+        from django.contrib.auth import get_user_model
+        return get_user_model().objects.filter(organization__isnull=False, is_active=True)
+
+    def entries(self, user):
+        if not user.organization_id or not user.is_active:
+            return []
+        return [self.entry(
+            user.organization_id, user,
+            title=user.get_full_name() or user.username,
+            subtitle=user.professional_role or user.email,
+            url=reverse('accounts:profile_detail', kwargs={'pk': user.pk}),
+            terms=terms(user.username, user.professional_role, (user.email or '').split('@')[0]),
+        )]
+
+
+class ChannelSource(Source):
+    model = 'chat_channels.Channel'
+    kind = Kind.CHANNEL
+    fields = frozenset({'name', 'description', 'channel_type', 'organization', 'is_archived'})
+
+    def get_queryset(self):
+        from apps.chat_channels.models import Channel
+        return Channel.objects.filter(is_archived=False)
+
+    def entries(self, channel):
+        if channel.is_archived:
+            return []
+        return [self.entry(
+            channel.organization_id, channel,
+            title=f"#{channel.name}",
+            subtitle=str(channel.get_channel_type_display()),
+            url=reverse('chat_channels:channel_detail', kwargs={'pk': channel.pk}),
+            terms=terms(channel.description),
+            access=Access.CHANNEL,
+        )]
+
+
+class ProjectSource(Source):
+    model = 'organizations.SharedProject'
+    kind = Kind.PROJECT
+    fields = frozenset({'name', 'description', 'host_organization'})
+
+    def get_queryset(self):
+        from apps.organizations.models import SharedProject
+        return SharedProject.objects.select_related('host_organization').prefetch_related('guest_organizations')
+
+    def entries(self, project):
+        organization_ids = {project.host_organization_id}
+        organization_ids.update(org.pk for org in project.guest_organizations.all())
+        return [
+            self.entry(
+                organization_id, project,
+                title=project.name,
+                subtitle=f"Hosted by {project.host_organization.name}",
+                url=reverse('organizations:shared_project_detail', kwargs={'pk': project.pk}),
+                terms=terms(project.description),
+                access=Access.PROJECT,
+                project_id=project.pk,
+            )
+            for organization_id in organization_ids
+        ]
+
+    def dependents(self, project):
+        return project.tasks.select_related('project__host_organization').prefetch_related(
+            'project__guest_organizations'
+        )
+
+
+class TaskSource(Source):
+    model = 'organizations.ProjectTask'
+    kind = Kind.TASK
+    fields = frozenset({'title', 'description', 'status', 'project'})
+
+    def get_queryset(self):
+        from apps.organizations.models import ProjectTask
+        return ProjectTask.objects.select_related('project__host_organization').prefetch_related(
+            'project__guest_organizations'
+        )
+
+    def entries(self, task):
+        project = task.project
+        organization_ids = {project.host_organization_id}
+        organization_ids.update(org.pk for org in project.guest_organizations.all())
+        return [
+            self.entry(
+                organization_id, task,
+                title=task.title,
+                subtitle=f"{task.get_status_display()} task in {project.name}",
+                url=reverse('organizations:project_tasks', kwargs={'pk': project.pk}),
+                terms=terms(task.description),
+                access=Access.PROJECT,
+                project_id=project.pk,
+            )
+            for organization_id in organization_ids
+        ]
+
+
+class DocumentSource(Source):
+    model = 'tools_documents.Document'
+    kind = Kind.DOCUMENT
+    fields = frozenset({'title', 'description', 'folder', 'organization'})
+
+    def get_queryset(self):
+        from apps.tools.documents.models import Document
+        return Document.objects.select_related('folder')
+
+    def entries(self, document):
+        if document.folder_id:
+            url = reverse('tools:documents:index_with_folder', kwargs={'folder_id': document.folder_id})
+            subtitle = document.folder.name
+        else:
+            url = reverse('tools:documents:index')
+            subtitle = 'Document library'
+        return [self.entry(
+            document.organization_id, document,
+            title=document.title,
+            subtitle=subtitle,
+            url=url,
+            terms=terms(document.description),
+        )]
+
+
+class AnnouncementSource(Source):
+    model = 'tools_announcements.Announcement'
+    kind = Kind.ANNOUNCEMENT
+    fields = frozenset({'title', 'content', 'priority', 'is_published', 'scheduled_at', 'expires_at', 'organization'})
+
+    def get_queryset(self):
+        from apps.tools.announcements.models import Announcement
+        return Announcement.objects.filter(is_published=True)
+
+    def entries(self, announcement):
+        if not announcement.is_published:
+            return []
+        return [self.entry(
+            announcement.organization_id, announcement,
+            title=announcement.title,
+            subtitle=f"{announcement.get_priority_display()} announcement",
+            url=reverse('tools:announcements:index'),
+            terms=terms(announcement.content),
+            visible_from=announcement.scheduled_at,
+            visible_until=announcement.expires_at,
+        )]
+
+
+SOURCES = [
+    UserSource(),
+    ChannelSource(),
+    ProjectSource(),
+    TaskSource(),
+    DocumentSource(),
+    AnnouncementSource(),
+]
+
+_by_model = {}
+
+
+def source_for(model):
+    """Return the source indexing ``model`` (a model class)."""
+    if not _by_model:
+        from django.apps import apps
+        for source in SOURCES:
+            _by_model[apps.get_model(source.model)] = source
+    return _by_model[model]
@@ -0,0 +1,121 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from apps.chat_channels.models import Channel
+from apps.organizations.models import Organization, ProjectTask, SharedProject
+from apps.search.index import search
+from apps.search.models import SearchEntry
+
+User = get_user_model()
+
+
+class WorkspaceSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name='Search Org', code='search-org')
+        self.user = User.objects.create_user(
+            username='searcher',
+            email='searcher@example.com',
+            password='password123',
+            email_verified=True,
+            organization=self.org
+        )
+        self.colleague = User.objects.create_user(
+            username='mkt_lead',
+            email='marta@example.com',
+            password='password123',
+            first_name='Marta',
+            last_name='Kovač',
+            professional_role='Marketing lead',
+            organization=self.org
+        )
+        self.official = Channel.objects.create(
+            name='marketing', organization=self.org, channel_type=Channel.ChannelType.OFFICIAL
+        )
+        self.private = Channel.objects.create(
+            name='marketing-budget', organization=self.org, channel_type=Channel.ChannelType.PRIVATE
+        )
+
+    def titles(self, query):
+        cache.clear()
+        return [result['title'] for result in search(self.user, query)]
+
+    def test_prefix_matches_are_ranked_and_access_checked(self):
+        self.assertEqual(self.titles('market'), ['#marketing', 'Marta Kovač'])
+        self.assertEqual(self.titles('kovac'), ['Marta Kovač'])
+
+        self.private.members.add(self.user)
+        self.assertIn('#marketing-budget', self.titles('marketing budget'))
+
+    def test_project_tasks_documents_and_announcements(self):
+        from apps.tools.announcements.models import Announcement
+        from apps.tools.documents.models import Document
+
+        project = SharedProject.objects.create(name='Launch plan', host_organization=self.org)
+        ProjectTask.objects.create(project=project, creator=self.colleague, title='Launch checklist')
+        Document.objects.create(organization=self.org, title='Launch brief')
+        Announcement.objects.create(
+            organization=self.org, title='Launch day', content='Party', created_by=self.colleague
+        )
+        Announcement.objects.create(
+            organization=self.org, title='Launch retro', content='Later', created_by=self.colleague,
+            scheduled_at=timezone.now() + timedelta(days=1)
+        )
+        self.assertCountEqual(self.titles('launch'), ['Launch brief', 'Launch day'])
+
+        project.members.add(self.user)
+        self.assertCountEqual(
+            self.titles('launch'),
+            ['Launch plan', 'Launch checklist', 'Launch brief', 'Launch day']
+        )
+
+        project.name = 'Go-live plan'
+        project.save()
+        self.assertEqual(
+            SearchEntry.objects.get(kind=SearchEntry.Kind.TASK).subtitle,
+            'To Do task in Go-live plan'
+        )
+
+    def test_typo_falls_back_to_trigrams(self):
+        self.assertEqual(self.titles('marketng'), ['#marketing'])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.official.name = 'growth'
+        self.official.save()
+        self.assertEqual(self.titles('growth'), ['#growth'])
+
+        self.official.is_archived = True
+        self.official.save()
+        self.assertEqual(self.titles('growth'), [])
+
+        self.colleague.delete()
+        self.assertEqual(self.titles('marta'), [])
+
+    def test_presence_saves_skip_the_index(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.colleague.status = 'ONLINE'
+        with CaptureQueriesContext(connection) as queries:
+            self.colleague.save(update_fields=['status'])
+        self.assertFalse([q for q in queries.captured_queries if 'search_entries' in q['sql']])
+
+    def test_repeated_query_is_served_from_cache(self):
+        search(self.user, 'market')
+        with self.assertNumQueries(0):
+            self.assertEqual(search(self.user, 'market')[0]['title'], '#marketing')
+
+    def test_global_search_view_and_rebuild(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        SearchEntry.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 4 search entries', out.getvalue())
+
+        self.client.force_login(self.user)
+        response = self.client.get('/accounts/global-search/', {'q': 'marta'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['type'], 'User')
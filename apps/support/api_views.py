@@ -1,10 +1,11 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from connectflow.api import SparseFieldsetMixin
 from .models import Ticket, TicketMessage
 from .serializers import TicketSerializer, TicketMessageSerializer
 
-class TicketViewSet(viewsets.ModelViewSet):
+class TicketViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = TicketSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -32,7 +33,7 @@ class TicketViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class TicketMessageViewSet(viewsets.ReadOnlyModelViewSet):
+class TicketMessageViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = TicketMessageSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -4,6 +4,8 @@ import google.generativeai as genai
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.conf import settings
 from channels.db import database_sync_to_async
+from connectflow.metrics import ConsumerMetricsMixin
+from connectflow.query_budget import QueryBudgetConsumerMixin
 from .ai_tools import (
     _db_get_tickets, _db_get_projects, _db_get_project_milestones, 
     _db_get_upcoming_meetings, _db_get_colleagues, _db_find_experts,
@@ -11,7 +13,7 @@ from .ai_tools import (
     _db_get_project_summary, _db_get_recent_activity
 )
 
-class SupportAIConsumer(AsyncWebsocketConsumer):
+class SupportAIConsumer(ConsumerMetricsMixin, QueryBudgetConsumerMixin, AsyncWebsocketConsumer):
     async def connect(self):
         try:
             self.user = self.scope["user"]
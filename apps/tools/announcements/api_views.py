@@ -1,26 +1,43 @@
 from rest_framework import viewsets, permissions, filters
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from connectflow.api import ConditionalMixin, SparseFieldsetMixin
+from apps.accounts.models import User
 from .models import Announcement, AnnouncementReadReceipt
 from .serializers import AnnouncementSerializer, AnnouncementReadReceiptSerializer
 
-class AnnouncementViewSet(viewsets.ModelViewSet):
+class AnnouncementViewSet(ConditionalMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Announcement.objects.all()
     serializer_class = AnnouncementSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'content']
     ordering_fields = ['created_at', 'priority']
+    version_models = (Announcement, User)
 
     def get_queryset(self):
         # Filtering for organization is done here
         return self.queryset.filter(organization=self.request.user.organization)
 
+    def get_version_aggregates(self, model):
+        # is_active follows the clock, so count what is live right now
+        now = timezone.now()
+        live = Q(is_published=True) & (Q(scheduled_at__isnull=True) | Q(scheduled_at__lte=now)) & (
+            Q(expires_at__isnull=True) | Q(expires_at__gte=now)
+        )
+        return {
+            **super().get_version_aggregates(model),
+            'active': Count('pk', filter=live),
+            'creators': Max('created_by__updated_at'),
+        }
+
     def perform_create(self, serializer):
         serializer.save(
             created_by=self.request.user,
             organization=self.request.user.organization
         )
 
-class AnnouncementReadReceiptViewSet(viewsets.ModelViewSet):
+class AnnouncementReadReceiptViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = AnnouncementReadReceipt.objects.all()
     serializer_class = AnnouncementReadReceiptSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -1,8 +1,9 @@
 from rest_framework import viewsets, permissions, filters
+from connectflow.api import SparseFieldsetMixin
 from .models import Resource, Booking
 from .serializers import ResourceSerializer, BookingSerializer
 
-class ResourceViewSet(viewsets.ModelViewSet):
+class ResourceViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Resource.objects.all()
     serializer_class = ResourceSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -13,7 +14,7 @@ class ResourceViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(organization=self.request.user.organization)
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -1,8 +1,9 @@
 from rest_framework import viewsets, permissions, filters
+from connectflow.api import SparseFieldsetMixin
 from .models import Folder, Document, DocumentVersion
 from .serializers import FolderSerializer, DocumentSerializer, DocumentVersionSerializer
 
-class FolderViewSet(viewsets.ModelViewSet):
+class FolderViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Folder.objects.all()
     serializer_class = FolderSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -16,7 +17,7 @@ class FolderViewSet(viewsets.ModelViewSet):
             organization=self.request.user.organization
         )
 
-class DocumentViewSet(viewsets.ModelViewSet):
+class DocumentViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Document.objects.all()
     serializer_class = DocumentSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -32,7 +33,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
             organization=self.request.user.organization
         )
 
-class DocumentVersionViewSet(viewsets.ModelViewSet):
+class DocumentVersionViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = DocumentVersion.objects.all()
     serializer_class = DocumentVersionSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -1,9 +1,10 @@
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.response import Response
+from connectflow.api import SparseFieldsetMixin
 from .models import Form, FormField, FormResponse
 from .serializers import FormSerializer, FormFieldSerializer, FormResponseSerializer
 
-class FormViewSet(viewsets.ModelViewSet):
+class FormViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Form.objects.all()
     serializer_class = FormSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -20,7 +21,7 @@ class FormViewSet(viewsets.ModelViewSet):
             organization=self.request.user.organization
         )
 
-class FormFieldViewSet(viewsets.ModelViewSet):
+class FormFieldViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = FormField.objects.all()
     serializer_class = FormFieldSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -28,7 +29,7 @@ class FormFieldViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return self.queryset.filter(form__organization=self.request.user.organization)
 
-class FormResponseViewSet(viewsets.ModelViewSet):
+class FormResponseViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = FormResponse.objects.all()
     serializer_class = FormResponseSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -0,0 +1,14 @@
+from apps.jobs.queue import job
+
+
+@job(name='tools_forms.submission_notification', max_attempts=5)
+def send_submission_notification_job(form_id, response_id):
+    """Email the form owner's notification list about a new response."""
+    from .emails import send_form_submission_notification
+    from .models import Form, FormResponse
+    form = Form.objects.filter(pk=form_id).first()
+    response = FormResponse.objects.filter(pk=response_id).first()
+    if form is None or response is None or not form.send_email_on_submit:
+        return
+    if not send_form_submission_notification(form, response):
+        raise RuntimeError(f'Submission notification for form {form_id} was not sent')
@@ -413,13 +413,15 @@ def form_submit_page(request, share_link):
         # Send notification email if enabled
         if form.send_email_on_submit and form.notification_emails:
             try:
-                from .emails import send_form_submission_notification
-                send_form_submission_notification(form, response)
+                # SMTP runs on the job queue, not in the submit request
+                from apps.jobs.queue import enqueue
+                from .jobs import send_submission_notification_job
+                enqueue(send_submission_notification_job, form.pk, response.pk)
             except Exception as e:
                 # Log error but don't fail submission
                 import logging
                 logger = logging.getLogger(__name__)
-                logger.error(f'Failed to send form notification: {str(e)}')
+                logger.error(f'Failed to queue form notification: {str(e)}')
         
         messages.success(request, 'Your response has been submitted!')
         return redirect('form_submit_success', share_link=share_link)
@@ -1,8 +1,9 @@
 from rest_framework import viewsets, permissions, filters
+from connectflow.api import SparseFieldsetMixin
 from .models import LeaveType, LeaveRequest, LeaveBalance
 from .serializers import LeaveTypeSerializer, LeaveRequestSerializer, LeaveBalanceSerializer
 
-class LeaveTypeViewSet(viewsets.ModelViewSet):
+class LeaveTypeViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = LeaveType.objects.all()
     serializer_class = LeaveTypeSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -13,7 +14,7 @@ class LeaveTypeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(organization=self.request.user.organization)
 
-class LeaveRequestViewSet(viewsets.ModelViewSet):
+class LeaveRequestViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = LeaveRequest.objects.all()
     serializer_class = LeaveRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -23,7 +24,7 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
             return self.queryset.filter(leave_type__organization=self.request.user.organization)
         return self.queryset.filter(user=self.request.user)
 
-class LeaveBalanceViewSet(viewsets.ModelViewSet):
+class LeaveBalanceViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = LeaveBalance.objects.all()
     serializer_class = LeaveBalanceSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -0,0 +1,281 @@
+"""
+Shared REST API behaviour for every viewset in ``connectflow/api_urls.py``.
+
+* ``DefaultCursorPagination`` - the default paginator (``REST_FRAMEWORK``).
+  Lists come back as ``{"next", "previous", "results"}``; ``?page_size=``
+  is capped by the view's ``max_page_size`` or ``API_MAX_PAGE_SIZE``.
+* ``SparseFieldsetMixin`` - ``?fields=id,name`` limits the serialized fields
+  of list and detail responses and, where every requested field maps to a
+  model column, narrows the SQL with ``only()``.
+* ``ConditionalMixin`` - ETag / Last-Modified validators on list and detail
+  responses, answering ``304 Not Modified`` before anything is serialized.
+"""
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist, ValidationError
+from django.db import models
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.http import Http404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import SAFE_METHODS
+
+
+class DefaultCursorPagination(CursorPagination):
+    """
+    Cursor pagination that keeps each endpoint's own ordering when it can be
+    paged on (a non-null, non-boolean column), falling back to newest first.
+    A view can set ``cursor_ordering`` and ``max_page_size`` explicitly.
+    """
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.max_page_size = getattr(view, 'max_page_size', None) or getattr(settings, 'API_MAX_PAGE_SIZE', 200)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None)
+        if ordering:
+            return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+
+        opts = queryset.model._meta
+        current = tuple(queryset.query.order_by or (opts.ordering if queryset.ordered else ()))
+        if current and all(isinstance(field, str) for field in current) and _pageable(opts, current[0]):
+            return current
+        if _pageable(opts, 'created_at'):
+            return ('-created_at',)
+        return ('-pk',)
+
+
+def _pageable(opts, order):
+    name = order.lstrip('-')
+    if name == 'pk':
+        return True
+    try:
+        field = opts.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    return (
+        field.concrete and not field.is_relation and not field.null
+        and not isinstance(field, models.BooleanField)
+    )
+
+
+class SparseFieldsetMixin:
+    """Viewset mixin implementing ``?fields=`` for safe (read) requests."""
+
+    def requested_fields(self):
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        raw = request.query_params.get('fields')
+        if not raw:
+            return None
+        return {name.strip() for name in raw.split(',') if name.strip()}
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.requested_fields()
+        if fields:
+            target = getattr(serializer, 'child', serializer)
+            for name in list(target.fields):
+                if name not in fields:
+                    target.fields.pop(name)
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields = self.requested_fields()
+        if fields:
+            columns = self.sparse_columns(queryset, fields)
+            if columns:
+                queryset = queryset.only(*columns)
+        return queryset
+
+    def sparse_columns(self, queryset, fields):
+        """
+        Model columns needed for ``fields``, or None when a requested field
+        reads something other than a plain column (methods, properties).
+        """
+        select_related = queryset.query.select_related
+        if select_related is True:
+            return None
+
+        opts = queryset.model._meta
+        serializer = self.get_serializer_class()(context=self.get_serializer_context())
+        columns = {opts.pk.name}
+        # only() may not defer a relation that select_related follows
+        columns.update(select_related or ())
+        # The paginator reads its position column from every row
+        if hasattr(self.paginator, 'get_ordering'):
+            position = self.paginator.get_ordering(self.request, queryset, self)[0].lstrip('-')
+            if position != 'pk':
+                columns.add(position)
+        for name in fields:
+            field = serializer.fields.get(name)
+            if field is None:
+                continue
+            if field.source == '*':
+                return None
+            try:
+                model_field = opts.get_field(field.source_attrs[0])
+            except FieldDoesNotExist:
+                return None
+            if model_field.concrete:
+                columns.add(model_field.name)
+            elif not (model_field.many_to_many or model_field.one_to_many):
+                return None
+        return columns
+
+
+# ---------------------------------------------------------------------------
+# Conditional requests
+# ---------------------------------------------------------------------------
+
+def _generation_key(model):
+    return f'api_version:generation:{model._meta.label_lower}'
+
+
+def _generations(model_classes):
+    keys = [_generation_key(model) for model in model_classes]
+    tokens = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in tokens}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        tokens.update(missing)
+    return hashlib.md5(':'.join(tokens[key] for key in keys).encode()).hexdigest()
+
+
+def bump_versions(*model_classes):
+    """
+    Invalidate cached version keys for ``model_classes``. Saves and deletes
+    do this through signals; call it after ``update()`` / ``bulk_create()``.
+    """
+    cache.set_many({_generation_key(model): uuid.uuid4().hex for model in model_classes}, timeout=None)
+
+
+def _bump_sender(sender, **kwargs):
+    bump_versions(sender)
+
+
+def track_versions(*model_classes):
+    """Bump the version generation of each model whenever its rows change."""
+    for model in model_classes:
+        uid = f'api_version:{model._meta.label_lower}'
+        if model._meta.auto_created:
+            m2m_changed.connect(_bump_sender, sender=model, dispatch_uid=uid)
+        else:
+            post_save.connect(_bump_sender, sender=model, dispatch_uid=uid)
+            post_delete.connect(_bump_sender, sender=model, dispatch_uid=uid + ':delete')
+
+
+class ConditionalMixin:
+    """
+    Viewset mixin for HTTP conditional GETs on ``list`` and ``retrieve``.
+
+    The version of a response is ``max(<timestamp>)`` and ``count`` over the
+    scoped queryset, plus any ``get_version_aggregates`` the view adds for
+    state that no timestamp covers (read flags, related rows). Versions are
+    cached per queryset until a write to one of ``version_models`` (or
+    ``API_VERSION_CACHE_TIMEOUT``), so an unchanged poll costs one cache
+    lookup and no serialization. Any write to a ``version_strict_models``
+    model - related rows with no timestamp to aggregate - changes the ETag.
+
+    ``Last-Modified`` is the time a version was first seen, so it moves on
+    every change even when no timestamp column does.
+    """
+    version_models = ()
+    version_strict_models = ()
+    version_timestamp_field = None
+    _validators = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        track_versions(*cls.version_models, *cls.version_strict_models)
+
+    def get_version_aggregates(self, model):
+        opts = model._meta
+        field = self.version_timestamp_field
+        if field is None:
+            field = 'updated_at' if _has_field(opts, 'updated_at') else 'created_at'
+        return {'last': models.Max(field), 'count': models.Count('pk')}
+
+    def get_version(self, queryset):
+        """(values, modified) for ``queryset``, from the cache when possible."""
+        try:
+            scope = hashlib.md5(str(queryset.query).encode()).hexdigest()
+        except EmptyResultSet:
+            return None
+        state_key = f'api_version:state:{scope}'
+        key = f'api_version:{scope}:{_generations(self.version_models)}'
+        version = cache.get(key)
+        if version is None:
+            aggregates = self.get_version_aggregates(queryset.model)
+            values = sorted(queryset.order_by().aggregate(**aggregates).items())
+            previous = cache.get(state_key)
+            if previous is not None and previous[0] == values:
+                version = previous
+            else:
+                version = (values, timezone.now())
+                cache.set(state_key, version, timeout=None)
+            cache.set(key, version, getattr(settings, 'API_VERSION_CACHE_TIMEOUT', 60))
+        return version
+
+    def conditional_response(self, request, queryset):
+        version = self.get_version(queryset)
+        if version is None:
+            return None
+        values, modified = version
+        identity = '|'.join([
+            request.get_full_path(),
+            request.accepted_renderer.format or '',
+            str(request.user.pk),
+            repr(values),
+            _generations(self.version_strict_models) if self.version_strict_models else '',
+        ])
+        self._validators = (quote_etag(hashlib.md5(identity.encode()).hexdigest()), modified)
+        response = get_conditional_response(
+            request._request, etag=self._validators[0], last_modified=int(modified.timestamp())
+        )
+        return None if response is None else self.with_validators(response)
+
+    def with_validators(self, response):
+        if self._validators and response.status_code in (200, 304):
+            etag, modified = self._validators
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(modified.timestamp())
+        return response
+
+    def list(self, request, *args, **kwargs):
+        response = self.conditional_response(request, self.filter_queryset(self.get_queryset()))
+        if response is None:
+            response = self.with_validators(super().list(request, *args, **kwargs))
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (ValidationError, ValueError, TypeError):
+            # A malformed id (not a UUID / integer) matches nothing
+            raise Http404
+        response = self.conditional_response(request, queryset)
+        if response is None:
+            response = self.with_validators(super().retrieve(request, *args, **kwargs))
+        return response
+
+
+def _has_field(opts, name):
+    try:
+        opts.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    return True
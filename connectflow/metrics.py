@@ -0,0 +1,338 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+``GET /metrics`` returns everything registered here. Values are kept per
+server process, so scrape each daphne worker separately. When
+``METRICS_TOKEN`` is set, the scraper must send
+``Authorization: Bearer <token>``; without a token the endpoint is only
+served in DEBUG.
+
+Exported series:
+
+* ``connectflow_http_request_duration_seconds{view,method}`` - histogram,
+  and ``connectflow_http_requests_total{view,method,status}``;
+* ``connectflow_websocket_connections{consumer}`` - open sockets per
+  consumer class;
+* ``connectflow_group_send_total{prefix}`` and
+  ``connectflow_group_send_bytes_total{prefix}`` - channel-layer fan-out per
+  group prefix (``chat``, ``presence_org``, ``notifications`` ...), bytes as
+  the msgpack size the Redis layer would put on the wire, estimated from one
+  send in ``METRICS_GROUP_SEND_SAMPLE`` per prefix;
+* ``connectflow_db_executor_queue_depth`` - calls waiting for the
+  thread-sensitive executor behind ``database_sync_to_async``;
+* ``connectflow_cache_requests_total{prefix,result}`` - cache hits and
+  misses per key prefix;
+* ``connectflow_presence_sweep_total``,
+  ``connectflow_presence_swept_users_total`` and
+  ``connectflow_presence_sweep_duration_seconds`` - the stale presence
+  sweeper (``apps/accounts/presence.py``);
+* ``connectflow_coalescer_frames_total{kind}`` and
+  ``connectflow_coalescer_flushes_total{kind}`` - ``read`` and ``typing``
+  frames received by ChatConsumer and the events they were coalesced into;
+  frames minus flushes is the number collapsed.
+
+``MetricsMiddleware`` installs the channel-layer and cache hooks (once per
+process) by wrapping ``group_send`` and ``get``/``get_many`` on the
+configured backend classes.
+"""
+
+import functools
+import hmac
+import threading
+import time
+
+import msgpack
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labels)
+
+    def samples(self):
+        """[(suffix, label values, extra labels, value)] for the exposition."""
+        with _lock:
+            return [('', key, (), value) for key, value in sorted(self.values.items())]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for suffix, key, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(self.labels, key, extra)} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=(), callback=None):
+        super().__init__(name, documentation, labels)
+        # Optional callable returning {label values tuple: value} at scrape time
+        self.callback = callback
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.callback is None:
+            return super().samples()
+        return [('', key, (), value) for key, value in sorted(self.callback().items())]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += 1
+            state[2] += value
+
+    def samples(self):
+        with _lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self.values.items())
+        samples = []
+        for key, (counts, total, value_sum) in items:
+            for bound, count in zip(self.buckets, counts):
+                samples.append(('_bucket', key, (('le', f'{bound:g}'),), count))
+            samples.append(('_bucket', key, (('le', '+Inf'),), total))
+            samples.append(('_sum', key, (), value_sum))
+            samples.append(('_count', key, (), total))
+        return samples
+
+
+def render():
+    return '\n'.join(metric.render() for metric in REGISTRY) + '\n'
+
+
+# ---------------------------------------------------------------------------
+# Series
+# ---------------------------------------------------------------------------
+
+def _executor_queue_depth():
+    from asgiref.sync import SyncToAsync
+    executors = [SyncToAsync.single_thread_executor]
+    executors.extend(list(SyncToAsync.context_to_thread_executor.values()))
+    depth = sum(
+        executor._work_queue.qsize() for executor in executors if hasattr(executor, '_work_queue')
+    )
+    return {(): depth}
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    'connectflow_http_request_duration_seconds', 'HTTP request latency by URL name.', ('view', 'method')
+)
+HTTP_REQUESTS = Counter(
+    'connectflow_http_requests_total', 'HTTP responses by URL name and status.', ('view', 'method', 'status')
+)
+WEBSOCKET_CONNECTIONS = Gauge(
+    'connectflow_websocket_connections', 'Open WebSocket connections by consumer.', ('consumer',)
+)
+GROUP_SENDS = Counter(
+    'connectflow_group_send_total', 'Channel-layer group_send calls by group prefix.', ('prefix',)
+)
+GROUP_SEND_BYTES = Counter(
+    'connectflow_group_send_bytes_total', 'Serialized group_send payload bytes by group prefix.', ('prefix',)
+)
+DB_EXECUTOR_QUEUE_DEPTH = Gauge(
+    'connectflow_db_executor_queue_depth',
+    'Calls queued for the database_sync_to_async (thread-sensitive) executor.',
+    callback=_executor_queue_depth,
+)
+CACHE_REQUESTS = Counter(
+    'connectflow_cache_requests_total', 'Cache lookups by key prefix and result.', ('prefix', 'result')
+)
+PRESENCE_SWEEPS = Counter('connectflow_presence_sweep_total', 'Stale presence sweeps run.')
+PRESENCE_SWEPT_USERS = Counter(
+    'connectflow_presence_swept_users_total', 'Users set OFFLINE by the stale presence sweeper.'
+)
+PRESENCE_SWEEP_DURATION = Histogram(
+    'connectflow_presence_sweep_duration_seconds', 'Duration of stale presence sweeps.'
+)
+COALESCER_FRAMES = Counter(
+    'connectflow_coalescer_frames_total', 'Websocket frames buffered for coalescing by kind.', ('kind',)
+)
+COALESCER_FLUSHES = Counter(
+    'connectflow_coalescer_flushes_total', 'Coalesced events flushed by kind.', ('kind',)
+)
+
+
+# ---------------------------------------------------------------------------
+# Hooks
+# ---------------------------------------------------------------------------
+
+def group_prefix(group):
+    """``chat_<uuid>`` -> ``chat``, ``presence_org_12`` -> ``presence_org``."""
+    parts = []
+    for part in group.split('_'):
+        if '-' in part or any(ch.isdigit() for ch in part):
+            break
+        parts.append(part)
+    return '_'.join(parts) or group
+
+
+def _key_prefix(key):
+    return str(key).split(':', 1)[0]
+
+
+def _instrument_group_send(layer_class):
+    if getattr(layer_class.group_send, '_metrics', False):
+        return
+    original = layer_class.group_send
+
+    @functools.wraps(original)
+    async def group_send(self, group, message):
+        prefix = group_prefix(group)
+        GROUP_SENDS.inc(prefix=prefix)
+        # Serializing is as costly as the send itself: measure the first send
+        # per prefix and every Nth after that, counting it N times
+        every = getattr(settings, 'METRICS_GROUP_SEND_SAMPLE', 10)
+        if every > 0 and (GROUP_SENDS.values[(prefix,)] - 1) % every == 0:
+            size = len(msgpack.packb(message, use_bin_type=True, default=str))
+            GROUP_SEND_BYTES.inc(size * every, prefix=prefix)
+        return await original(self, group, message)
+
+    group_send._metrics = True
+    layer_class.group_send = group_send
+
+
+_MISSING = object()
+
+
+def _instrument_cache(cache_class):
+    from django.core.cache.backends.base import BaseCache
+
+    if getattr(cache_class.get, '_metrics', False):
+        return
+    get, get_many = cache_class.get, cache_class.get_many
+
+    @functools.wraps(get)
+    def instrumented_get(self, key, default=None, *args, **kwargs):
+        value = get(self, key, _MISSING, *args, **kwargs)
+        hit = value is not _MISSING
+        CACHE_REQUESTS.inc(prefix=_key_prefix(key), result='hit' if hit else 'miss')
+        return value if hit else default
+
+    @functools.wraps(get_many)
+    def instrumented_get_many(self, keys, *args, **kwargs):
+        keys = list(keys)
+        found = get_many(self, keys, *args, **kwargs)
+        for key in keys:
+            CACHE_REQUESTS.inc(prefix=_key_prefix(key), result='hit' if key in found else 'miss')
+        return found
+
+    instrumented_get._metrics = True
+    cache_class.get = instrumented_get
+    # BaseCache.get_many already goes through get()
+    if get_many is not BaseCache.get_many:
+        cache_class.get_many = instrumented_get_many
+
+
+def install():
+    from channels.layers import get_channel_layer
+    from django.core.cache import caches
+
+    layer = get_channel_layer()
+    if layer is not None:
+        _instrument_group_send(type(layer))
+    for alias in settings.CACHES:
+        _instrument_cache(type(caches[alias]))
+
+
+class MetricsMiddleware:
+    """Request latency and status per URL name."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install()
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None and match.view_name else '<unresolved>'
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, view=view, method=request.method)
+        HTTP_REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        return response
+
+
+class ConsumerMetricsMixin:
+    """Counts a consumer's open sockets; put it before the consumer base."""
+
+    async def accept(self, *args, **kwargs):
+        await super().accept(*args, **kwargs)
+        if not getattr(self, '_metrics_open', False):
+            self._metrics_open = True
+            WEBSOCKET_CONNECTIONS.inc(consumer=type(self).__name__)
+
+    async def websocket_disconnect(self, message):
+        try:
+            await super().websocket_disconnect(message)
+        finally:
+            if getattr(self, '_metrics_open', False):
+                self._metrics_open = False
+                WEBSOCKET_CONNECTIONS.dec(consumer=type(self).__name__)
+
+
+def metrics_view(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return HttpResponse(status=401)
+    elif not settings.DEBUG:
+        raise Http404
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,202 @@
+"""
+Query budget instrumentation.
+
+Counts queries and database time per HTTP request and per WebSocket frame,
+and spots N+1 patterns: the same SQL shape run again and again within one
+unit of work.
+
+* ``QueryBudgetMiddleware`` - profiles each request, adds a ``Server-Timing``
+  header (``db`` and ``app`` durations) and logs requests that go over
+  ``QUERY_BUDGET_WARN_QUERIES`` or repeat a query shape
+  ``QUERY_BUDGET_REPEAT_THRESHOLD`` times, with the worst shapes and the
+  line of project code that issued them.
+* ``QueryBudgetConsumerMixin`` - the same for every message a Channels
+  consumer dispatches (websocket frames and group events).
+* ``QueryBudgetTestMixin`` - ``assertQueryBudget`` for pinning a view's
+  budget in the test suite.
+
+Queries are recorded by an execute wrapper installed on every database
+connection; it does nothing unless a profile is active in the current
+context. The active profile lives in a context variable, so queries run
+through ``database_sync_to_async`` are attributed to the frame awaiting them.
+"""
+
+import contextvars
+import logging
+import re
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+_active = contextvars.ContextVar('query_budget_profile', default=None)
+
+# "IN (%s, %s, %s)" and multi-row VALUES differ only in their batch size
+_PLACEHOLDER_LISTS = re.compile(r'\(%s(?:\s*,\s*%s)*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def sql_shape(sql):
+    """SQL with placeholder lists collapsed, so batches of any size compare equal."""
+    return _WHITESPACE.sub(' ', _PLACEHOLDER_LISTS.sub('(...)', sql)).strip()
+
+
+def _stack_hint():
+    """The innermost frame of project code (not Django, not this module)."""
+    base = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if filename.startswith(base) and 'site-packages' not in filename and filename != __file__:
+            return f'{filename[len(base) + 1:]}:{frame.lineno} in {frame.name}'
+    return None
+
+
+class QueryProfile:
+    """Queries, database time and repeated SQL shapes for one unit of work."""
+
+    def __init__(self, label, repeat_threshold=None, parent=None):
+        self.label = label
+        # Queries count towards every enclosing profile too (a test budget
+        # around a request, a request around a nested helper)
+        self.parent = parent
+        self.repeat_threshold = repeat_threshold or getattr(settings, 'QUERY_BUDGET_REPEAT_THRESHOLD', 5)
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.hints = {}
+        self.started = time.perf_counter()
+
+    def record(self, sql, duration):
+        shape = sql_shape(sql)
+        self.count += 1
+        self.duration += duration
+        self.shapes[shape] += 1
+        # Only pay for a stack walk once a shape starts to look like N+1
+        if self.shapes[shape] == self.repeat_threshold:
+            self.hints[shape] = _stack_hint()
+        if self.parent is not None:
+            self.parent.record(sql, duration)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def repeated(self):
+        """[(shape, count, hint)] for shapes at or over the threshold, worst first."""
+        return [
+            (shape, count, self.hints.get(shape))
+            for shape, count in self.shapes.most_common()
+            if count >= self.repeat_threshold
+        ]
+
+    def server_timing(self):
+        db_ms = self.duration * 1000
+        app_ms = max(self.elapsed * 1000 - db_ms, 0)
+        return f'db;dur={db_ms:.1f};desc="{self.count} queries", app;dur={app_ms:.1f}'
+
+    def summary(self, limit=3):
+        lines = [f'{self.label}: {self.count} queries, {self.duration * 1000:.1f}ms in the database']
+        for shape, count, hint in self.repeated()[:limit]:
+            lines.append(f'  {count}x {shape[:200]}' + (f'\n     at {hint}' if hint else ''))
+        return '\n'.join(lines)
+
+    def over_budget(self):
+        return self.count > getattr(settings, 'QUERY_BUDGET_WARN_QUERIES', 50) or bool(self.repeated())
+
+
+def _execute(execute, sql, params, many, context):
+    profile = _active.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.record(sql, time.perf_counter() - start)
+
+
+def _install(connection, **kwargs):
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute)
+
+
+def install():
+    """Hook every current and future connection. Called from the middleware."""
+    connection_created.connect(_install, dispatch_uid='query_budget_install')
+    for connection in connections.all(initialized_only=True):
+        _install(connection)
+
+
+@contextmanager
+def profiled(label, repeat_threshold=None):
+    """Make a new QueryProfile the active one for the enclosed block."""
+    install()
+    profile = QueryProfile(label, repeat_threshold, parent=_active.get())
+    token = _active.set(profile)
+    try:
+        yield profile
+    finally:
+        _active.reset(token)
+
+
+def report(profile):
+    if profile.over_budget():
+        logger.warning('Query budget exceeded - %s', profile.summary())
+
+
+class QueryBudgetMiddleware:
+    """Profile each request's queries; see the module docstring."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'QUERY_BUDGET_ENABLED', False)
+        if self.enabled:
+            install()
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        with profiled(f'{request.method} {request.path}') as profile:
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.view_name:
+            profile.label = f'{request.method} {match.view_name}'
+        response['Server-Timing'] = profile.server_timing()
+        report(profile)
+        return response
+
+
+class QueryBudgetConsumerMixin:
+    """
+    Consumer mixin profiling every dispatched message (one websocket frame,
+    connect/disconnect, or group event). Put it before the consumer base.
+    """
+
+    async def dispatch(self, message):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', False):
+            return await super().dispatch(message)
+        with profiled(f'{type(self).__name__} {message.get("type")}') as profile:
+            result = await super().dispatch(message)
+        report(profile)
+        return result
+
+
+class QueryBudgetTestMixin:
+    """TestCase mixin: pin a block's query count and forbid N+1 patterns."""
+
+    @contextmanager
+    def assertQueryBudget(self, max_queries, repeat_threshold=None):
+        with profiled(self.id(), repeat_threshold) as profile:
+            yield profile
+        repeated = profile.repeated()
+        if profile.count > max_queries or repeated:
+            self.fail(
+                f'Query budget of {max_queries} exceeded or repeated queries found.\n{profile.summary(limit=10)}'
+            )
@@ -64,6 +64,8 @@ INSTALLED_APPS = [
     'apps.support',
     'apps.calls',
     'apps.performance',
+    'apps.jobs',
+    'apps.search',
     'apps.tools.forms',
     'apps.tools.documents',
     'apps.tools.announcements',
@@ -74,10 +76,13 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'connectflow.metrics.MetricsMiddleware',
+    'connectflow.query_budget.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.accounts.principal.PrincipalMiddleware',
     'apps.accounts.middleware.EmailVerificationMiddleware',
     'apps.accounts.security_middleware.SecurityHeadersMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -125,6 +130,42 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Number of messages rendered per window in channel_detail / load older / load newer
+CHAT_MESSAGE_PAGE_SIZE = config('CHAT_MESSAGE_PAGE_SIZE', default=50, cast=int)
+
+# Coalescing windows (seconds) for websocket read acks and typing frames; 0 disables buffering
+CHAT_READ_COALESCE_WINDOW = config('CHAT_READ_COALESCE_WINDOW', default=1.0, cast=float)
+CHAT_TYPING_COALESCE_WINDOW = config('CHAT_TYPING_COALESCE_WINDOW', default=0.3, cast=float)
+CHAT_TYPING_REFRESH_INTERVAL = config('CHAT_TYPING_REFRESH_INTERVAL', default=3.0, cast=float)
+
+# Per-channel event log replayed to reconnecting sockets ("resume" frames);
+# python manage.py prune_channel_events applies the retention limits
+CHAT_EVENT_LOG_RETENTION_HOURS = config('CHAT_EVENT_LOG_RETENTION_HOURS', default=72, cast=int)
+CHAT_EVENT_LOG_MAX_PER_CHANNEL = config('CHAT_EVENT_LOG_MAX_PER_CHANNEL', default=1000, cast=int)
+# Seconds between in-process prunes of that log on the ASGI server (0 disables;
+# `manage.py prune_channel_events` still works)
+CHAT_EVENT_PRUNE_INTERVAL = config('CHAT_EVENT_PRUNE_INTERVAL', default=3600, cast=int)
+CHAT_RESUME_MAX_EVENTS = config('CHAT_RESUME_MAX_EVENTS', default=500, cast=int)
+
+# Hand notification fan-out (bulk insert + channel layer push) to the background job queue
+NOTIFICATION_DISPATCH_DEFERRED = config('NOTIFICATION_DISPATCH_DEFERRED', default=False, cast=bool)
+
+# Background jobs (python manage.py run_jobs): 'database' or 'redis' backend.
+# JOBS_EAGER runs jobs in-process after commit, for setups without a worker;
+# on by default in DEBUG so a bare runserver still sends mail.
+JOBS_BACKEND = config('JOBS_BACKEND', default='database')
+JOBS_REDIS_URL = config('JOBS_REDIS_URL', default='redis://localhost:6379/0')
+JOBS_EAGER = config('JOBS_EAGER', default=DEBUG, cast=bool)
+JOBS_RETRY_BACKOFF = config('JOBS_RETRY_BACKOFF', default=10, cast=int)
+# Days finished jobs stay in background_jobs; the worker prunes them every
+# JOBS_PRUNE_INTERVAL seconds (0 disables)
+JOBS_RETENTION_DAYS = config('JOBS_RETENTION_DAYS', default=7, cast=int)
+JOBS_FAILED_RETENTION_DAYS = config('JOBS_FAILED_RETENTION_DAYS', default=30, cast=int)
+JOBS_PRUNE_INTERVAL = config('JOBS_PRUNE_INTERVAL', default=3600, cast=int)
+
+# Workspace search dropdown: seconds a user's results for a query are reused
+GLOBAL_SEARCH_CACHE_TIMEOUT = config('GLOBAL_SEARCH_CACHE_TIMEOUT', default=15, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -196,7 +237,39 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Cursor pages of PAGE_SIZE; ?page_size= up to a viewset's max_page_size
+    # (or API_MAX_PAGE_SIZE) and ?fields= sparse fieldsets, see connectflow/api.py
+    'DEFAULT_PAGINATION_CLASS': 'connectflow.api.DefaultCursorPagination',
+    'PAGE_SIZE': config('API_PAGE_SIZE', default=50, cast=int),
 }
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=200, cast=int)
+# Per-request / per-frame query counting, Server-Timing and N+1 warnings
+# (connectflow/query_budget.py)
+QUERY_BUDGET_ENABLED = config('QUERY_BUDGET_ENABLED', default=DEBUG, cast=bool)
+QUERY_BUDGET_WARN_QUERIES = config('QUERY_BUDGET_WARN_QUERIES', default=50, cast=int)
+QUERY_BUDGET_REPEAT_THRESHOLD = config('QUERY_BUDGET_REPEAT_THRESHOLD', default=5, cast=int)
+# Presence registry (apps/accounts/presence.py): seconds without a heartbeat
+# before a user counts as offline, and how often users.status is written
+PRESENCE_TTL = config('PRESENCE_TTL', default=90, cast=int)
+PRESENCE_FLUSH_INTERVAL = config('PRESENCE_FLUSH_INTERVAL', default=15, cast=int)
+# Seconds between coalesced presence diffs sent to each org's sockets
+PRESENCE_TICK = config('PRESENCE_TICK', default=1.0, cast=float)
+# Stale presence sweeper: seconds without a last_seen write before a present
+# user is set OFFLINE, and seconds between sweeps (0 leaves sweeping to
+# `manage.py cleanup_stale_status --loop`)
+PRESENCE_STALE_AFTER = config('PRESENCE_STALE_AFTER', default=300, cast=int)
+PRESENCE_SWEEP_INTERVAL = config('PRESENCE_SWEEP_INTERVAL', default=60, cast=int)
+# Seconds a cached auth principal (apps/accounts/principal.py) lives; user saves drop it sooner
+PRINCIPAL_CACHE_TIMEOUT = config('PRINCIPAL_CACHE_TIMEOUT', default=3600, cast=int)
+# Seconds the cached unread count and latest notifications live; writes drop them sooner
+NOTIFICATION_CACHE_TIMEOUT = config('NOTIFICATION_CACHE_TIMEOUT', default=3600, cast=int)
+# Bearer token for the /metrics scrape endpoint (connectflow/metrics.py);
+# without one the endpoint is only served in DEBUG
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+# Measure the payload size of one group_send in N per group prefix; 0 stops counting bytes
+METRICS_GROUP_SEND_SAMPLE = config('METRICS_GROUP_SEND_SAMPLE', default=10, cast=int)
+# Seconds a cached ETag version may outlive writes that bypass signals
+API_VERSION_CACHE_TIMEOUT = config('API_VERSION_CACHE_TIMEOUT', default=60, cast=int)
 
 # Authentication settings
 LOGIN_URL = 'accounts:login'
@@ -21,9 +21,11 @@ from django.conf.urls.static import static
 from django.views.generic import RedirectView
 from django.views.static import serve
 from django.urls import re_path
+from connectflow.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('accounts/', include('apps.accounts.urls')),
     path('organization/', include('apps.organizations.urls')),
     path('channels/', include('apps.chat_channels.urls')),
@@ -24,6 +24,10 @@ mkdir -p media/avatars
 mkdir -p media/messages/attachments
 mkdir -p media/messages/voice
 
+# Start the background job worker (emails, Cloudinary deletes, notification fan-out)
+echo "Starting job worker..."
+python manage.py run_jobs --concurrency 2 &
+
 # Start Daphne server (for Django Channels + WebSockets)
 echo "Starting Daphne server..."
 daphne -b 0.0.0.0 -p 8000 connectflow.asgi:application
@@ -0,0 +1,77 @@
+/**
+ * Chat WebSocket Protocol
+ * Negotiates the compact JSON wire format (see apps/chat_channels/protocol.py)
+ * and expands its frames back into the verbose shape the chat page uses.
+ */
+
+class ChatProtocol {
+    constructor(socket) {
+        this.socket = socket;
+        this.senders = new Map();
+    }
+
+    /**
+     * Decode one incoming frame. Returns null for sender dictionary frames.
+     */
+    decode(raw) {
+        const frame = JSON.parse(raw);
+        // The server fell back to the legacy format
+        if (!this.socket.protocol) return frame;
+
+        if (frame.t === 'sender') {
+            this.senders.set(frame.s, frame);
+            return null;
+        }
+
+        const data = {};
+        for (const [key, value] of Object.entries(frame)) {
+            data[ChatProtocol.LONG_KEYS[key] || key] = value;
+        }
+        if (data.sender_id !== undefined) {
+            const sender = this.senders.get(data.sender_id) || {};
+            data.sender_name = sender.n || '';
+            data.sender_avatar = sender.a || null;
+            data.sender_organization = sender.o || null;
+        }
+        return data;
+    }
+}
+
+ChatProtocol.SUBPROTOCOLS = ['connectflow.v2.json'];
+
+ChatProtocol.LONG_KEYS = {
+    t: 'type',
+    id: 'message_id',
+    m: 'message',
+    mt: 'message_type',
+    st: 'status',
+    s: 'sender_id',
+    ts: 'timestamp',
+    vu: 'voice_message_url',
+    vd: 'voice_duration',
+    at: 'attachments',
+    pm: 'parent_message_id',
+    pd: 'parent_details',
+    pn: 'is_pinned',
+    sr: 'is_starred',
+    ty: 'is_typing',
+    da: 'deleted_at',
+    db: 'deleted_by',
+    u: 'user_id',
+    r: 'reactions',
+    e: 'emoji',
+    tc: 'target_channel',
+    c: 'content',
+    k: 'client_key',
+    ca: 'created_at',
+    dp: 'duplicate',
+    ev: 'event_id',
+    le: 'last_event_id',
+    dl: 'delta',
+    ct: 'count'
+};
+
+// Export
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = { ChatProtocol };
+}